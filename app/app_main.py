@@ -7,15 +7,33 @@ app_main.py
 """
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import hmac
+import math
 import os
+import secrets
 import uvicorn  # type: ignore
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException, Depends
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 
-from core.core_observability import init_observability, traced_span, time_llm_call, record_llm_call
-from core.core_adapter_llm import LLMAdapter
+from core.core_observability import (
+    init_observability,
+    prepare_multiprocess_metrics,
+    record_llm_call,
+    serve_multiprocess_metrics,
+    time_llm_call,
+    traced_span,
+)
+from core.core_adapter_llm import DeadlineExceededError, LLMAdapter, OverloadedError
 from core.core_auth_manager import CoreAuthManager
+from core.core_blocking_pool import BlockingPool
+from core.core_json_codec import dumps as json_dumps
+from core.core_llm_scheduler import FairScheduler
+from core.core_llm_session_store import SessionLostError, SessionStore, StateTableSpill
 
 
 # -------------------------- Settings loader -------------------------- #
@@ -38,13 +56,76 @@ def load_settings() -> Dict[str, Any]:
 SETTINGS = load_settings()
 SERVICE_NAME = SETTINGS.get("service_name", "theaterverse_final")
 METRICS_PORT = int(SETTINGS.get("metrics_port", 9100))
+WORKERS = max(1, int(os.environ.get("APP_WORKERS", SETTINGS.get("workers", 1))))
+METRICS_MULTIPROC_DIR = os.environ.get(
+    "PROMETHEUS_MULTIPROC_DIR",
+    SETTINGS.get("metrics_multiproc_dir", "/run/system_validator/prometheus"),
+)
 OTLP_ENDPOINT = SETTINGS.get("otlp_endpoint")
 USE_AUTH = bool(SETTINGS.get("auth", {}).get("enabled", False))
+STREAM_BUFFER_CHUNKS = int(SETTINGS.get("stream", {}).get("buffer_chunks", 64))
+BLOCKING_POOL_WORKERS = int(SETTINGS.get("blocking_pool", {}).get("max_workers", 16))
+BATCH_MAX_ITEMS = int(SETTINGS.get("batch", {}).get("max_items", 1000))
+BATCH_CONCURRENCY = max(1, int(SETTINGS.get("batch", {}).get("concurrency", 16)))
+# Client-supplied request budget; it can only shorten routing.deadline_ms.
+REQUEST_TIMEOUT_HEADER = "x-request-timeout-ms"
+SESSION_SETTINGS = SETTINGS.get("sessions", {}) or {}
+SESSIONS_ENABLED = bool(SESSION_SETTINGS.get("enabled", False))
+SESSION_SPILL = bool(SESSION_SETTINGS.get("spill", False))
+# Signs the session ids issued by POST /v1/sessions; must be shared by every
+# worker/instance that serves the same sessions.
+SESSION_ID_SECRET = (
+    os.environ.get("SESSION_ID_SECRET") or str(SESSION_SETTINGS.get("id_secret") or "")
+).encode("utf-8")
+SCHEDULER_SETTINGS = SETTINGS.get("scheduler", {}) or {}
+# With auth enabled tenant and class come from the verified JWT claims only;
+# the headers are honoured only when auth is off (there is nothing to verify).
+TENANT_HEADER = SCHEDULER_SETTINGS.get("tenant_header", "x-tenant-id")
+TENANT_CLAIM = SCHEDULER_SETTINGS.get("tenant_claim", "tenant")
+CLASS_HEADER = SCHEDULER_SETTINGS.get("class_header", "x-request-class")
+CLASS_CLAIM = SCHEDULER_SETTINGS.get("class_claim", "request_class")
+
+
+def check_session_settings() -> None:
+    """Refuse session mode where a turn could land on a worker without its history."""
+    if not SESSIONS_ENABLED:
+        return
+    if not USE_AUTH and not SESSION_ID_SECRET:
+        raise RuntimeError(
+            "sessions.enabled needs sessions.id_secret (or SESSION_ID_SECRET) when auth is off; "
+            "a per-process random key would reject ids issued by another worker or before a restart"
+        )
+    if WORKERS > 1 and not SESSION_SPILL:
+        raise RuntimeError(
+            "sessions.enabled with more than one worker needs sessions.spill: true; "
+            "in-memory history is not visible to the other workers"
+        )
+
 
 # --------------------------- Bootstrap -------------------------------- #
+check_session_settings()
+if __name__ == "__main__" and WORKERS > 1:
+    # Supervisor of a multi-worker launch: workers inherit the shared metrics
+    # directory, so none of them binds metrics_port (see entrypoint below).
+    prepare_multiprocess_metrics(METRICS_MULTIPROC_DIR)
 init_observability(service_name=SERVICE_NAME, otlp_endpoint=OTLP_ENDPOINT, metrics_port=METRICS_PORT)
 adapter = LLMAdapter()
 auth_mgr: Optional[CoreAuthManager] = CoreAuthManager() if USE_AUTH else None
+# Token verification (JWKS fetch, JWT signature check) runs here, off the event loop.
+blocking = BlockingPool("app", BLOCKING_POOL_WORKERS)
+scheduler = FairScheduler.from_settings(SCHEDULER_SETTINGS)
+sessions: Optional[SessionStore] = (
+    SessionStore(
+        max_bytes=int(SESSION_SETTINGS.get("max_bytes", 64 * 1024 * 1024)),
+        idle_ttl_s=float(SESSION_SETTINGS.get("idle_ttl_s", 1800)),
+        spill=StateTableSpill() if SESSION_SPILL else None,
+        max_entries=int(SESSION_SETTINGS.get("max_entries", 10000)),
+        # The spill table is the shared copy: every turn is saved to it and read back from it.
+        write_through=SESSION_SPILL,
+    )
+    if SESSIONS_ENABLED
+    else None
+)
 
 app = FastAPI(title="System Validator API", version="1.0.0")
 
@@ -55,6 +136,9 @@ class ChatRequest(BaseModel):
     messages: List[Dict[str, str]]
     temperature: Optional[float] = None
     max_tokens: Optional[int] = None
+    stream: bool = False
+    # Session mode: `messages` holds only this turn; the server keeps the history.
+    session_id: Optional[str] = None
 
 
 # --------------------------- Auth Dep ---------------------------------- #
@@ -68,7 +152,7 @@ async def token_required(request: Request) -> Optional[Dict[str, Any]]:
         raise HTTPException(status_code=401, detail="missing bearer token")
     token = auth.split(" ", 1)[1]
     try:
-        claims = auth_mgr.verify_access_token(token)
+        claims = await blocking.run(auth_mgr.verify_access_token, token)
         return claims
     except Exception as e:  # noqa: BLE001
         from core.core_observability import record_auth_failure
@@ -76,35 +160,341 @@ async def token_required(request: Request) -> Optional[Dict[str, Any]]:
         raise HTTPException(status_code=401, detail=str(e))
 
 
+# The dependencies below do no I/O; declaring them async keeps Starlette from
+# running each one on its threadpool.
+async def request_timeout_ms(request: Request) -> Optional[int]:
+    raw = request.headers.get(REQUEST_TIMEOUT_HEADER)
+    if raw is None:
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"invalid {REQUEST_TIMEOUT_HEADER} header")
+
+
+async def request_deadline(timeout_ms: Optional[int] = Depends(request_timeout_ms)) -> float:
+    return adapter.deadline_after(timeout_ms)
+
+
+class Ticket(BaseModel):
+    tenant: str
+    klass: str
+    # Authenticated subject ("sub" claim); None when auth is disabled.
+    subject: Optional[str] = None
+
+
+async def request_ticket(
+    request: Request, claims: Optional[Dict[str, Any]] = Depends(token_required)
+) -> Ticket:
+    if USE_AUTH:
+        # A client must not pick its own share or jump the queue by header.
+        claims = claims or {}
+        tenant = claims.get(TENANT_CLAIM) or "anonymous"
+        klass = claims.get(CLASS_CLAIM)
+    else:
+        claims = {}
+        tenant = request.headers.get(TENANT_HEADER) or "anonymous"
+        klass = request.headers.get(CLASS_HEADER)
+    subject = claims.get("sub")
+    return Ticket(tenant=str(tenant), klass=scheduler.resolve_class(klass), subject=str(subject) if subject else None)
+
+
+# --------------------------- Lifecycle --------------------------------- #
+@app.on_event("startup")
+async def startup() -> None:
+    adapter.start_health_monitor()
+    adapter.start_config_watch()
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    adapter.stop_config_watch()
+    adapter.stop_health_monitor()
+    await adapter.aclose()
+    if sessions is not None:
+        await sessions.aclose()
+    blocking.shutdown()
+
+
 # --------------------------- Routes ------------------------------------ #
 @app.get("/health")
 async def health() -> Dict[str, str]:
     return {"status": "ok"}
 
 
-@app.post("/v1/chat")
-async def v1_chat(req: ChatRequest, _claims: Optional[Dict[str, Any]] = Depends(token_required)) -> Dict[str, Any]:
-    with traced_span("api.v1_chat", model=req.model or "default"):
+@app.post("/v1/chat", response_model=None)
+async def v1_chat(
+    req: ChatRequest,
+    deadline: float = Depends(request_deadline),
+    ticket: Ticket = Depends(request_ticket),
+) -> Response:
+    if req.stream:
+        return await _stream_chat(req, deadline, ticket)
+    with traced_span("api.v1_chat", model=req.model or "default", tenant=ticket.tenant, request_class=ticket.klass):
         with time_llm_call("primary"):
             try:
-                resp = adapter.chat(
-                    messages=req.messages,
+                resp = await _complete(req, deadline, ticket)
+                record_llm_call("primary", ok=True)
+                # Encoded once here instead of FastAPI's jsonable_encoder + json.dumps pass.
+                return Response(content=json_dumps(resp), media_type="application/json")
+            except Exception as e:  # noqa: BLE001
+                record_llm_call("primary", ok=False)
+                raise _http_error(e)
+
+
+@app.post("/v1/chat/batch", response_model=None)
+async def v1_chat_batch(
+    reqs: List[ChatRequest],
+    timeout_ms: Optional[int] = Depends(request_timeout_ms),
+    ticket: Ticket = Depends(request_ticket),
+) -> StreamingResponse:
+    # Auth and body parsing happen once for the whole batch. Items run through
+    # the same scheduler as /v1/chat, at most BATCH_CONCURRENCY at a time, and
+    # each gets its own deadline when it starts.
+    if len(reqs) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"batch exceeds {BATCH_MAX_ITEMS} items")
+    return StreamingResponse(
+        _run_batch(reqs, timeout_ms, ticket),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/v1/sessions", status_code=201)
+async def create_session(ticket: Ticket = Depends(request_ticket)) -> Dict[str, str]:
+    if sessions is None:
+        raise HTTPException(status_code=404, detail="session mode is disabled")
+    return {"session_id": _new_session_id()}
+
+
+@app.delete("/v1/sessions/{session_id}", status_code=204, response_model=None)
+async def delete_session(session_id: str, ticket: Ticket = Depends(request_ticket)) -> Response:
+    if sessions is None:
+        raise HTTPException(status_code=404, detail="session mode is disabled")
+    await sessions.delete(_session_key(ticket, session_id))
+    return Response(status_code=204)
+
+
+async def _complete(req: ChatRequest, deadline: float, ticket: Ticket) -> Dict[str, Any]:
+    async with _conversation(req, ticket) as (messages, commit):
+        async with scheduler.slot(ticket.tenant, ticket.klass, deadline):
+            resp = await adapter.achat(
+                messages=messages,
+                model=req.model,
+                deadline=deadline,
+                temperature=req.temperature,
+                max_tokens=req.max_tokens,
+            )
+        message = ((resp.get("choices") or [{}])[0].get("message")) or {}
+        await commit(message.get("content") or "")
+        return resp
+
+
+# --------------------------- Sessions ---------------------------------- #
+def _session_key(ticket: Ticket, session_id: str) -> str:
+    if USE_AUTH:
+        # Owned by the authenticated subject; the tenant is not an identity.
+        if not ticket.subject:
+            raise HTTPException(status_code=403, detail="token has no subject; session mode needs one")
+        return f"{ticket.subject}/{session_id}"
+    # No identity to bind to: only unguessable ids issued by POST /v1/sessions
+    # are accepted, so a client cannot pick (or guess) another client's id.
+    if not _issued_session_id(session_id):
+        raise HTTPException(status_code=404, detail="unknown session_id; create one with POST /v1/sessions")
+    return session_id
+
+
+def _new_session_id() -> str:
+    token = secrets.token_urlsafe(24)
+    return f"{token}.{_session_id_mac(token)}"
+
+
+def _issued_session_id(session_id: str) -> bool:
+    token, _, mac = session_id.rpartition(".")
+    return bool(token) and hmac.compare_digest(mac, _session_id_mac(token))
+
+
+def _session_id_mac(token: str) -> str:
+    return hmac.new(SESSION_ID_SECRET, token.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+
+@asynccontextmanager
+async def _conversation(
+    req: ChatRequest, ticket: Ticket
+) -> AsyncIterator[Tuple[List[Dict[str, str]], Callable[[str], Awaitable[None]]]]:
+    """Full context for this turn and a callback that records the assistant reply.
+
+    Without session_id the request is stateless and the callback does nothing.
+    A turn that fails or is cancelled is not recorded.
+    """
+    if not req.session_id:
+        async def discard(reply: str) -> None:
+            return None
+
+        yield req.messages, discard
+        return
+    if sessions is None:
+        raise HTTPException(status_code=400, detail="session mode is disabled")
+    async with sessions.turn(_session_key(ticket, req.session_id)) as session:
+        async def commit(reply: str) -> None:
+            await sessions.commit(session, req.messages + [{"role": "assistant", "content": reply}])
+
+        yield session.history() + req.messages, commit
+
+
+def _http_error(e: BaseException) -> HTTPException:
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, SessionLostError):
+        # The history is gone; the client must not carry on as if it were not.
+        return HTTPException(status_code=409, detail=str(e))
+    if isinstance(e, OverloadedError):
+        # Shed or rate-limited on every provider: tell the client when to come back.
+        retry_after = str(max(1, math.ceil(e.retry_after_s)))
+        return HTTPException(status_code=e.status, detail=str(e), headers={"Retry-After": retry_after})
+    return HTTPException(status_code=504 if isinstance(e, DeadlineExceededError) else 500, detail=str(e))
+
+
+# --------------------------- Batch ------------------------------------- #
+async def _run_batch(reqs: List[ChatRequest], timeout_ms: Optional[int], ticket: Ticket) -> AsyncIterator[bytes]:
+    pending = iter(enumerate(reqs))
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def worker() -> None:
+        for index, req in pending:
+            try:
+                result = await _batch_item(index, req, timeout_ms, ticket)
+            except Exception as e:  # noqa: BLE001
+                # Every item must produce a line, or the response waits for it forever.
+                result = {"index": index, "error": {"status": 500, "message": str(e)}}
+            await results.put(result)
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(BATCH_CONCURRENCY, len(reqs)))]
+    try:
+        for _ in range(len(reqs)):
+            yield json_dumps(await results.get()) + b"\n"
+    finally:
+        # Client went away mid-batch: stop issuing the remaining items, and
+        # let the cancelled ones release their slots before we return.
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def _batch_item(index: int, req: ChatRequest, timeout_ms: Optional[int], ticket: Ticket) -> Dict[str, Any]:
+    if req.stream:
+        return {"index": index, "error": {"status": 400, "message": "stream is not supported in a batch"}}
+    with traced_span("api.v1_chat_batch_item", model=req.model or "default", index=index):
+        try:
+            resp = await _complete(req, adapter.deadline_after(timeout_ms), ticket)
+        except Exception as e:  # noqa: BLE001
+            record_llm_call("primary", ok=False)
+            err = _http_error(e)
+            error: Dict[str, Any] = {"status": err.status_code, "message": err.detail}
+            if err.headers and "Retry-After" in err.headers:
+                error["retry_after"] = int(err.headers["Retry-After"])
+            return {"index": index, "error": error}
+    record_llm_call("primary", ok=True)
+    return {"index": index, "response": resp}
+
+
+# --------------------------- Streaming --------------------------------- #
+_STREAM_END = object()
+
+
+async def _stream_chat(req: ChatRequest, deadline: float, ticket: Ticket) -> StreamingResponse:
+    # The provider stream is drained by one task into a bounded queue, so a slow
+    # client applies backpressure after STREAM_BUFFER_CHUNKS instead of buffering
+    # the whole generation. Failover is finished once the first chunk is queued.
+    # The task holds its scheduler slot until the stream ends or is cancelled.
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_BUFFER_CHUNKS)
+    task = asyncio.create_task(_pump_stream(req, deadline, ticket, queue))
+    try:
+        with traced_span("api.v1_chat_stream", model=req.model or "default"):
+            first = await queue.get()
+        if first is _STREAM_END or isinstance(first, Exception):
+            record_llm_call("primary", ok=False)
+            if first is _STREAM_END:
+                raise HTTPException(status_code=500, detail="empty stream")
+            raise _http_error(first)
+        record_llm_call("primary", ok=True)
+        return StreamingResponse(
+            _relay_sse(first, queue, task),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    except BaseException:
+        # Failed, or cancelled (client gone) before the body took the task
+        # over: nothing else would stop it or release what it holds.
+        await _stop_pump(task)
+        raise
+
+
+async def _pump_stream(req: ChatRequest, deadline: float, ticket: Ticket, queue: asyncio.Queue) -> None:
+    try:
+        async with _conversation(req, ticket) as (messages, commit):
+            async with scheduler.slot(ticket.tenant, ticket.klass, deadline):
+                stream = adapter.achat_stream(
+                    messages=messages,
                     model=req.model,
+                    deadline=deadline,
                     temperature=req.temperature,
                     max_tokens=req.max_tokens,
                 )
-                record_llm_call("primary", ok=True)
-                return resp
-            except Exception as e:  # noqa: BLE001
-                record_llm_call("primary", ok=False)
-                raise HTTPException(status_code=500, detail=str(e))
+                parts: List[str] = []
+                try:
+                    async for chunk in stream:
+                        delta = ((chunk.get("choices") or [{}])[0].get("delta")) or {}
+                        parts.append(delta.get("content") or "")
+                        await queue.put(chunk)
+                finally:
+                    # Cancelled mid-stream: close the provider stream now, not whenever it is collected.
+                    await stream.aclose()
+            await commit("".join(parts))
+        await queue.put(_STREAM_END)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:  # noqa: BLE001
+        await queue.put(e)
+
+
+async def _relay_sse(first: Dict[str, Any], queue: asyncio.Queue, task: asyncio.Task) -> AsyncIterator[bytes]:
+    try:
+        item: Any = first
+        while item is not _STREAM_END:
+            if isinstance(item, Exception):
+                # Headers are already sent; report mid-stream failures in-band.
+                yield _sse_event({"error": {"message": str(item)}})
+                break
+            yield _sse_event(item)
+            item = await queue.get()
+        yield b"data: [DONE]\n\n"
+    finally:
+        await _stop_pump(task)
+
+
+async def _stop_pump(task: asyncio.Task) -> None:
+    # Cancel and wait, so the scheduler slot, bulkhead slot and provider
+    # stream are released before the response finishes. asyncio.wait()
+    # does not raise the task's CancelledError as ours.
+    task.cancel()
+    await asyncio.wait([task])
+
+
+def _sse_event(obj: Dict[str, Any]) -> bytes:
+    return b"data: " + json_dumps(obj) + b"\n\n"
 
 
 # --------------------------- Entrypoint -------------------------------- #
 if __name__ == "__main__":
     host = os.environ.get("APP_HOST", "0.0.0.0")
     port = int(os.environ.get("APP_PORT", "8000"))
-    uvicorn.run("app.main:app", host=host, port=port, reload=False)
+    if WORKERS > 1:
+        # One aggregated scrape endpoint for every worker; dead workers' live gauges are dropped.
+        serve_multiprocess_metrics(METRICS_PORT)
+        uvicorn.run("app.app_main:app", host=host, port=port, reload=False, workers=WORKERS)
+    else:
+        uvicorn.run("app.app_main:app", host=host, port=port, reload=False)
 
 # --- END OF STRUCTURE ---
 # /root/System_Validator/APP_DIR/theaterverse_final/app/main.py
@@ -8,17 +8,32 @@ LLM繧｢繝繝励ち譛ｬ螳溯｣・ｼ・- 繝励Ο繝舌う繝・・LLM
 """
 from __future__ import annotations
 
+import asyncio
+import contextvars
 import json
+import logging
 import os
+import random
+import socket
 import time
 import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
 import urllib.request
 import urllib.error
 import urllib.parse
 
+try:
+    import httpx  # type: ignore
+    _HTTPX_AVAILABLE = True
+except Exception:  # pragma: no cover
+    httpx = None  # type: ignore
+    _HTTPX_AVAILABLE = False
+
 try:
     from opentelemetry import trace  # type: ignore
     _TRACER = trace.get_tracer("theaterverse_final.core.llm")
@@ -35,35 +50,500 @@ except Exception:  # pragma: no cover
             return _DummySpan()
     _TRACER = _DummyTracer()
 
+from .core_observability import (
+    record_llm_config_reload,
+    record_llm_hedge,
+    record_llm_rate_limited,
+    record_llm_retry,
+    record_llm_tokens,
+    record_llm_ttft,
+    observe_llm_ratelimit_wait,
+    set_llm_circuit_state,
+    set_llm_provider_load,
+    set_llm_ratelimit_queue_depth,
+)
+from .core_json_codec import dumps as json_dumps, loads as json_loads
+from .core_llm_response_cache import ResponseCache, canonical_key
+from .core_llm_singleflight import AsyncSingleFlight, SingleFlight
+from .core_llm_batcher import MicroBatcher
+from .core_llm_health import ProviderHealthMonitor
+from .core_llm_shared_limiter import SharedBucketStore
+from .core_llm_config_watcher import ConfigFileWatcher
+from .core_llm_affinity import AffinityRouter, prefix_key
+from .core_llm_bulkhead import Bulkhead
+
+logger = logging.getLogger(__name__)
+
+# Sentinel returned by the SSE parser for the terminating "data: [DONE]" event.
+_SSE_DONE = object()
+
 
 # ----------------------------- Rate Limiter ------------------------------ #
 class TokenBucket:
-    def __init__(self, rate_per_minute: int, burst: int) -> None:
+    def __init__(
+        self,
+        rate_per_minute: int,
+        burst: int,
+        name: str = "",
+        limit: str = "rpm",
+        store: Optional[SharedBucketStore] = None,
+    ) -> None:
+        self.name = name
+        self.limit = limit
         self.capacity = max(1, burst)
         self.tokens = float(self.capacity)
         self.rate_per_sec = max(0.001, rate_per_minute / 60.0)
         self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
         self.timestamp = time.monotonic()
+        # FIFO of waiting callers (sync and async share one queue).
+        self._waiters: deque = deque()
+        # With a store the token count lives in shared memory and is common
+        # to every worker on the host; the waiter queue stays per process.
+        self.store = store
+        self._slot = store.slot(f"{name}:{limit}", self.capacity) if store is not None else -1
+
+    def allow(self, cost: float = 1.0) -> bool:
+        # A cost above capacity could never be admitted; let it through on a full bucket.
+        cost = min(float(self.capacity), cost)
+        with self.lock:
+            return self._take(cost) == 0.0
+
+    def acquire(self, cost: float = 1.0, deadline: Optional[float] = None) -> bool:
+        """Take `cost` tokens, queueing FIFO until time.monotonic() reaches
+        `deadline`. Without a deadline this behaves like allow()."""
+        cost = min(float(self.capacity), cost)
+        with self.cond:
+            if not self._waiters and self._take(cost) == 0.0:
+                return True
+            if deadline is None or deadline <= time.monotonic():
+                return False
+            ticket = self._enqueue()
+            started = time.monotonic()
+            try:
+                while True:
+                    wait = self._take_or_wait(ticket, cost)
+                    if wait == 0.0:
+                        return True
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    # Only the head knows how long its refill takes; the rest wait for a notify.
+                    self.cond.wait(min(remaining, wait) if wait > 0 else remaining)
+            finally:
+                self._dequeue(ticket, started)
+
+    async def acquire_async(self, cost: float = 1.0, deadline: Optional[float] = None) -> bool:
+        """asyncio variant of acquire(); waits without blocking the event loop."""
+        cost = min(float(self.capacity), cost)
+        with self.cond:
+            if not self._waiters and self._take(cost) == 0.0:
+                return True
+            if deadline is None or deadline <= time.monotonic():
+                return False
+            ticket = self._enqueue()
+        started = time.monotonic()
+        try:
+            while True:
+                with self.cond:
+                    wait = self._take_or_wait(ticket, cost)
+                if wait == 0.0:
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                await asyncio.sleep(min(remaining, wait if wait > 0 else 0.01))
+        finally:
+            with self.cond:
+                self._dequeue(ticket, started)
+
+    def _take_or_wait(self, ticket: object, cost: float) -> float:
+        # Caller holds the lock. 0.0 = taken; >0 = refill time for the head; -1 = not at head.
+        if self._waiters[0] is not ticket:
+            return -1.0
+        return self._take(cost)
+
+    def _take(self, cost: float) -> float:
+        # Caller holds the lock. 0.0 = taken, else seconds until `cost` has refilled.
+        if self.store is not None:
+            return self.store.take(self._slot, cost, self.capacity, self.rate_per_sec)
+        self._refill()
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate_per_sec
+
+    def _enqueue(self) -> object:
+        ticket = object()
+        self._waiters.append(ticket)
+        if self.name:
+            set_llm_ratelimit_queue_depth(self.name, self.limit, len(self._waiters))
+        return ticket
+
+    def _dequeue(self, ticket: object, started: float) -> None:
+        self._waiters.remove(ticket)
+        self.cond.notify_all()
+        if self.name:
+            set_llm_ratelimit_queue_depth(self.name, self.limit, len(self._waiters))
+            observe_llm_ratelimit_wait(self.name, self.limit, time.monotonic() - started)
+
+    def retry_after(self, cost: float = 1.0) -> float:
+        """Seconds until `cost` tokens should be available again (a hint, not a reservation)."""
+        cost = min(float(self.capacity), cost)
+        if self.store is not None:
+            return cost / self.rate_per_sec
+        with self.lock:
+            self._refill()
+            return max(0.0, (cost - self.tokens) / self.rate_per_sec)
+
+    def inherit(self, prev: "TokenBucket") -> None:
+        """Start from the token count of the bucket this one replaces (config reload)."""
+        if self.store is not None:
+            return  # shared slots outlive the bucket objects
+        with prev.lock:
+            prev._refill()
+            tokens = prev.tokens
+        with self.lock:
+            self.tokens = min(float(self.capacity), tokens)
+            self.timestamp = time.monotonic()
+
+    def adjust(self, delta: float) -> None:
+        """Settle an earlier charge: positive delta charges more (the bucket
+        may go into debt), negative delta refunds."""
+        with self.lock:
+            if self.store is not None:
+                self.store.settle(self._slot, delta, self.capacity, self.rate_per_sec)
+                return
+            self._refill()
+            self.tokens = min(float(self.capacity), self.tokens - delta)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self.timestamp
+        self.timestamp = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate_per_sec)
+
+
+# ---------------------------- Circuit Breaker ---------------------------- #
+class CircuitBreaker:
+    """Per-provider breaker: closed -> open after consecutive failures,
+    open -> half-open after a cooldown, half-open -> closed after enough
+    successful probes (or back to open on the first failed probe)."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, open_ms: int, half_open_probes: int, success_threshold: int) -> None:
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_s = max(0.0, open_ms / 1000.0)
+        self.half_open_probes = max(1, half_open_probes)
+        self.success_threshold = max(1, success_threshold)
+        self.state = self.CLOSED
+        self.failures = 0
+        self.successes = 0
+        self.probes = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
 
     def allow(self) -> bool:
         with self.lock:
-            now = time.monotonic()
-            elapsed = now - self.timestamp
-            self.timestamp = now
-            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate_per_sec)
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.open_s:
+                    return False
+                self._transition(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN:
+                if self.probes >= self.half_open_probes:
+                    return False
+                self.probes += 1
+            return True
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit admits a half-open probe (0 once it would)."""
+        with self.lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.open_s - (time.monotonic() - self.opened_at))
+
+    def release(self) -> None:
+        """Return a probe slot taken by allow() when the request was not sent."""
+        with self.lock:
+            if self.state == self.HALF_OPEN and self.probes > 0:
+                self.probes -= 1
+
+    def record_success(self) -> None:
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self.probes = max(0, self.probes - 1)
+                self.successes += 1
+                if self.successes >= self.success_threshold:
+                    self._transition(self.CLOSED)
+            else:
+                self.failures = 0
+
+    def record_failure(self) -> None:
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self._transition(self.OPEN)
+            elif self.state == self.CLOSED:
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    self._transition(self.OPEN)
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        self.failures = 0
+        self.successes = 0
+        self.probes = 0
+        if state == self.OPEN:
+            self.opened_at = time.monotonic()
+        set_llm_circuit_state(self.name, state)
+
+
+# ---------------------------- Provider Load ------------------------------ #
+class ProviderStats:
+    """In-flight count and EWMA latency for one provider, used by the
+    latency-aware routing strategies."""
+
+    def __init__(self, name: str, alpha: float, initial_latency_s: float, window: int = 256) -> None:
+        self.name = name
+        self.alpha = min(1.0, max(0.01, alpha))
+        self.ewma_s = max(0.0, initial_latency_s)
+        self.in_flight = 0
+        self.samples: deque = deque(maxlen=max(1, window))
+        self.lock = threading.Lock()
+
+    def begin(self) -> float:
+        with self.lock:
+            self.in_flight += 1
+            set_llm_provider_load(self.name, self.in_flight, self.ewma_s)
+        return time.monotonic()
+
+    def end(self, started: float, ok: bool = True, sample: bool = True) -> None:
+        """Finish a call; sample=False only drops it from in_flight (e.g. a cancelled hedge)."""
+        elapsed = time.monotonic() - started
+        with self.lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            if not sample:
+                set_llm_provider_load(self.name, self.in_flight, self.ewma_s)
+                return
+            # A fast failure must not make a broken provider look attractive.
+            sample = elapsed if ok else max(elapsed, self.ewma_s * 2.0)
+            self.ewma_s += self.alpha * (sample - self.ewma_s)
+            if ok:
+                self.samples.append(elapsed)
+            set_llm_provider_load(self.name, self.in_flight, self.ewma_s)
+
+    def finish(self, started: float, error: Optional[BaseException] = None) -> None:
+        """end() for a call that raised `error`, or succeeded if None."""
+        if error is None:
+            self.end(started)
+        elif isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+            # Cancelled or closed by us (a hedge that lost the race, a client
+            # that went away): not the provider's latency.
+            self.end(started, ok=False, sample=False)
+        else:
+            # The caller's own 4xx says nothing about the provider's latency.
+            self.end(started, ok=False, sample=not _is_client_error(error))
+
+    def percentile(self, q: float, min_samples: int = 1) -> Optional[float]:
+        with self.lock:
+            if len(self.samples) < max(1, min_samples):
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def expected_completion_s(self) -> float:
+        # Every queued request ahead of us costs roughly one EWMA latency.
+        with self.lock:
+            return self.ewma_s * (self.in_flight + 1)
+
+
+# ------------------------------ Ratio Budget ----------------------------- #
+class RatioBudget:
+    """Token budget that earns `ratio` per request and spends 1 per extra
+    call, capping extra load (e.g. hedges) at roughly `ratio` of traffic."""
+
+    def __init__(self, ratio: float, max_tokens: float, initial: float = 0.0) -> None:
+        self.ratio = max(0.0, ratio)
+        self.max_tokens = max(1.0, max_tokens)
+        self.tokens = min(self.max_tokens, max(0.0, initial))
+        self.lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self.lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def available(self) -> bool:
+        with self.lock:
+            return self.tokens >= 1.0
+
+    def try_spend(self) -> bool:
+        with self.lock:
             if self.tokens >= 1.0:
                 self.tokens -= 1.0
                 return True
             return False
 
 
+# ------------------------------ Stream Usage ----------------------------- #
+class _StreamUsage:
+    """Token usage of one streamed completion: the provider's final usage
+    chunk if it sent one, else a count of the content relayed so far."""
+
+    def __init__(self, prompt_tokens: int) -> None:
+        self.prompt_tokens = prompt_tokens
+        self.reported: Optional[Dict[str, Any]] = None
+        self.chunks = 0
+        self.chars = 0
+
+    def add(self, chunk: Dict[str, Any]) -> None:
+        if chunk.get("usage"):
+            self.reported = chunk["usage"]
+        for choice in chunk.get("choices") or []:
+            content = (choice.get("delta") or {}).get("content")
+            if content:
+                self.chunks += 1
+                self.chars += len(content)
+
+    def as_response(self) -> Dict[str, Any]:
+        if self.reported:
+            return {"usage": self.reported}
+        # Every content chunk is at least one token; a long one (a backend
+        # that ignored stream=true) counts ~4 characters per token.
+        completion = max(self.chunks, -(-self.chars // 4))
+        return {"usage": {"prompt_tokens": self.prompt_tokens, "completion_tokens": completion, "total_tokens": self.prompt_tokens + completion}}
+
+
+# ------------------------------ Stream Load ------------------------------ #
+class _StreamTracker:
+    """Keeps a provider stream counted in ProviderStats.in_flight until it
+    is drained, fails or is closed. Only a drained stream's total time is a
+    latency sample; the wait for its first chunk alone is not."""
+
+    def __init__(self, stream: Any, stats: Optional[ProviderStats], started: float) -> None:
+        self.stream = stream
+        self.stats = stats
+        self.started = started
+        self.finished = False
+
+    def _finish(self, error: Optional[BaseException]) -> None:
+        if self.finished:
+            return
+        self.finished = True
+        if self.stats is not None:
+            self.stats.finish(self.started, error)
+
+
+class _TrackedStream(_StreamTracker):
+    # A class rather than a generator: close() must count even if iteration never started.
+    def __iter__(self) -> "_TrackedStream":
+        return self
+
+    def __next__(self) -> Dict[str, Any]:
+        try:
+            return next(self.stream)
+        except StopIteration:
+            self._finish(None)
+            raise
+        except BaseException as e:
+            self._finish(e)
+            raise
+
+    def close(self) -> None:
+        try:
+            self.stream.close()
+        finally:
+            self._finish(GeneratorExit())
+
+
+class _ATrackedStream(_StreamTracker):
+    def __aiter__(self) -> "_ATrackedStream":
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        try:
+            return await self.stream.__anext__()
+        except StopAsyncIteration:
+            self._finish(None)
+            raise
+        except BaseException as e:
+            self._finish(e)
+            raise
+
+    async def aclose(self) -> None:
+        try:
+            await self.stream.aclose()
+        finally:
+            self._finish(GeneratorExit())
+
+
 # ----------------------------- Exceptions -------------------------------- #
 class ProviderError(RuntimeError):
     pass
 
+class ProviderUnavailableError(ProviderError):
+    pass
+
 class TimeoutError(ProviderError):
     pass
 
+class DeadlineExceededError(TimeoutError):
+    pass
+
+class OverloadedError(ProviderError):
+    """Rejected for load (rate limit, full bulkhead) rather than failure; carries a retry hint."""
+
+    status = 503
+
+    def __init__(self, message: str, retry_after_s: float = 1.0) -> None:
+        super().__init__(message)
+        self.retry_after_s = max(0.0, retry_after_s)
+
+class RateLimitedError(OverloadedError):
+    status = 429
+
+class BulkheadFullError(OverloadedError):
+    status = 503
+
+class CircuitOpenError(OverloadedError):
+    """Skipped because the provider's circuit is open; retry_after_s is when it may be probed again."""
+
+    status = 503
+
+class HTTPStatusError(ProviderError):
+    """Non-2xx answer from a provider; keeps the status and any Retry-After hint."""
+
+    def __init__(self, status: int, reason: str, retry_after: Optional[str] = None) -> None:
+        super().__init__(f"HTTP Error {status}: {reason}")
+        self.status = status
+        self.retry_after_s = _parse_retry_after(retry_after)
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Retry-After is either delta-seconds or an HTTP-date.
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# Statuses worth retrying on the same provider; other 4xx will not change on a retry.
+_RETRYABLE_STATUS = frozenset({408, 425, 429})
+
+
+def _is_client_error(err: BaseException) -> bool:
+    """Non-retryable 4xx: the request was at fault, not the provider, so it
+    says nothing about provider health or latency."""
+    status = getattr(err, "status", None)
+    return status is not None and 400 <= status < 500 and status not in _RETRYABLE_STATUS
+
 
 # ----------------------------- Config Model ------------------------------ #
 @dataclass
@@ -71,13 +551,109 @@ class RetryConfig:
     max_attempts: int
     base_ms: int
     max_ms: int
+    jitter: str
+    budget_ratio: float
+    budget_burst: int
+
+@dataclass
+class CircuitConfig:
+    enabled: bool
+    failure_threshold: int
+    open_ms: int
+    half_open_probes: int
+    success_threshold: int
+    health_probe: bool
+    health_timeout_ms: int
+
+@dataclass
+class LoadConfig:
+    ewma_alpha: float
+    initial_latency_ms: int
+
+@dataclass
+class HedgeConfig:
+    enabled: bool
+    delay_ms: Optional[int]
+    percentile: float
+    min_samples: int
+    min_delay_ms: int
+    budget_ratio: float
+    budget_burst: int
+
+@dataclass
+class AffinityConfig:
+    enabled: bool
+    prefix_chars: int
+    vnodes: int
+    load_factor: float
+    fail_cooldown_ms: int
 
 @dataclass
 class RoutingConfig:
     strategy: str
     priority: List[str]
     timeout_ms: int
+    deadline_ms: int
+    min_attempt_ms: int
     retry: RetryConfig
+    circuit: CircuitConfig
+    load: LoadConfig
+    hedging: HedgeConfig
+    affinity: AffinityConfig
+
+@dataclass
+class CacheConfig:
+    enabled: bool
+    max_entries: int
+    max_bytes: int
+    ttl_s: float
+
+@dataclass
+class CoalescingConfig:
+    enabled: bool
+    # Sampled (temperature > 0) requests are independent draws; sharing one
+    # between callers is opt-in.
+    deterministic_only: bool
+
+@dataclass
+class BatchConfig:
+    enabled: bool
+    window_ms: int
+    max_batch_size: int
+    mode: str
+    batch_path: str
+
+@dataclass
+class HealthMonitorConfig:
+    enabled: bool
+    interval_ms: int
+    jitter_ratio: float
+    unhealthy_threshold: int
+
+@dataclass
+class BulkheadConfig:
+    enabled: bool
+    max_concurrent: int
+    max_queue: int
+    queue_timeout_ms: int
+
+@dataclass
+class PoolConfig:
+    max_connections: int
+    max_keepalive_connections: int
+    keepalive_expiry_s: float
+
+@dataclass
+class RoutingSnapshot:
+    """Config-derived routing state that hot reload swaps as one reference."""
+    config: Dict[str, Any]
+    routing: RoutingConfig
+    rate_limiters: Dict[str, TokenBucket]
+    token_limiters: Dict[str, TokenBucket]
+    rate_limit_wait_ms: int
+    hedge_budget: RatioBudget
+    retry_budgets: Dict[str, RatioBudget]
+    affinity: Dict[str, AffinityRouter]
 
 
 # ----------------------------- Adapter Core ------------------------------ #
@@ -90,134 +666,1344 @@ class LLMAdapter:
                 "/root/System_Validator/APP_DIR/theaterverse_final/config/llm_connector_config.json",
             )
         )
-        self.config = self._load_config(self.config_path)
-        self.routing = self._parse_routing(self.config)
-        self.rate_limiters = self._build_rate_limiters(self.config)
+        config = self._load_config(self.config_path)
+        self.limiter_store = self._build_limiter_store(config)
+        # Requests pin the snapshot they started on (see _pin); reload_config() swaps it.
+        self._pinned: contextvars.ContextVar = contextvars.ContextVar(f"llm_snapshot_{id(self)}", default=None)
+        self._snapshot = self._build_snapshot(config)
+        self._reload_lock = threading.Lock()
+        self.breakers = self._build_breakers(config, self.routing)
+        self.stats = self._build_stats(config, self.routing)
+        self.pool = self._parse_pool(config)
+        self.cache = self._build_cache(config)
+        self.coalescing = self._parse_coalescing(config)
+        self.singleflight = SingleFlight("sync")
+        self.asingleflight = AsyncSingleFlight("async")
+        self._async_clients: Dict[str, Any] = {}
+        self.batchers = self._build_batchers(config)
+        self.bulkheads = self._build_bulkheads(config)
+        self.health = self._build_health_monitor(config)
+        self.watcher = self._build_config_watcher(config)
+
+    # ------------------------ Routing Snapshot -------------------- #
+    @property
+    def config(self) -> Dict[str, Any]:
+        return self._current().config
+
+    @property
+    def routing(self) -> RoutingConfig:
+        return self._current().routing
+
+    @property
+    def rate_limiters(self) -> Dict[str, TokenBucket]:
+        return self._current().rate_limiters
+
+    @property
+    def token_limiters(self) -> Dict[str, TokenBucket]:
+        return self._current().token_limiters
+
+    @property
+    def rate_limit_wait_ms(self) -> int:
+        return self._current().rate_limit_wait_ms
+
+    @property
+    def hedge_budget(self) -> RatioBudget:
+        return self._current().hedge_budget
+
+    @property
+    def retry_budgets(self) -> Dict[str, RatioBudget]:
+        return self._current().retry_budgets
+
+    @property
+    def affinity(self) -> Dict[str, AffinityRouter]:
+        return self._current().affinity
+
+    def _current(self) -> RoutingSnapshot:
+        return self._pinned.get() or self._snapshot
+
+    @contextmanager
+    def _pin(self, snap: Optional[RoutingSnapshot] = None):
+        token = self._pinned.set(snap or self._current())
+        try:
+            yield
+        finally:
+            self._pinned.reset(token)
+
+    def reload_config(self) -> bool:
+        """Re-read config_path and atomically swap in a new routing snapshot.
+
+        Everything is built before the swap, off the request path; requests
+        already running finish on the snapshot they pinned. Rate-limit token
+        counts and hedge/retry budgets carry over, breakers and latency
+        stats of known providers are kept. Cache, coalescing, batching, pool,
+        health monitor and rate_limit.backend changes still need a restart.
+        Returns False (keeping the current snapshot) if the file is invalid.
+        """
+        with self._reload_lock:
+            try:
+                config = self._load_config(self.config_path)
+                snap = self._build_snapshot(config, self._snapshot)
+                breakers = self._carry_breakers(self.breakers, self._build_breakers(config, snap.routing))
+                stats = self._carry_stats(self.stats, self._build_stats(config, snap.routing))
+            except Exception as e:  # noqa: BLE001
+                record_llm_config_reload("error")
+                logger.warning("LLM config reload rejected, keeping current config: %s", e)
+                return False
+            # Per-provider state first, so the new provider list never points at a missing breaker.
+            self.breakers = breakers
+            self.stats = stats
+            self._snapshot = snap
+        record_llm_config_reload("ok")
+        logger.info("LLM config reloaded from %s (priority=%s)", self.config_path, snap.routing.priority)
+        return True
+
+    def start_config_watch(self) -> None:
+        """Start polling config_path for edits if hot_reload is enabled."""
+        if self.watcher is not None:
+            self.watcher.start()
+
+    def stop_config_watch(self) -> None:
+        if self.watcher is not None:
+            self.watcher.stop()
 
     # ------------------------- Public API ------------------------- #
-    def chat(self, messages: List[Dict[str, str]], model: Optional[str] = None, **kwargs: Any) -> Dict[str, Any]:
-        """繝ｦ繝九ヵ繧｡繧､繝・Chat API縲Ｎessages縺ｯOpenAI莠呈鋤蠖｢蠑上ｒ諠ｳ螳壹・        謌ｻ繧雁､繧０penAI莠呈鋤縺ｮ譛蟆丞ｽ｢縺ｧ霑斐☆縲・""
-        with _TRACER.start_as_current_span("llm.chat") as span:
+    def deadline_after(self, timeout_ms: Optional[int] = None) -> float:
+        """Absolute time.monotonic() deadline for a new request.
+
+        routing.deadline_ms is the default and the ceiling; a caller (e.g. a
+        client header) may only shorten it.
+        """
+        budget_ms = self.routing.deadline_ms
+        if timeout_ms is not None and timeout_ms > 0:
+            budget_ms = min(budget_ms, timeout_ms)
+        return time.monotonic() + budget_ms / 1000.0
+
+    def chat(self, messages: List[Dict[str, str]], model: Optional[str] = None, deadline: Optional[float] = None, **kwargs: Any) -> Dict[str, Any]:
+        """繝ｦ繝九ヵ繧｡繧､繝・Chat API縲Ｎessages縺ｯOpenAI莠呈鋤蠖｢蠑上ｒ諠ｳ螳壹・
+        謌ｻ繧雁､繧０penAI莠呈鋤縺ｮ譛蟆丞ｽ｢縺ｧ霑斐☆縲・"""
+        if deadline is None:
+            deadline = self.deadline_after()
+        with self._pin(), _TRACER.start_as_current_span("llm.chat") as span:
             span.set_attribute("llm.messages.count", len(messages))
-            last_error: Optional[Exception] = None
-            for provider_name in self._providers_in_order():
-                if not self._allow(provider_name):
-                    last_error = ProviderError(f"rate-limited: {provider_name}")
-                    continue
-                try:
-                    resp = self._call_provider(provider_name, messages, model=model, **kwargs)
-                    span.set_attribute("llm.provider", provider_name)
-                    return resp
-                except Exception as e:  # noqa: BLE001
-                    last_error = e
-            raise ProviderError(f"All providers failed: {last_error}")
+            request_key, deterministic = self._request_key(messages, model, kwargs)
+            cache_key = request_key if deterministic and self.cache is not None else None
+            cached = self.cache.get(cache_key) if cache_key is not None else None
+            if cached is not None:
+                span.set_attribute("llm.cache", "hit")
+                return cached
+            if self._coalesce(deterministic):
+                resp = self.singleflight.do(request_key, lambda: self._chat_routed(span, messages, model, kwargs, deadline))
+            else:
+                resp = self._chat_routed(span, messages, model, kwargs, deadline)
+            if cache_key is not None:
+                self.cache.put(cache_key, resp)
+            return resp
+
+    async def achat(self, messages: List[Dict[str, str]], model: Optional[str] = None, deadline: Optional[float] = None, **kwargs: Any) -> Dict[str, Any]:
+        """Coroutine variant of chat() using pooled keep-alive connections.
+
+        Caching, coalescing, routing, rate limiting, retries and failover
+        follow the sync path. With routing.hedging enabled, a slow primary
+        is raced against the next provider in order (see _acall_hedged).
+
+        `deadline` (see deadline_after()) bounds the whole call: rate-limit
+        waits, every attempt's timeout, backoff sleeps and failover.
+        """
+        if deadline is None:
+            deadline = self.deadline_after()
+        with self._pin(), _TRACER.start_as_current_span("llm.chat") as span:
+            span.set_attribute("llm.messages.count", len(messages))
+            request_key, deterministic = self._request_key(messages, model, kwargs)
+            cache_key = request_key if deterministic and self.cache is not None else None
+            cached = self.cache.get(cache_key) if cache_key is not None else None
+            if cached is not None:
+                span.set_attribute("llm.cache", "hit")
+                return cached
+            if self._coalesce(deterministic):
+                resp = await self.asingleflight.do(request_key, lambda: self._achat_routed(span, messages, model, kwargs, deadline))
+            else:
+                resp = await self._achat_routed(span, messages, model, kwargs, deadline)
+            if cache_key is not None:
+                self.cache.put(cache_key, resp)
+            return resp
+
+    def chat_stream(self, messages: List[Dict[str, str]], model: Optional[str] = None, deadline: Optional[float] = None, **kwargs: Any) -> Iterator[Dict[str, Any]]:
+        """Yield OpenAI-style chat.completion.chunk dicts as the provider produces them.
+
+        Failover only happens until the first chunk; later errors propagate.
+        `deadline` bounds the time to the first chunk.
+        """
+        if deadline is None:
+            deadline = self.deadline_after()
+        with _TRACER.start_as_current_span("llm.chat_stream") as span:
+            span.set_attribute("llm.messages.count", len(messages))
+            provider_name, stream = self._open_stream_routed(messages, model, kwargs, deadline)
+            span.set_attribute("llm.provider", provider_name)
+            yield from stream
+
+    async def achat_stream(self, messages: List[Dict[str, str]], model: Optional[str] = None, deadline: Optional[float] = None, **kwargs: Any) -> AsyncIterator[Dict[str, Any]]:
+        """Coroutine variant of chat_stream() on the pooled async clients."""
+        if deadline is None:
+            deadline = self.deadline_after()
+        with _TRACER.start_as_current_span("llm.chat_stream") as span:
+            span.set_attribute("llm.messages.count", len(messages))
+            provider_name, stream = await self._aopen_stream_routed(messages, model, kwargs, deadline)
+            span.set_attribute("llm.provider", provider_name)
+            try:
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                await stream.aclose()
+
+    def start_health_monitor(self) -> None:
+        """Start background health probing if enabled in health_monitor config."""
+        if self.health is not None:
+            self.health.start()
+
+    def stop_health_monitor(self) -> None:
+        if self.health is not None:
+            self.health.stop()
+
+    async def aclose(self) -> None:
+        """Close the per-provider async connection pools."""
+        clients, self._async_clients = self._async_clients, {}
+        for client in clients.values():
+            await client.aclose()
 
     # ----------------------- Internal Methods --------------------- #
     def _providers_in_order(self) -> List[str]:
-        if self.routing.strategy == "failover-priority":
+        strategy = self.routing.strategy
+        if strategy == "failover-priority":
             return list(self.routing.priority)
+        candidates = list(self.routing.priority or self.config["providers"].keys())
+        # sorted() is stable, so ties keep the configured priority order.
+        if strategy == "ewma-latency":
+            return sorted(candidates, key=lambda n: self.stats[n].expected_completion_s() if n in self.stats else float("inf"))
+        if strategy == "least-outstanding":
+            return sorted(candidates, key=lambda n: self.stats[n].in_flight if n in self.stats else float("inf"))
         return list(self.config["providers"].keys())
 
-    def _allow(self, provider: str) -> bool:
-        lim = self.rate_limiters.get(provider)
-        return True if lim is None else lim.allow()
+    def _chat_routed(self, span: Any, messages: List[Dict[str, str]], model: Optional[str], kwargs: Dict[str, Any], deadline: float) -> Dict[str, Any]:
+        errors: List[Exception] = []
+        wait_until = self._admission_deadline(deadline)
+        for provider_name in self._providers_in_order():
+            if self._deadline_passed(deadline):
+                raise DeadlineExceededError(f"deadline exceeded: {errors[-1] if errors else None}")
+            estimate = self._estimate_tokens(provider_name, messages, kwargs)
+            rejected = self._admit(provider_name, estimate, wait_until)
+            if rejected is not None:
+                errors.append(rejected)
+                continue
+            try:
+                resp = self._call_provider(provider_name, messages, model=model, deadline=deadline, **kwargs)
+                self._settle_tokens(provider_name, estimate, resp)
+                span.set_attribute("llm.provider", provider_name)
+                return resp
+            except Exception as e:  # noqa: BLE001
+                self._settle_tokens(provider_name, estimate, None)
+                errors.append(e)
+        raise self._all_failed(errors)
 
-    def _call_provider(self, provider: str, messages: List[Dict[str, str]], model: Optional[str], **kwargs: Any) -> Dict[str, Any]:
-        timeout = self.routing.timeout_ms / 1000.0
-        attempts = max(1, self.routing.retry.max_attempts)
+    async def _achat_routed(self, span: Any, messages: List[Dict[str, str]], model: Optional[str], kwargs: Dict[str, Any], deadline: float) -> Dict[str, Any]:
+        errors: List[Exception] = []
+        order = self._providers_in_order()
+        tried: set = set()
+        if self.routing.hedging.enabled:
+            self.hedge_budget.deposit()
+        wait_until = self._admission_deadline(deadline)
+        for idx, provider_name in enumerate(order):
+            if provider_name in tried:
+                continue
+            if self._deadline_passed(deadline):
+                raise DeadlineExceededError(f"deadline exceeded: {errors[-1] if errors else None}")
+            estimate = self._estimate_tokens(provider_name, messages, kwargs)
+            rejected = await self._aadmit(provider_name, estimate, wait_until)
+            if rejected is not None:
+                errors.append(rejected)
+                continue
+            if self.routing.hedging.enabled:
+                try:
+                    resp, served_by, spent = await self._acall_hedged(provider_name, estimate, order[idx + 1:], tried, messages, model=model, deadline=deadline, **kwargs)
+                except Exception as e:  # noqa: BLE001
+                    # _acall_hedged already refunded every call it launched.
+                    errors.append(e)
+                    continue
+            else:
+                try:
+                    resp = await self._acall_provider(provider_name, messages, model=model, deadline=deadline, **kwargs)
+                except Exception as e:  # noqa: BLE001
+                    self._settle_tokens(provider_name, estimate, None)
+                    errors.append(e)
+                    continue
+                served_by, spent = provider_name, estimate
+            self._settle_tokens(served_by, spent, resp)
+            span.set_attribute("llm.provider", served_by)
+            return resp
+        raise self._all_failed(errors)
+
+    def _open_stream_routed(self, messages: List[Dict[str, str]], model: Optional[str], kwargs: Dict[str, Any], deadline: float) -> Tuple[str, Iterator[Dict[str, Any]]]:
+        # Routing for streams ends at the first chunk, so only this part is
+        # pinned to a snapshot; the generator body never holds the pin across a yield.
+        with self._pin():
+            errors: List[Exception] = []
+            wait_until = self._admission_deadline(deadline)
+            for provider_name in self._providers_in_order():
+                if self._deadline_passed(deadline):
+                    raise DeadlineExceededError(f"deadline exceeded: {errors[-1] if errors else None}")
+                estimate = self._estimate_tokens(provider_name, messages, kwargs)
+                rejected = self._admit(provider_name, estimate, wait_until)
+                if rejected is not None:
+                    errors.append(rejected)
+                    continue
+                started = time.perf_counter()
+                bulkhead: Optional[Bulkhead] = None
+                try:
+                    bulkhead = self._enter_bulkhead(provider_name, deadline)
+                    first, rest = self._open_stream(provider_name, messages, model=model, deadline=deadline, **self._stream_kwargs(provider_name, kwargs))
+                except BaseException as e:
+                    if bulkhead is not None:
+                        bulkhead.release()
+                    self._settle_tokens(provider_name, estimate, None)
+                    if not isinstance(e, Exception):
+                        raise
+                    errors.append(e)
+                    continue
+                record_llm_ttft(provider_name, time.perf_counter() - started)
+                relay_usage = kwargs.get("stream_options") is not None
+                stream = self._settle_stream(provider_name, estimate, messages, first, rest, relay_usage)
+                return provider_name, self._release_after(stream, bulkhead)
+            raise self._all_failed(errors)
+
+    async def _aopen_stream_routed(self, messages: List[Dict[str, str]], model: Optional[str], kwargs: Dict[str, Any], deadline: float) -> Tuple[str, AsyncIterator[Dict[str, Any]]]:
+        with self._pin():
+            errors: List[Exception] = []
+            wait_until = self._admission_deadline(deadline)
+            for provider_name in self._providers_in_order():
+                if self._deadline_passed(deadline):
+                    raise DeadlineExceededError(f"deadline exceeded: {errors[-1] if errors else None}")
+                estimate = self._estimate_tokens(provider_name, messages, kwargs)
+                rejected = await self._aadmit(provider_name, estimate, wait_until)
+                if rejected is not None:
+                    errors.append(rejected)
+                    continue
+                started = time.perf_counter()
+                bulkhead = None
+                try:
+                    bulkhead = await self._aenter_bulkhead(provider_name, deadline)
+                    first, rest = await self._aopen_stream(provider_name, messages, model=model, deadline=deadline, **self._stream_kwargs(provider_name, kwargs))
+                except BaseException as e:
+                    # Also on cancellation: nothing else would give the charge or the slot back.
+                    if bulkhead is not None:
+                        bulkhead.release()
+                    self._settle_tokens(provider_name, estimate, None)
+                    if not isinstance(e, Exception):
+                        raise
+                    errors.append(e)
+                    continue
+                record_llm_ttft(provider_name, time.perf_counter() - started)
+                relay_usage = kwargs.get("stream_options") is not None
+                stream = self._asettle_stream(provider_name, estimate, messages, first, rest, relay_usage)
+                return provider_name, self._arelease_after(stream, bulkhead)
+            raise self._all_failed(errors)
+
+    def _request_key(self, messages: List[Dict[str, str]], model: Optional[str], kwargs: Dict[str, Any]) -> Tuple[str, bool]:
+        """Canonical key over messages, model and provider-merged params
+        (with each provider's default_model, so a reload that changes it
+        misses), plus whether the request is deterministic (greedy decoding
+        on every provider it could fail over to)."""
+        overrides = {k: v for k, v in kwargs.items() if v is not None}
+        params: Dict[str, Any] = {}
+        deterministic = True
+        for name in self.routing.priority or self.config["providers"].keys():
+            p = self.config["providers"].get(name)
+            if not p:
+                continue
+            merged = {**p.get("request", {}), **overrides}
+            if merged.get("temperature", 1.0) != 0:
+                deterministic = False
+            params[name] = {**merged, "default_model": p.get("default_model")}
+        return canonical_key(messages, model, params), deterministic
+
+    def _coalesce(self, deterministic: bool) -> bool:
+        c = self.coalescing
+        return c.enabled and (deterministic or not c.deterministic_only)
+
+    @contextmanager
+    def _track(self, provider: str):
+        st = self.stats.get(provider)
+        started = st.begin() if st is not None else 0.0
+        error: Optional[BaseException] = None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            if st is not None:
+                st.finish(started, error)
+
+    @contextmanager
+    def _instance(self, provider: str, messages: List[Dict[str, str]], model: Optional[str]):
+        """Backend base_url for one attempt; None means the provider's single base_url."""
+        router = self.affinity.get(provider)
+        if router is None:
+            yield None
+            return
+        with router.route(prefix_key(messages, model, self.routing.affinity.prefix_chars)) as inst:
+            try:
+                yield inst.url
+            except Exception as e:
+                # Connection errors, timeouts and 5xx/429 move this prefix to
+                # the next instance on the ring for the cooldown; 4xx do not.
+                if not _is_client_error(e):
+                    router.cool_down(inst)
+                raise
+
+    @staticmethod
+    def _all_failed(errors: List[Exception]) -> ProviderError:
+        last = errors[-1] if errors else None
+        overloaded = [e for e in errors if isinstance(e, OverloadedError)]
+        if errors and len(overloaded) == len(errors):
+            if all(isinstance(e, CircuitOpenError) for e in errors):
+                # Every candidate is behind an open circuit: 503 with a hint
+                # for when the first of them admits a probe again.
+                return CircuitOpenError(f"All providers unavailable: {last}", min(e.retry_after_s for e in errors))
+            # Every candidate was only too busy: surface 429/503 with a retry hint.
+            err = OverloadedError(f"All providers overloaded: {last}", min(e.retry_after_s for e in overloaded))
+            err.status = max(e.status for e in overloaded)
+            return err
+        return ProviderError(f"All providers failed: {last}")
+
+    def _admission_deadline(self, deadline: float) -> Optional[float]:
+        # How long a caller may queue on a throttled provider before failing
+        # over; never past the request deadline.
+        wait_ms = self.rate_limit_wait_ms
+        return min(deadline, time.monotonic() + wait_ms / 1000.0) if wait_ms > 0 else None
+
+    def _deadline_passed(self, deadline: float) -> bool:
+        return (deadline - time.monotonic()) * 1000.0 < self.routing.min_attempt_ms
+
+    def _attempt_timeout(self, provider: str, deadline: float) -> float:
+        """Socket timeout for the next attempt: the remaining budget, capped at routing.timeout_ms."""
+        remaining = deadline - time.monotonic()
+        if remaining * 1000.0 < self.routing.min_attempt_ms:
+            raise DeadlineExceededError(f"deadline exceeded before calling {provider}")
+        return min(self.routing.timeout_ms / 1000.0, remaining)
+
+    def _retry_fits(self, provider: str, deadline: float, pause: float) -> bool:
+        # A retry is only worth its backoff if a typical call can still finish afterwards.
+        st = self.stats.get(provider)
+        typical = st.ewma_s if st is not None else 0.0
+        return deadline - time.monotonic() - pause >= max(self.routing.min_attempt_ms / 1000.0, typical)
+
+    def _admit_circuit(self, provider: str) -> Optional[ProviderError]:
+        # Known-down providers and open circuits are skipped before a
+        # rate-limit token is spent on them.
+        if self.health is not None and self.health.is_down(provider):
+            return ProviderUnavailableError(f"unhealthy: {provider}")
+        br = self.breakers.get(provider)
+        if br is not None and not br.allow():
+            return CircuitOpenError(f"circuit open: {provider}", br.retry_after())
+        return None
+
+    def _reject_rate(self, provider: str, limit: str, bucket: TokenBucket, cost: float) -> ProviderError:
+        br = self.breakers.get(provider)
+        if br is not None:
+            br.release()
+        record_llm_rate_limited(provider, limit)
+        return RateLimitedError(f"{'rate' if limit == 'rpm' else 'token-rate'}-limited: {provider}", bucket.retry_after(cost))
+
+    def _admit(self, provider: str, tokens: int = 0, deadline: Optional[float] = None) -> Optional[ProviderError]:
+        rejected = self._admit_circuit(provider) or self._health_gate(provider)
+        if rejected is not None:
+            return rejected
+        rpm = self.rate_limiters.get(provider)
+        if rpm is not None and not rpm.acquire(1.0, deadline):
+            return self._reject_rate(provider, "rpm", rpm, 1.0)
+        tpm = self.token_limiters.get(provider)
+        if tpm is not None and tokens > 0 and not tpm.acquire(tokens, deadline):
+            if rpm is not None:
+                rpm.adjust(-1.0)
+            return self._reject_rate(provider, "tpm", tpm, tokens)
+        return None
+
+    async def _aadmit(self, provider: str, tokens: int = 0, deadline: Optional[float] = None) -> Optional[ProviderError]:
+        rejected = self._admit_circuit(provider) or await self._ahealth_gate(provider)
+        if rejected is not None:
+            return rejected
+        rpm = self.rate_limiters.get(provider)
+        if rpm is not None and not await rpm.acquire_async(1.0, deadline):
+            return self._reject_rate(provider, "rpm", rpm, 1.0)
+        tpm = self.token_limiters.get(provider)
+        if tpm is not None and tokens > 0 and not await tpm.acquire_async(tokens, deadline):
+            if rpm is not None:
+                rpm.adjust(-1.0)
+            return self._reject_rate(provider, "tpm", tpm, tokens)
+        return None
+
+    def _stream_kwargs(self, provider: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        # TPM-limited providers are asked for a final usage chunk to settle against.
+        if provider in self.token_limiters and kwargs.get("stream_options") is None:
+            return {**kwargs, "stream_options": {"include_usage": True}}
+        return kwargs
+
+    def _settle_stream(self, provider: str, estimate: int, messages: List[Dict[str, str]], first: Dict[str, Any], rest: Iterator[Dict[str, Any]], relay_usage: bool) -> Iterator[Dict[str, Any]]:
+        # A stream's TPM charge is settled once it is drained or closed: to the
+        # reported usage (or the counted content if the provider sent none),
+        # and refunded if the provider failed mid-stream.
+        usage = _StreamUsage(self._prompt_tokens(messages))
+        failed = False
+        try:
+            usage.add(first)
+            yield first
+            for chunk in rest:
+                usage.add(chunk)
+                # The usage-only chunk we asked for is not relayed unless the caller asked too.
+                if relay_usage or chunk.get("choices"):
+                    yield chunk
+        except Exception:
+            failed = True
+            raise
+        finally:
+            rest.close()
+            self._settle_tokens(provider, estimate, None if failed else usage.as_response())
+
+    async def _asettle_stream(self, provider: str, estimate: int, messages: List[Dict[str, str]], first: Dict[str, Any], rest: AsyncIterator[Dict[str, Any]], relay_usage: bool) -> AsyncIterator[Dict[str, Any]]:
+        usage = _StreamUsage(self._prompt_tokens(messages))
+        failed = False
+        try:
+            usage.add(first)
+            yield first
+            async for chunk in rest:
+                usage.add(chunk)
+                if relay_usage or chunk.get("choices"):
+                    yield chunk
+        except Exception:
+            failed = True
+            raise
+        finally:
+            await rest.aclose()
+            self._settle_tokens(provider, estimate, None if failed else usage.as_response())
+
+    def _bulkhead_wait_until(self, bulkhead: Bulkhead, deadline: float) -> float:
+        return min(deadline, time.monotonic() + bulkhead.queue_timeout_s)
+
+    def _shed(self, provider: str, bulkhead: Bulkhead) -> BulkheadFullError:
+        # Undo the admission that let this call through; the TPM estimate is
+        # refunded by the caller's _settle_tokens(..., None).
+        br = self.breakers.get(provider)
+        if br is not None:
+            br.release()
+        rpm = self.rate_limiters.get(provider)
+        if rpm is not None:
+            rpm.adjust(-1.0)
+        st = self.stats.get(provider)
+        return BulkheadFullError(
+            f"bulkhead full: {provider} ({bulkhead.in_flight} in flight, {bulkhead.queued} queued)",
+            st.ewma_s if st is not None else 1.0,
+        )
+
+    def _enter_bulkhead(self, provider: str, deadline: float) -> Optional[Bulkhead]:
+        bulkhead = self.bulkheads.get(provider)
+        if bulkhead is not None and not bulkhead.acquire(self._bulkhead_wait_until(bulkhead, deadline)):
+            raise self._shed(provider, bulkhead)
+        return bulkhead
+
+    async def _aenter_bulkhead(self, provider: str, deadline: float) -> Optional[Bulkhead]:
+        bulkhead = self.bulkheads.get(provider)
+        if bulkhead is not None and not await bulkhead.acquire_async(self._bulkhead_wait_until(bulkhead, deadline)):
+            raise self._shed(provider, bulkhead)
+        return bulkhead
+
+    @contextmanager
+    def _bulkhead_slot(self, provider: str, deadline: float):
+        bulkhead = self._enter_bulkhead(provider, deadline)
+        try:
+            yield
+        finally:
+            if bulkhead is not None:
+                bulkhead.release()
+
+    @asynccontextmanager
+    async def _abulkhead_slot(self, provider: str, deadline: float):
+        bulkhead = await self._aenter_bulkhead(provider, deadline)
+        try:
+            yield
+        finally:
+            if bulkhead is not None:
+                bulkhead.release()
+
+    @staticmethod
+    def _release_after(stream: Iterator[Dict[str, Any]], bulkhead: Optional[Bulkhead]) -> Iterator[Dict[str, Any]]:
+        # A stream keeps its slot until it is drained or closed.
+        try:
+            yield from stream
+        finally:
+            if bulkhead is not None:
+                bulkhead.release()
+
+    @staticmethod
+    async def _arelease_after(stream: AsyncIterator[Dict[str, Any]], bulkhead: Optional[Bulkhead]) -> AsyncIterator[Dict[str, Any]]:
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+            if bulkhead is not None:
+                bulkhead.release()
+
+    def _estimate_tokens(self, provider: str, messages: List[Dict[str, str]], kwargs: Dict[str, Any]) -> int:
+        """Up-front TPM charge: ~4 chars per prompt token plus the completion
+        budget (max_tokens from the call, else the provider default)."""
+        if provider not in self.token_limiters:
+            return 0
+        max_tokens = kwargs.get("max_tokens")
+        if max_tokens is None:
+            max_tokens = self.config["providers"][provider].get("request", {}).get("max_tokens", 0)
+        return self._prompt_tokens(messages) + int(max_tokens or 0)
+
+    @staticmethod
+    def _prompt_tokens(messages: List[Dict[str, str]]) -> int:
+        return sum(len(str(m.get("content", ""))) for m in messages) // 4 + 4 * len(messages)
+
+    def _settle_tokens(self, provider: str, estimate: int, resp: Optional[Dict[str, Any]]) -> None:
+        # Failed calls are refunded; successful ones are trued up to reported usage.
+        tpm = self.token_limiters.get(provider)
+        if tpm is None or estimate <= 0:
+            return
+        if resp is None:
+            tpm.adjust(-float(estimate))
+            return
+        usage = resp.get("usage") or {}
+        actual = usage.get("total_tokens") or (usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0))
+        record_llm_tokens(provider, "estimated", estimate)
+        if actual:
+            record_llm_tokens(provider, "actual", int(actual))
+            tpm.adjust(float(actual) - estimate)
+
+    def _record_outcome(self, provider: str, ok: bool, err: Optional[BaseException] = None) -> None:
+        br = self.breakers.get(provider)
+        if br is None:
+            return
+        if ok:
+            br.record_success()
+        elif isinstance(err, asyncio.CancelledError):
+            # A cancelled request must not open the circuit; just hand back
+            # a half-open probe slot without a verdict.
+            br.release()
+        elif err is not None and _is_client_error(err):
+            # A malformed request must not open the circuit for everyone;
+            # just hand back a half-open probe slot without a verdict.
+            br.release()
+        else:
+            br.record_failure()
+
+    def _circuit_tripped(self, provider: str) -> bool:
+        br = self.breakers.get(provider)
+        return br is not None and br.state != CircuitBreaker.CLOSED
+
+    def _needs_health_probe(self, provider: str) -> bool:
+        br = self.breakers.get(provider)
+        return br is not None and br.state == CircuitBreaker.HALF_OPEN and self.routing.circuit.health_probe
+
+    def _health_gate(self, provider: str) -> Optional[ProviderError]:
+        # A half-open probe asks the health endpoint first, so a still-dead
+        # backend re-opens the circuit without spending a real request (or a
+        # rate-limit token) on it.
+        if self._needs_health_probe(provider) and not self.check_health(provider):
+            return self._failed_probe(provider)
+        return None
+
+    async def _ahealth_gate(self, provider: str) -> Optional[ProviderError]:
+        if self._needs_health_probe(provider) and not await self.acheck_health(provider):
+            return self._failed_probe(provider)
+        return None
+
+    def _failed_probe(self, provider: str) -> ProviderError:
+        self._record_outcome(provider, ok=False)
+        br = self.breakers[provider]
+        return CircuitOpenError(f"health check failed: {provider}", br.retry_after())
+
+    def _backoff(self, attempt: int) -> float:
         base = max(0.001, self.routing.retry.base_ms / 1000.0)
         backoff_max = max(base, self.routing.retry.max_ms / 1000.0)
+        ceiling = min(backoff_max, base * (2 ** attempt))
+        # Full jitter spreads synchronized retries from many callers over the whole window.
+        return random.uniform(0.0, ceiling) if self.routing.retry.jitter == "full" else ceiling
+
+    def _earn_retry(self, provider: str) -> None:
+        budget = self.retry_budgets.get(provider)
+        if budget is not None:
+            budget.deposit()
+
+    def _retry_pause(self, provider: str, attempt: int, attempts: int, err: BaseException, deadline: float) -> Optional[float]:
+        """Seconds to sleep before retrying `provider`, or None to give up on it."""
+        if attempt >= attempts - 1 or self._circuit_tripped(provider):
+            return None
+        status = getattr(err, "status", None)
+        if status is not None and status < 500 and status not in _RETRYABLE_STATUS:
+            record_llm_retry(provider, "suppressed", "non_retryable")
+            return None
+        pause = self._backoff(attempt)
+        retry_after = getattr(err, "retry_after_s", None)
+        if retry_after is not None:
+            pause = max(pause, retry_after)
+        if not self._retry_fits(provider, deadline, pause):
+            record_llm_retry(provider, "suppressed", "deadline")
+            return None
+        budget = self.retry_budgets.get(provider)
+        if budget is not None and not budget.try_spend():
+            record_llm_retry(provider, "suppressed", "budget")
+            return None
+        record_llm_retry(provider, "spent", "retryable")
+        return pause
+
+    def _call_provider(self, provider: str, messages: List[Dict[str, str]], model: Optional[str], deadline: float, **kwargs: Any) -> Dict[str, Any]:
+        attempts = max(1, self.routing.retry.max_attempts)
+        self._earn_retry(provider)
+        with self._bulkhead_slot(provider, deadline):
+            for i in range(attempts):
+                timeout = self._attempt_timeout(provider, deadline)
+                try:
+                    with self._track(provider):
+                        resp = self._invoke(provider, messages, model=model, timeout=timeout, **kwargs)
+                    self._record_outcome(provider, ok=True)
+                    return resp
+                except Exception as e:  # noqa: BLE001
+                    self._record_outcome(provider, ok=False, err=e)
+                    pause = self._retry_pause(provider, i, attempts, e, deadline)
+                    if pause is None:
+                        raise e
+                time.sleep(pause)
+            raise ProviderError("unreachable")
+
+    def _open_stream(self, provider: str, messages: List[Dict[str, str]], model: Optional[str], deadline: float, **kwargs: Any) -> Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]:
+        # Retries cover everything up to the first chunk; nothing has been sent downstream yet.
+        attempts = max(1, self.routing.retry.max_attempts)
+        self._earn_retry(provider)
         for i in range(attempts):
+            timeout = self._attempt_timeout(provider, deadline)
+            stream = self._invoke_stream(provider, messages, model=model, timeout=timeout, **kwargs)
+            st = self.stats.get(provider)
+            started = st.begin() if st is not None else 0.0
             try:
-                return self._invoke(provider, messages, model=model, timeout=timeout, **kwargs)
-            except TimeoutError as te:
-                if i == attempts - 1:
-                    raise te
-            except Exception as e:  # noqa: BLE001
-                if i == attempts - 1:
+                first = next(stream)
+                self._record_outcome(provider, ok=True)
+                # Counted in flight until the stream is drained or closed, not just to the first chunk.
+                return first, _TrackedStream(stream, st, started)
+            except StopIteration as e:
+                if st is not None:
+                    st.finish(started, e)
+                self._record_outcome(provider, ok=False)
+                raise ProviderError(f"empty stream: {provider}")
+            except BaseException as e:
+                if st is not None:
+                    st.finish(started, e)
+                stream.close()
+                if not isinstance(e, Exception):
+                    raise
+                self._record_outcome(provider, ok=False, err=e)
+                pause = self._retry_pause(provider, i, attempts, e, deadline)
+                if pause is None:
                     raise e
-            sleep = min(backoff_max, base * (2 ** i))
-            time.sleep(sleep)
+            time.sleep(pause)
         raise ProviderError("unreachable")
 
+    async def _acall_provider(self, provider: str, messages: List[Dict[str, str]], model: Optional[str], deadline: float, **kwargs: Any) -> Dict[str, Any]:
+        attempts = max(1, self.routing.retry.max_attempts)
+        self._earn_retry(provider)
+        async with self._abulkhead_slot(provider, deadline):
+            for i in range(attempts):
+                timeout = self._attempt_timeout(provider, deadline)
+                try:
+                    with self._track(provider):
+                        # httpx timeouts are per read; wait_for bounds the attempt as a whole.
+                        resp = await asyncio.wait_for(
+                            self._ainvoke_batched(provider, messages, model=model, timeout=timeout, **kwargs), timeout,
+                        )
+                    self._record_outcome(provider, ok=True)
+                    return resp
+                except asyncio.CancelledError as e:
+                    self._record_outcome(provider, ok=False, err=e)
+                    raise
+                except Exception as e:  # noqa: BLE001
+                    self._record_outcome(provider, ok=False, err=e)
+                    pause = self._retry_pause(provider, i, attempts, e, deadline)
+                    if pause is None:
+                        if isinstance(e, asyncio.TimeoutError):
+                            raise TimeoutError(f"attempt timed out after {timeout:.3f}s: {provider}") from e
+                        raise e
+                await asyncio.sleep(pause)
+            raise ProviderError("unreachable")
+
+    async def _aopen_stream(self, provider: str, messages: List[Dict[str, str]], model: Optional[str], deadline: float, **kwargs: Any) -> Tuple[Dict[str, Any], AsyncIterator[Dict[str, Any]]]:
+        attempts = max(1, self.routing.retry.max_attempts)
+        self._earn_retry(provider)
+        for i in range(attempts):
+            timeout = self._attempt_timeout(provider, deadline)
+            stream = self._ainvoke_stream(provider, messages, model=model, timeout=timeout, **kwargs)
+            st = self.stats.get(provider)
+            started = st.begin() if st is not None else 0.0
+            try:
+                first = await stream.__anext__()
+                self._record_outcome(provider, ok=True)
+                # Counted in flight until the stream is drained or closed, not just to the first chunk.
+                return first, _ATrackedStream(stream, st, started)
+            except StopAsyncIteration as e:
+                if st is not None:
+                    st.finish(started, e)
+                self._record_outcome(provider, ok=False)
+                raise ProviderError(f"empty stream: {provider}")
+            except BaseException as e:
+                if st is not None:
+                    st.finish(started, e)
+                await stream.aclose()
+                if not isinstance(e, Exception):
+                    raise
+                self._record_outcome(provider, ok=False, err=e)
+                pause = self._retry_pause(provider, i, attempts, e, deadline)
+                if pause is None:
+                    raise e
+            await asyncio.sleep(pause)
+        raise ProviderError("unreachable")
+
+    def _hedge_delay(self, provider: str) -> Optional[float]:
+        h = self.routing.hedging
+        if h.delay_ms is not None:
+            return max(h.min_delay_ms, h.delay_ms) / 1000.0
+        st = self.stats.get(provider)
+        observed = st.percentile(h.percentile, h.min_samples) if st is not None else None
+        if observed is None:
+            return None
+        return max(h.min_delay_ms / 1000.0, observed)
+
+    def _undo_admit(self, provider: str, tokens: int) -> None:
+        """Give back everything _admit() took for a call that will not be sent."""
+        br = self.breakers.get(provider)
+        if br is not None:
+            br.release()
+        rpm = self.rate_limiters.get(provider)
+        if rpm is not None:
+            rpm.adjust(-1.0)
+        self._settle_tokens(provider, tokens, None)
+
+    async def _aadmit_hedge(self, candidates: List[str], tried: set, messages: List[Dict[str, str]], kwargs: Dict[str, Any]) -> Optional[Tuple[str, int]]:
+        # The hedge goes through the same breaker/TokenBucket admission as a
+        # normal attempt and additionally spends from the shared hedge budget.
+        if not self.hedge_budget.available():
+            return None
+        for name in candidates:
+            if name in tried:
+                continue
+            estimate = self._estimate_tokens(name, messages, kwargs)
+            if await self._aadmit(name, estimate) is not None:
+                continue
+            if self.hedge_budget.try_spend():
+                return name, estimate
+            # Another caller took the last budget token in the meantime.
+            self._undo_admit(name, estimate)
+            return None
+        return None
+
+    async def _acall_hedged(self, primary: str, estimate: int, fallbacks: List[str], tried: set, messages: List[Dict[str, str]], model: Optional[str], deadline: float, **kwargs: Any) -> Tuple[Dict[str, Any], str, int]:
+        """Race `primary` against at most one hedge.
+
+        Returns (response, provider that served it, that provider's TPM
+        estimate) for the caller to settle. Every other launched call is
+        settled here: failed or cancelled ones refunded, a second success
+        trued up to its usage. On failure nothing is left for the caller.
+        """
+        tried.add(primary)
+        launched: Dict[asyncio.Future, Tuple[str, int]] = {}
+        winner: Optional[asyncio.Future] = None
+        try:
+            primary_task = asyncio.ensure_future(self._acall_provider(primary, messages, model=model, deadline=deadline, **kwargs))
+            launched[primary_task] = (primary, estimate)
+            delay = self._hedge_delay(primary)
+            if delay is not None:
+                done, _ = await asyncio.wait({primary_task}, timeout=delay)
+                if not done:
+                    hedge = await self._aadmit_hedge(fallbacks, tried, messages, kwargs)
+                    if hedge is None:
+                        record_llm_hedge(primary, "suppressed")
+                    else:
+                        secondary, secondary_estimate = hedge
+                        tried.add(secondary)
+                        record_llm_hedge(secondary, "launched")
+                        task = asyncio.ensure_future(self._acall_provider(secondary, messages, model=model, deadline=deadline, **kwargs))
+                        launched[task] = (secondary, secondary_estimate)
+            pending = set(launched)
+            last_error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        winner = t
+                        name, spent = launched[t]
+                        if name != primary:
+                            record_llm_hedge(name, "won")
+                        return t.result(), name, spent
+                    last_error = t.exception()
+            raise last_error if last_error is not None else ProviderError("hedge failed")
+        finally:
+            # Cancel the loser (or both, if we were cancelled ourselves) and settle its charge.
+            for t, (name, spent) in launched.items():
+                if t is winner:
+                    continue
+                if not t.done():
+                    t.cancel()
+                ok = t.done() and not t.cancelled() and t.exception() is None
+                self._settle_tokens(name, spent, t.result() if ok else None)
+
     # ---------------------- Provider Invocations ------------------ #
     def _invoke(self, provider: str, messages: List[Dict[str, str]], *, model: Optional[str], timeout: float, **kwargs: Any) -> Dict[str, Any]:
+        p = self._provider_conf(provider)
+        with self._instance(provider, messages, model) as base_url:
+            url, payload, headers = self._prepare_request(p, messages, model=model, base_url=base_url, **kwargs)
+            data = json_dumps(payload)
+            req = urllib.request.Request(url, data=data, headers=headers)
+            try:
+                with urllib.request.urlopen(req, timeout=timeout) as r:
+                    obj = json_loads(r.read())
+                    return self._as_openai_min(obj)
+            except socket.timeout as e:
+                raise TimeoutError(str(e))
+            except urllib.error.HTTPError as e:
+                raise HTTPStatusError(e.code, str(e.reason), e.headers.get("Retry-After") if e.headers else None)
+            except urllib.error.URLError as e:
+                # Module-level TimeoutError shadows the builtin; socket.timeout is the socket one.
+                if isinstance(e.reason, socket.timeout):
+                    raise TimeoutError(str(e))
+                raise ProviderError(str(e))
+
+    async def _ainvoke(self, provider: str, messages: List[Dict[str, str]], *, model: Optional[str], timeout: float, **kwargs: Any) -> Dict[str, Any]:
+        p = self._provider_conf(provider)
+        with self._instance(provider, messages, model) as base_url:
+            url, payload, headers = self._prepare_request(p, messages, model=model, base_url=base_url, **kwargs)
+            client = self._async_client(provider)
+            try:
+                r = await client.post(url, content=json_dumps(payload), headers=headers, timeout=timeout)
+            except httpx.TimeoutException as e:
+                raise TimeoutError(str(e))
+            except httpx.HTTPError as e:
+                raise ProviderError(str(e))
+            if r.status_code >= 400:
+                raise HTTPStatusError(r.status_code, r.reason_phrase, r.headers.get("retry-after"))
+            return self._as_openai_min(json_loads(r.content))
+
+    async def _ainvoke_batched(self, provider: str, messages: List[Dict[str, str]], *, model: Optional[str], timeout: float, **kwargs: Any) -> Dict[str, Any]:
+        batcher = self.batchers.get(provider)
+        if batcher is None:
+            return await self._ainvoke(provider, messages, model=model, timeout=timeout, **kwargs)
+        # Only requests that differ in nothing but their messages (and their
+        # remaining deadline) share a batch.
+        group = (model, json_dumps(kwargs, sort_keys=True, default=str))
+        return await batcher.submit(group, (messages, model, timeout, kwargs))
+
+    async def _dispatch_batch(self, provider: str, items: List[Tuple[List[Dict[str, str]], Optional[str], float, Dict[str, Any]]]) -> List[Any]:
+        bconf = self._parse_batching(self._provider_conf(provider))
+        if len(items) > 1:
+            return await self._ainvoke_json_array(provider, bconf.batch_path, items)
+        return await asyncio.gather(
+            *[self._ainvoke(provider, m, model=mdl, timeout=t, **kw) for m, mdl, t, kw in items],
+            return_exceptions=True,
+        )
+
+    async def _ainvoke_json_array(self, provider: str, batch_path: str, items: List[Tuple[List[Dict[str, str]], Optional[str], float, Dict[str, Any]]]) -> List[Any]:
+        # For backends that accept a JSON array of chat requests and answer
+        # with an array of completions in the same order.
+        p = self._provider_conf(provider)
+        payloads = []
+        headers: Dict[str, str] = {}
+        for m, mdl, _t, kw in items:
+            _url, payload, headers = self._prepare_request(p, m, model=mdl, **kw)
+            payloads.append(payload)
+        # A batch goes to one instance; it follows the affinity of its first request.
+        with self._instance(provider, items[0][0], items[0][1]) as base_url:
+            url = (base_url or p["base_url"]).rstrip("/") + "/" + batch_path.lstrip("/")
+            client = self._async_client(provider)
+            try:
+                r = await client.post(url, content=json_dumps(payloads), headers=headers, timeout=max(t for _m, _mdl, t, _kw in items))
+            except httpx.TimeoutException as e:
+                raise TimeoutError(str(e))
+            except httpx.HTTPError as e:
+                raise ProviderError(str(e))
+            if r.status_code >= 400:
+                raise HTTPStatusError(r.status_code, r.reason_phrase, r.headers.get("retry-after"))
+            body = json_loads(r.content)
+            if not isinstance(body, list) or len(body) != len(items):
+                raise ProviderError("batch response does not match request count")
+            return [self._as_openai_min(obj) for obj in body]
+
+    def _invoke_stream(self, provider: str, messages: List[Dict[str, str]], *, model: Optional[str], timeout: float, **kwargs: Any) -> Iterator[Dict[str, Any]]:
+        p = self._provider_conf(provider)
+        # The instance stays charged until the stream is drained or closed.
+        with self._instance(provider, messages, model) as base_url:
+            url, payload, headers = self._prepare_request(p, messages, model=model, base_url=base_url, stream=True, **kwargs)
+            data = json_dumps(payload)
+            req = urllib.request.Request(url, data=data, headers={**headers, "Accept": "text/event-stream"})
+            try:
+                with urllib.request.urlopen(req, timeout=timeout) as r:
+                    if "text/event-stream" not in (r.headers.get("Content-Type") or ""):
+                        # Backend ignored stream=true; relay the whole completion as one chunk.
+                        yield self._as_chunk(json_loads(r.read()))
+                        return
+                    for raw in r:
+                        chunk = self._parse_sse_line(raw.decode("utf-8"))
+                        if chunk is _SSE_DONE:
+                            return
+                        if chunk is not None:
+                            yield chunk
+            except socket.timeout as e:
+                raise TimeoutError(str(e))
+            except urllib.error.HTTPError as e:
+                raise HTTPStatusError(e.code, str(e.reason), e.headers.get("Retry-After") if e.headers else None)
+            except urllib.error.URLError as e:
+                # Module-level TimeoutError shadows the builtin; socket.timeout is the socket one.
+                if isinstance(e.reason, socket.timeout):
+                    raise TimeoutError(str(e))
+                raise ProviderError(str(e))
+
+    async def _ainvoke_stream(self, provider: str, messages: List[Dict[str, str]], *, model: Optional[str], timeout: float, **kwargs: Any) -> AsyncIterator[Dict[str, Any]]:
+        p = self._provider_conf(provider)
+        with self._instance(provider, messages, model) as base_url:
+            url, payload, headers = self._prepare_request(p, messages, model=model, base_url=base_url, stream=True, **kwargs)
+            client = self._async_client(provider)
+            req = client.build_request(
+                "POST", url, content=json_dumps(payload),
+                headers={**headers, "Accept": "text/event-stream"}, timeout=timeout,
+            )
+            try:
+                r = await client.send(req, stream=True)
+            except httpx.TimeoutException as e:
+                raise TimeoutError(str(e))
+            except httpx.HTTPError as e:
+                raise ProviderError(str(e))
+            try:
+                if r.status_code >= 400:
+                    raise HTTPStatusError(r.status_code, r.reason_phrase, r.headers.get("retry-after"))
+                if "text/event-stream" not in r.headers.get("content-type", ""):
+                    yield self._as_chunk(json_loads(await r.aread()))
+                    return
+                async for line in r.aiter_lines():
+                    chunk = self._parse_sse_line(line)
+                    if chunk is _SSE_DONE:
+                        return
+                    if chunk is not None:
+                        yield chunk
+            except httpx.TimeoutException as e:
+                raise TimeoutError(str(e))
+            except httpx.HTTPError as e:
+                raise ProviderError(str(e))
+            finally:
+                await r.aclose()
+
+    def _provider_conf(self, provider: str) -> Dict[str, Any]:
         p = self.config["providers"].get(provider)
         if not p:
             raise ProviderError(f"unknown provider: {provider}")
-        ptype = p["type"]
-        if ptype == "openai":
-            return self._invoke_openai(p, messages, model=model, timeout=timeout, **kwargs)
-        elif ptype == "http":
-            return self._invoke_http(p, messages, model=model, timeout=timeout, **kwargs)
-        else:
-            raise ProviderError(f"unsupported provider type: {ptype}")
+        if p["type"] not in ("openai", "http"):
+            raise ProviderError(f"unsupported provider type: {p['type']}")
+        return p
 
-    def _invoke_http(self, pconf: Dict[str, Any], messages: List[Dict[str, str]], *, model: Optional[str], timeout: float, **kwargs: Any) -> Dict[str, Any]:
-        url = pconf["base_url"].rstrip("/") + "/chat/completions"
+    def _prepare_request(self, pconf: Dict[str, Any], messages: List[Dict[str, str]], *, model: Optional[str], base_url: Optional[str] = None, **kwargs: Any) -> Tuple[str, Dict[str, Any], Dict[str, str]]:
+        url = (base_url or pconf["base_url"]).rstrip("/") + "/chat/completions"
+        headers = {"Content-Type": "application/json", **self._auth_headers(pconf)}
+        default_model = pconf.get("default_model")
+        if pconf["type"] == "openai":
+            default_model = pconf.get("default_model", "gpt-4o-mini")
         payload = {
-            "model": model or pconf.get("default_model"),
+            "model": model or default_model,
             "messages": messages,
             **({k: v for k, v in pconf.get("request", {}).items()}),
-            **kwargs,
+            **{k: v for k, v in kwargs.items() if v is not None},
         }
-        data = json.dumps(payload).encode("utf-8")
-        req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
-        try:
-            with urllib.request.urlopen(req, timeout=timeout) as r:
-                body = r.read().decode("utf-8")
-                obj = json.loads(body)
-                return self._as_openai_min(obj)
-        except urllib.error.URLError as e:
-            if isinstance(e.reason, TimeoutError):
-                raise TimeoutError(str(e))
-            raise ProviderError(str(e))
+        return url, payload, headers
 
-    def _invoke_openai(self, pconf: Dict[str, Any], messages: List[Dict[str, str]], *, model: Optional[str], timeout: float, **kwargs: Any) -> Dict[str, Any]:
+    @staticmethod
+    def _auth_headers(pconf: Dict[str, Any]) -> Dict[str, str]:
+        if pconf["type"] != "openai":
+            return {}
         api_key = os.environ.get(pconf.get("auth", {}).get("env", "OPENAI_API_KEY"))
         if not api_key:
             raise ProviderError("OPENAI_API_KEY not set")
-        url = pconf["base_url"].rstrip("/") + "/chat/completions"
-        payload = {
-            "model": model or pconf.get("default_model", "gpt-4o-mini"),
-            "messages": messages,
-            **({k: v for k, v in pconf.get("request", {}).items()}),
-            **kwargs,
-        }
-        data = json.dumps(payload).encode("utf-8")
-        headers = {"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"}
-        req = urllib.request.Request(url, data=data, headers=headers)
+        return {"Authorization": f"Bearer {api_key}"}
+
+    def _health_request(self, provider: str) -> Tuple[str, Dict[str, str], int]:
+        p = self._provider_conf(provider)
+        h = p.get("health") or {}
+        url = p["base_url"].rstrip("/") + h.get("endpoint", "/health")
+        return url, self._auth_headers(p), int(h.get("expected_status", 200))
+
+    def check_health(self, provider: str) -> bool:
+        """Probe the provider's configured health endpoint."""
         try:
-            with urllib.request.urlopen(req, timeout=timeout) as r:
-                body = r.read().decode("utf-8")
-                obj = json.loads(body)
-                return self._as_openai_min(obj)
-        except urllib.error.URLError as e:
-            if isinstance(e.reason, TimeoutError):
-                raise TimeoutError(str(e))
-            raise ProviderError(str(e))
+            url, headers, expected = self._health_request(provider)
+            req = urllib.request.Request(url, headers=headers, method="GET")
+            with urllib.request.urlopen(req, timeout=self.routing.circuit.health_timeout_ms / 1000.0) as r:
+                status = r.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except Exception:  # noqa: BLE001
+            return False
+        return status == expected
+
+    async def acheck_health(self, provider: str) -> bool:
+        try:
+            url, headers, expected = self._health_request(provider)
+            client = self._async_client(provider)
+            r = await client.get(url, headers=headers, timeout=self.routing.circuit.health_timeout_ms / 1000.0)
+        except Exception:  # noqa: BLE001
+            return False
+        return r.status_code == expected
+
+    def _async_client(self, provider: str) -> Any:
+        # One keep-alive pool per provider so a stalled backend cannot starve the others.
+        client = self._async_clients.get(provider)
+        if client is None:
+            if not _HTTPX_AVAILABLE:
+                raise ProviderError("httpx not installed; async chat unavailable")
+            limits = httpx.Limits(
+                max_connections=self.pool.max_connections,
+                max_keepalive_connections=self.pool.max_keepalive_connections,
+                keepalive_expiry=self.pool.keepalive_expiry_s,
+            )
+            client = httpx.AsyncClient(limits=limits)
+            self._async_clients[provider] = client
+        return client
 
     # --------------------------- Helpers --------------------------- #
     @staticmethod
     def _load_config(path: str) -> Dict[str, Any]:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with open(path, "r", encoding="utf-8-sig") as f:
+            # The shipped file ends with a "// --- END OF STRUCTURE ---" marker line.
+            return json.loads("".join(line for line in f if not line.lstrip().startswith("//")))
+
+    def _build_snapshot(self, cfg: Dict[str, Any], previous: Optional[RoutingSnapshot] = None) -> RoutingSnapshot:
+        routing = self._parse_routing(cfg)
+        rate_limiters = self._build_rate_limiters(cfg)
+        token_limiters = self._build_token_limiters(cfg)
+        hedge_budget = RatioBudget(routing.hedging.budget_ratio, routing.hedging.budget_burst)
+        retry_budgets = self._build_retry_budgets(cfg, routing)
+        affinity = self._build_affinity(cfg, routing)
+        if previous is not None:
+            for fresh, old in ((rate_limiters, previous.rate_limiters), (token_limiters, previous.token_limiters)):
+                for name, bucket in fresh.items():
+                    if name in old:
+                        bucket.inherit(old[name])
+            hedge_budget.tokens = min(hedge_budget.max_tokens, previous.hedge_budget.tokens)
+            for name, budget in retry_budgets.items():
+                if name in previous.retry_budgets:
+                    budget.tokens = min(budget.max_tokens, previous.retry_budgets[name].tokens)
+            for name, router in affinity.items():
+                if name in previous.affinity:
+                    router.inherit(previous.affinity[name])
+        return RoutingSnapshot(
+            config=cfg,
+            routing=routing,
+            rate_limiters=rate_limiters,
+            token_limiters=token_limiters,
+            rate_limit_wait_ms=int(cfg.get("rate_limit", {}).get("max_wait_ms", 0)),
+            hedge_budget=hedge_budget,
+            retry_budgets=retry_budgets,
+            affinity=affinity,
+        )
+
+    @staticmethod
+    def _carry_breakers(old: Dict[str, CircuitBreaker], fresh: Dict[str, CircuitBreaker]) -> Dict[str, CircuitBreaker]:
+        # Known providers keep their breaker state; only the thresholds are retuned.
+        merged: Dict[str, CircuitBreaker] = {}
+        for name, br in fresh.items():
+            prev = old.get(name)
+            if prev is not None:
+                with prev.lock:
+                    prev.failure_threshold = br.failure_threshold
+                    prev.open_s = br.open_s
+                    prev.half_open_probes = br.half_open_probes
+                    prev.success_threshold = br.success_threshold
+                br = prev
+            merged[name] = br
+        return merged
+
+    @staticmethod
+    def _carry_stats(old: Dict[str, ProviderStats], fresh: Dict[str, ProviderStats]) -> Dict[str, ProviderStats]:
+        merged: Dict[str, ProviderStats] = {}
+        for name, st in fresh.items():
+            prev = old.get(name)
+            if prev is not None:
+                prev.alpha = st.alpha
+                st = prev
+            merged[name] = st
+        return merged
+
+    def _build_config_watcher(self, cfg: Dict[str, Any]) -> Optional[ConfigFileWatcher]:
+        hr = cfg.get("hot_reload", {})
+        if not hr.get("enabled", False):
+            return None
+        return ConfigFileWatcher(self.config_path, int(hr.get("interval_ms", 2000)), self.reload_config)
 
     @staticmethod
     def _parse_routing(cfg: Dict[str, Any]) -> RoutingConfig:
         r = cfg.get("routing", {})
         retry = r.get("retry", {})
+        cb = r.get("circuit_breaker", {})
+        load = r.get("load", {})
+        hedge = r.get("hedging", {})
+        aff = r.get("affinity", {})
         return RoutingConfig(
             strategy=r.get("strategy", "failover-priority"),
             priority=list(r.get("priority", [])),
             timeout_ms=int(r.get("timeout_ms", 20000)),
+            deadline_ms=int(r.get("deadline_ms", 30000)),
+            min_attempt_ms=int(r.get("min_attempt_ms", 50)),
             retry=RetryConfig(
                 max_attempts=int(retry.get("max_attempts", 3)),
                 base_ms=int(retry.get("backoff", {}).get("base_ms", 300)),
                 max_ms=int(retry.get("backoff", {}).get("max_ms", 4000)),
+                jitter=str(retry.get("backoff", {}).get("jitter", "full")),
+                budget_ratio=float(retry.get("budget", {}).get("ratio", 0.1)),
+                budget_burst=int(retry.get("budget", {}).get("burst", 10)),
+            ),
+            circuit=CircuitConfig(
+                enabled=bool(cb.get("enabled", False)),
+                failure_threshold=int(cb.get("failure_threshold", 5)),
+                open_ms=int(cb.get("open_ms", 30000)),
+                half_open_probes=int(cb.get("half_open_probes", 1)),
+                success_threshold=int(cb.get("success_threshold", 2)),
+                health_probe=bool(cb.get("health_probe", True)),
+                health_timeout_ms=int(cb.get("health_timeout_ms", 1000)),
+            ),
+            load=LoadConfig(
+                ewma_alpha=float(load.get("ewma_alpha", 0.3)),
+                initial_latency_ms=int(load.get("initial_latency_ms", 500)),
+            ),
+            hedging=HedgeConfig(
+                enabled=bool(hedge.get("enabled", False)),
+                delay_ms=int(hedge["delay_ms"]) if hedge.get("delay_ms") is not None else None,
+                percentile=float(hedge.get("percentile", 0.95)),
+                min_samples=int(hedge.get("min_samples", 20)),
+                min_delay_ms=int(hedge.get("min_delay_ms", 50)),
+                budget_ratio=float(hedge.get("budget_ratio", 0.05)),
+                budget_burst=int(hedge.get("budget_burst", 10)),
+            ),
+            affinity=AffinityConfig(
+                enabled=bool(aff.get("enabled", False)),
+                prefix_chars=int(aff.get("prefix_chars", 256)),
+                vnodes=int(aff.get("vnodes", 64)),
+                load_factor=float(aff.get("load_factor", 1.25)),
+                fail_cooldown_ms=int(aff.get("fail_cooldown_ms", 5000)),
             ),
         )
 
+    @staticmethod
+    def _parse_pool(cfg: Dict[str, Any]) -> PoolConfig:
+        pl = cfg.get("http_pool", {})
+        return PoolConfig(
+            max_connections=int(pl.get("max_connections", 256)),
+            max_keepalive_connections=int(pl.get("max_keepalive_connections", 64)),
+            keepalive_expiry_s=float(pl.get("keepalive_expiry_s", 30)),
+        )
+
+    @staticmethod
+    def _build_cache(cfg: Dict[str, Any]) -> Optional[ResponseCache]:
+        c = cfg.get("cache", {})
+        conf = CacheConfig(
+            enabled=bool(c.get("enabled", False)),
+            max_entries=int(c.get("max_entries", 1024)),
+            max_bytes=int(c.get("max_bytes", 16 * 1024 * 1024)),
+            ttl_s=float(c.get("ttl_s", 300)),
+        )
+        if not conf.enabled:
+            return None
+        return ResponseCache(conf.max_entries, conf.max_bytes, conf.ttl_s)
+
+    @staticmethod
+    def _parse_coalescing(cfg: Dict[str, Any]) -> CoalescingConfig:
+        c = cfg.get("coalescing", {})
+        return CoalescingConfig(
+            enabled=bool(c.get("enabled", False)),
+            deterministic_only=bool(c.get("deterministic_only", True)),
+        )
+
+    @staticmethod
+    def _parse_batching(pconf: Dict[str, Any]) -> BatchConfig:
+        b = pconf.get("batching") or {}
+        return BatchConfig(
+            enabled=bool(b.get("enabled", False)),
+            window_ms=int(b.get("window_ms", 10)),
+            max_batch_size=int(b.get("max_batch_size", 4)),
+            mode=str(b.get("mode", "pipelined")),
+            batch_path=str(b.get("batch_path", "/chat/completions/batch")),
+        )
+
+    def _build_batchers(self, cfg: Dict[str, Any]) -> Dict[str, MicroBatcher]:
+        res: Dict[str, MicroBatcher] = {}
+        for name, pconf in cfg.get("providers", {}).items():
+            b = self._parse_batching(pconf)
+            # "pipelined" sends every request on its own over the keep-alive
+            # pool and leaves batching to the backend's continuous batching;
+            # holding requests for a window would only add latency.
+            if pconf.get("type") != "http" or not b.enabled or b.mode != "json-array":
+                continue
+            res[name] = MicroBatcher(
+                name, b.window_ms, b.max_batch_size,
+                lambda items, provider=name: self._dispatch_batch(provider, items),
+            )
+        return res
+
+    @staticmethod
+    def _parse_bulkhead(pconf: Dict[str, Any]) -> BulkheadConfig:
+        b = pconf.get("bulkhead", {})
+        return BulkheadConfig(
+            enabled=bool(b.get("enabled", False)),
+            max_concurrent=int(b.get("max_concurrent", 32)),
+            max_queue=int(b.get("max_queue", 64)),
+            queue_timeout_ms=int(b.get("queue_timeout_ms", 1000)),
+        )
+
+    def _build_bulkheads(self, cfg: Dict[str, Any]) -> Dict[str, Bulkhead]:
+        res: Dict[str, Bulkhead] = {}
+        for name, pconf in cfg.get("providers", {}).items():
+            conf = self._parse_bulkhead(pconf)
+            if conf.enabled:
+                res[name] = Bulkhead(name, conf.max_concurrent, conf.max_queue, conf.queue_timeout_ms)
+        return res
+
+    def _build_health_monitor(self, cfg: Dict[str, Any]) -> Optional[ProviderHealthMonitor]:
+        h = cfg.get("health_monitor", {})
+        conf = HealthMonitorConfig(
+            enabled=bool(h.get("enabled", False)),
+            interval_ms=int(h.get("interval_ms", 5000)),
+            jitter_ratio=float(h.get("jitter_ratio", 0.2)),
+            unhealthy_threshold=int(h.get("unhealthy_threshold", 2)),
+        )
+        if not conf.enabled:
+            return None
+        return ProviderHealthMonitor(
+            list(cfg.get("providers", {}).keys()), self.check_health,
+            conf.interval_ms, conf.jitter_ratio, conf.unhealthy_threshold,
+        )
+
+    @staticmethod
+    def _build_limiter_store(cfg: Dict[str, Any]) -> Optional[SharedBucketStore]:
+        # "local" (default) keeps buckets per process; "shared" makes all
+        # workers on the host draw from one mmap'd slot table.
+        rl = cfg.get("rate_limit", {})
+        if rl.get("backend", "local") != "shared":
+            return None
+        return SharedBucketStore(rl.get("shared_path", "/dev/shm/theaterverse_llm_ratelimit"))
+
+    def _build_token_limiters(self, cfg: Dict[str, Any]) -> Dict[str, TokenBucket]:
+        # Tokens-per-minute budgets; providers without an entry are not TPM-limited.
+        rl = cfg.get("rate_limit", {})
+        tpm = rl.get("tokens_per_minute", {})
+        bursts = rl.get("tokens_burst", {})
+        res: Dict[str, TokenBucket] = {}
+        for name in cfg.get("providers", {}).keys():
+            if name in tpm:
+                res[name] = TokenBucket(int(tpm[name]), int(bursts.get(name, tpm[name])), name, "tpm", self.limiter_store)
+        return res
+
     def _build_rate_limiters(self, cfg: Dict[str, Any]) -> Dict[str, TokenBucket]:
         rl = cfg.get("rate_limit", {})
         burst = int(rl.get("burst", 10))
@@ -225,15 +2011,88 @@ class LLMAdapter:
         res: Dict[str, TokenBucket] = {}
         for name in cfg.get("providers", {}).keys():
             rpm = int(per.get(name, 60))
-            res[name] = TokenBucket(rpm, burst)
+            res[name] = TokenBucket(rpm, burst, name, "rpm", self.limiter_store)
+        return res
+
+    @staticmethod
+    def _parse_sse_line(line: str) -> Any:
+        # Only "data:" fields matter for OpenAI-compatible streams; comments/event names are skipped.
+        line = line.strip()
+        if not line.startswith("data:"):
+            return None
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return _SSE_DONE
+        if not data:
+            return None
+        try:
+            return json_loads(data)
+        except ValueError:
+            raise ProviderError(f"malformed stream chunk: {data[:80]}")
+
+    @classmethod
+    def _as_chunk(cls, obj: Dict[str, Any]) -> Dict[str, Any]:
+        full = cls._as_openai_min(obj)
+        message = (full.get("choices") or [{}])[0].get("message", {})
+        chunk = {
+            "id": full.get("id", "adp_generated"),
+            "object": "chat.completion.chunk",
+            "created": full.get("created", int(time.time())),
+            "model": full.get("model", "unknown"),
+            "choices": [{"index": 0, "delta": {"role": "assistant", "content": message.get("content", "")}, "finish_reason": "stop"}],
+        }
+        if full.get("usage"):
+            chunk["usage"] = full["usage"]
+        return chunk
+
+    @staticmethod
+    def _build_breakers(cfg: Dict[str, Any], routing: RoutingConfig) -> Dict[str, CircuitBreaker]:
+        c = routing.circuit
+        if not c.enabled:
+            return {}
+        return {
+            name: CircuitBreaker(name, c.failure_threshold, c.open_ms, c.half_open_probes, c.success_threshold)
+            for name in cfg.get("providers", {}).keys()
+        }
+
+    @staticmethod
+    def _build_retry_budgets(cfg: Dict[str, Any], routing: RoutingConfig) -> Dict[str, RatioBudget]:
+        # Retries per provider are capped at roughly budget_ratio of its calls;
+        # buckets start full so a cold process can still retry.
+        r = routing.retry
+        return {
+            name: RatioBudget(r.budget_ratio, r.budget_burst, initial=r.budget_burst)
+            for name in cfg.get("providers", {}).keys()
+        }
+
+    @staticmethod
+    def _build_affinity(cfg: Dict[str, Any], routing: RoutingConfig) -> Dict[str, AffinityRouter]:
+        # Only providers listing more than one instance in base_urls get a ring.
+        a = routing.affinity
+        if not a.enabled:
+            return {}
+        res: Dict[str, AffinityRouter] = {}
+        for name, pconf in cfg.get("providers", {}).items():
+            urls = pconf.get("base_urls") or []
+            if len(urls) > 1:
+                res[name] = AffinityRouter(name, urls, a.vnodes, a.load_factor, a.fail_cooldown_ms)
         return res
 
+    @staticmethod
+    def _build_stats(cfg: Dict[str, Any], routing: RoutingConfig) -> Dict[str, ProviderStats]:
+        ld = routing.load
+        return {
+            name: ProviderStats(name, ld.ewma_alpha, ld.initial_latency_ms / 1000.0)
+            for name in cfg.get("providers", {}).keys()
+        }
+
     @staticmethod
     def _as_openai_min(obj: Dict[str, Any]) -> Dict[str, Any]:
         # 荳驛ｨ縺ｮ閾ｪ蜑阪し繝ｼ繝舌・OpenAI莠呈鋤繧定ｿ斐☆縺後∝ｮ牙・蛛ｴ縺ｧ譛蟆丞､画鋤
         if "choices" in obj:
             return obj
-        # 譛菴朱剞縺ｮ謨ｴ蠖｢・・ontent縺ｮ諠ｳ螳壹く繝ｼ繧呈爾縺呻ｼ・        content = (
+        # 譛菴朱剞縺ｮ謨ｴ蠖｢・・ontent縺ｮ諠ｳ螳壹く繝ｼ繧呈爾縺呻ｼ・
+        content = (
             obj.get("message")
             or obj.get("output")
             or obj.get("text")
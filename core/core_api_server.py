@@ -3,18 +3,43 @@ System Validator / Theaterverse Final
 Core API Server - FastAPI application with integrated kernel and plugins.
 
 Provides lifecycle management and exposes HTTP endpoints.
+
+With API_WORKERS > 1 on a platform with fork(), run() becomes a pre-fork
+supervisor: configs, plugin modules and moderation rules are loaded once
+in the parent, gc.freeze() moves them out of the collector's reach, and the
+workers forked afterwards share those pages copy-on-write instead of each
+importing and loading everything again. The supervisor restarts workers
+that die and periodically reports each worker's unique memory (USS), which
+is what a worker really costs. It never starts threads itself, since every
+restart forks it again; the aggregated metrics endpoint (API_METRICS_PORT)
+runs in a forked child of its own.
 """
 
+import gc
 import logging
 import os
+import signal
+import socket
+import time
+from typing import Any, Dict, Optional
 from fastapi import FastAPI
 import uvicorn
 
 from .core_kernel import CoreKernel
+from .core_observability import (
+    init_metrics,
+    mark_worker_dead,
+    prepare_multiprocess_metrics,
+    record_worker_restart,
+    serve_multiprocess_metrics,
+    set_worker_memory,
+)
 from .core_router import CoreRouter
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_BASE_DIR = "/root/System_Validator/APP_DIR/theaterverse_final"
+
 
 class CoreAPIServer:
     def __init__(self, base_dir: str):
@@ -37,18 +62,197 @@ class CoreAPIServer:
         logger.info("Core API Server setup complete.")
         return self.app
 
-    def run(self):
-        app = self.setup()
+    def run(self, workers: Optional[int] = None):
         host = os.getenv("API_BIND_HOST", "0.0.0.0")
         port = int(os.getenv("API_BIND_PORT", "8080"))
-        uvicorn.run(app, host=host, port=port)
+        workers = workers or int(os.getenv("API_WORKERS", "1"))
+        if workers <= 1:
+            uvicorn.run(self.setup(), host=host, port=port)
+            return
+
+        # Each worker builds its own app through create_app(); metrics go to a
+        # shared directory and are scraped as one set (plugin route or API_METRICS_PORT).
+        os.environ["SYSTEM_VALIDATOR_BASE_DIR"] = self.base_dir
+        prepare_multiprocess_metrics(os.getenv("PROMETHEUS_MULTIPROC_DIR", "/run/system_validator_api/prometheus"))
+        metrics_port = os.getenv("API_METRICS_PORT")
+        if hasattr(os, "fork") and os.getenv("API_PREFORK", "1") != "0":
+            self._run_prefork(workers, host, port, int(metrics_port) if metrics_port else None)
+            return
+        serve_multiprocess_metrics(int(metrics_port) if metrics_port else None)
+        logger.info("Starting %d API workers on %s:%d", workers, host, port)
+        uvicorn.run("core.core_api_server:create_app", factory=True, host=host, port=port, workers=workers)
+
+    def _run_prefork(self, workers: int, host: str, port: int, metrics_port: Optional[int]) -> None:
+        # Nothing loaded below is garbage; keep the collector from touching
+        # (and so un-sharing) those objects until they are frozen.
+        gc.disable()
+        init_metrics()
+        app = self.setup()
+        sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        gc.collect()
+        gc.freeze()
+        logger.info("Pre-forking %d API workers on %s:%d (%d objects frozen)", workers, host, port, gc.get_freeze_count())
+        PreforkSupervisor(
+            app, sock, workers,
+            report_interval_s=float(os.getenv("API_MEMORY_REPORT_S", "60")),
+            metrics_port=metrics_port,
+        ).run()
+
+
+class PreforkSupervisor:
+    """Forks `workers` uvicorn servers of an app built in this process, on one shared socket."""
+
+    def __init__(self, app: Any, sock: socket.socket, workers: int, report_interval_s: float = 60.0, metrics_port: Optional[int] = None):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.report_interval_s = report_interval_s
+        self.metrics_port = metrics_port
+        self._children: Dict[int, int] = {}  # pid -> worker slot
+        self._spawned_at: Dict[int, float] = {}  # slot -> monotonic time
+        self._metrics_pid: Optional[int] = None
+        self._stopping = False
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+        if self.metrics_port is not None:
+            self._spawn_metrics()
+        for slot in range(self.workers):
+            self._spawn(slot)
+        # First report once workers have finished starting up.
+        next_report = time.monotonic() + min(5.0, self.report_interval_s)
+        while self._children:
+            self._reap()
+            if self.report_interval_s > 0 and not self._stopping and time.monotonic() >= next_report:
+                self.report_memory()
+                next_report = time.monotonic() + self.report_interval_s
+            time.sleep(0.5)
+        if self._metrics_pid is not None:
+            os.kill(self._metrics_pid, signal.SIGTERM)
+            os.waitpid(self._metrics_pid, 0)
+        logger.info("All API workers exited.")
+
+    def report_memory(self) -> Dict[int, Dict[str, int]]:
+        """Log and export USS / PSS / RSS of every live worker, keyed by slot."""
+        report: Dict[int, Dict[str, int]] = {}
+        for pid, slot in sorted(self._children.items(), key=lambda kv: kv[1]):
+            mem = worker_memory(pid)
+            if not mem:
+                continue
+            report[slot] = mem
+            set_worker_memory(slot, mem["uss"], mem["pss"], mem["rss"])
+            logger.info(
+                "worker %d (pid %d): uss %.1f MiB, pss %.1f MiB, rss %.1f MiB",
+                slot, pid, mem["uss"] / 2**20, mem["pss"] / 2**20, mem["rss"] / 2**20,
+            )
+        return report
+
+    def _spawn(self, slot: int) -> None:
+        self._spawned_at[slot] = time.monotonic()
+        pid = os.fork()
+        if pid:
+            self._children[pid] = slot
+            return
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            gc.enable()
+            uvicorn.Server(uvicorn.Config(self.app)).run(sockets=[self.sock])
+        except BaseException:  # noqa: BLE001
+            logger.exception("API worker %d crashed", slot)
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _spawn_metrics(self) -> None:
+        # The scrape server is a thread; running it here would leave a thread
+        # (and whatever locks it holds) in every later fork of the supervisor.
+        pid = os.fork()
+        if pid:
+            self._metrics_pid = pid
+            return
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            serve_multiprocess_metrics(self.metrics_port, reap_interval_s=None)
+            while True:
+                signal.pause()
+        except BaseException:  # noqa: BLE001
+            logger.exception("metrics server process crashed")
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid == self._metrics_pid:
+                self._metrics_pid = None
+                if not self._stopping:
+                    logger.warning("metrics server process exited with %d; restarting", os.waitstatus_to_exitcode(status))
+                    time.sleep(1.0)
+                    self._spawn_metrics()
+                continue
+            slot = self._children.pop(pid, None)
+            mark_worker_dead(pid)
+            if slot is None or self._stopping:
+                continue
+            logger.warning("API worker %d (pid %d) exited with %d; restarting", slot, pid, os.waitstatus_to_exitcode(status))
+            if time.monotonic() - self._spawned_at[slot] < 1.0:
+                time.sleep(1.0)  # crash loop: do not fork as fast as it dies
+            record_worker_restart(slot)
+            self._spawn(slot)
+
+    def _on_signal(self, signum: int, _frame: Any) -> None:
+        self._stopping = True
+        for pid in list(self._children) + ([self._metrics_pid] if self._metrics_pid is not None else []):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+def worker_memory(pid: int) -> Dict[str, int]:
+    """USS (private clean + dirty), PSS and RSS of `pid` in bytes; {} if unavailable."""
+    fields: Dict[str, int] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r", encoding="ascii") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                parts = rest.split()
+                if len(parts) == 2 and parts[1] == "kB":
+                    fields[key] = int(parts[0]) * 1024
+    except OSError:
+        return {}
+    return {
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "pss": fields.get("Pss", 0),
+        "rss": fields.get("Rss", 0),
+    }
+
+
+def create_app() -> FastAPI:
+    """App factory for multi-worker launches; runs once in every worker."""
+    # Registers this worker's metrics in the shared directory (no HTTP server
+    # of its own; the supervisor serves the aggregate).
+    init_metrics()
+    return CoreAPIServer(os.getenv("SYSTEM_VALIDATOR_BASE_DIR", DEFAULT_BASE_DIR)).setup()
 
 
 if __name__ == "__main__":
-    base_dir = os.getenv(
-        "SYSTEM_VALIDATOR_BASE_DIR",
-        "/root/System_Validator/APP_DIR/theaterverse_final",
-    )
+    base_dir = os.getenv("SYSTEM_VALIDATOR_BASE_DIR", DEFAULT_BASE_DIR)
     server = CoreAPIServer(base_dir)
     server.run()
 
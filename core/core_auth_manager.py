@@ -128,9 +128,11 @@ class CoreAuthManager:
     def check_scope_role(self, claims: Dict[str, Any], required_scopes: List[str], required_roles: Optional[List[str]] = None) -> bool:
         scopes = self._extract_scopes(claims)
         roles = set(claims.get("roles", []) or claims.get("role", []) or [])
-        # 繧ｹ繧ｳ繝ｼ繝・        if not set(required_scopes).issubset(scopes):
+        # 繧ｹ繧ｳ繝ｼ繝・
+        if not set(required_scopes).issubset(scopes):
             return False
-        # 蠖ｹ蜑ｲ・井ｻｻ諢擾ｼ・        if required_roles:
+        # 蠖ｹ蜑ｲ・井ｻｻ諢擾ｼ・
+        if required_roles:
             for s in required_scopes:
                 allowed = set(self.cfg.authorization_scopes.get(s, []))
                 if not roles & allowed:
@@ -214,7 +216,8 @@ class CoreAuthManager:
             return set(scope_str)
         return set(str(scope_str).split())
 
-    # 逶｣譟ｻ・・ostgreSQL・・    def _audit_pg(self, event: str, detail: Dict[str, Any]) -> None:
+    # 逶｣譟ｻ・・ostgreSQL・・
+    def _audit_pg(self, event: str, detail: Dict[str, Any]) -> None:
         import os
         import psycopg2  # type: ignore
         dsn = os.environ.get("DATABASE_URL") or "dbname=system_validator user=postgres password=postgres host=127.0.0.1 port=5432"
@@ -0,0 +1,83 @@
+﻿"""
+System Validator / Theaterverse Final
+Core Blocking Pool - sized thread pool for blocking calls made from async handlers.
+
+Anything that can block (today: access-token verification, i.e. JWKS
+fetches over urllib and JWT signature checks) is awaited through
+BlockingPool.run() instead of being called on the event loop, so one slow call cannot stall every other
+request in the worker. Queue depth, busy threads and saturation are
+exported per pool so max_workers can be sized from real load.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from .core_observability import observe_blocking_pool_wait, set_blocking_pool_load
+
+T = TypeVar("T")
+
+
+class BlockingPool:
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix=f"{name}-blocking")
+        self._queued = 0
+        self._active = 0
+        self._lock = threading.Lock()
+        self._report()
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run fn(*args, **kwargs) on the pool and await its result."""
+        submitted = time.perf_counter()
+        dequeued = False
+        with self._lock:
+            self._queued += 1
+            self._report()
+
+        def leave_queue() -> bool:
+            # Whichever side gets here first (the worker starting the job, or
+            # the awaiting task giving up on it) takes it off the queue.
+            nonlocal dequeued
+            if dequeued:
+                return False
+            dequeued = True
+            self._queued -= 1
+            return True
+
+        def call() -> T:
+            with self._lock:
+                leave_queue()
+                self._active += 1
+                self._report()
+            observe_blocking_pool_wait(self.name, time.perf_counter() - submitted)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._report()
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+        finally:
+            # A job cancelled (or dropped by shutdown) before a thread picked
+            # it up never runs call(), so it would otherwise stay queued.
+            with self._lock:
+                if leave_queue():
+                    self._report()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _report(self) -> None:
+        set_blocking_pool_load(self.name, self._queued, self._active, self._active / self.max_workers)
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_blocking_pool.py
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_blocking_pool.py
+# --- END OF STRUCTURE ---
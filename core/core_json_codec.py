@@ -0,0 +1,55 @@
+﻿"""
+System Validator / Theaterverse Final
+Core JSON Codec - one JSON encode/decode entry point for hot paths.
+
+Uses orjson when it is installed and falls back to the stdlib json module
+otherwise. Both backends emit compact UTF-8 (no ASCII escaping), so callers
+get the same bytes shape either way; key order differs only where
+sort_keys is not requested.
+"""
+
+import json
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson  # type: ignore
+    _ORJSON_AVAILABLE = True
+except Exception:  # pragma: no cover
+    orjson = None  # type: ignore
+    _ORJSON_AVAILABLE = False
+
+BACKEND = "orjson" if _ORJSON_AVAILABLE else "json"
+
+# Both orjson.JSONDecodeError and json.JSONDecodeError subclass ValueError.
+JSONDecodeError = orjson.JSONDecodeError if _ORJSON_AVAILABLE else json.JSONDecodeError
+
+Bytesish = Union[bytes, bytearray, memoryview, str]
+
+
+def dumps(obj: Any, *, sort_keys: bool = False, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """Encode `obj` to compact UTF-8 JSON bytes."""
+    if _ORJSON_AVAILABLE:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, default=default, option=option)
+    return json.dumps(
+        obj, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys, default=default,
+    ).encode("utf-8")
+
+
+def dumps_str(obj: Any, *, sort_keys: bool = False, default: Optional[Callable[[Any], Any]] = None) -> str:
+    """dumps() as str, for sinks that take text."""
+    return dumps(obj, sort_keys=sort_keys, default=default).decode("utf-8")
+
+
+def loads(data: Bytesish) -> Any:
+    if _ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    if isinstance(data, (bytearray, memoryview)):
+        data = bytes(data)
+    return json.loads(data)
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_json_codec.py
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_json_codec.py
+# --- END OF STRUCTURE ---
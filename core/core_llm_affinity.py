@@ -0,0 +1,141 @@
+﻿"""
+System Validator / Theaterverse Final
+Core LLM Affinity - prefix-affinity instance selection for multi-instance providers.
+
+Requests that share a prompt prefix (system preamble plus the start of the
+conversation) hash to the same point on a consistent-hash ring, so they
+land on the backend instance whose KV / prompt cache already holds that
+prefix. Consistent hashing with bounded loads keeps any instance from
+taking more than load_factor x its fair share of in-flight calls: a
+saturated owner passes the request to the next instance on the ring, and
+an instance that just failed is skipped for a short cooldown. A request
+with no prefix to key on goes to the least-loaded instance instead of
+piling every such request onto the model's owner.
+"""
+
+import bisect
+import hashlib
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from .core_observability import record_llm_affinity_pick, set_llm_instance_inflight
+
+
+def prefix_key(messages: Sequence[Dict[str, str]], model: Optional[str], prefix_chars: int) -> Optional[bytes]:
+    """Affinity key: the model, every system message, then the first
+    `prefix_chars` characters of the rest of the conversation (0 keys on
+    the system preamble alone). None when there is no prefix at all."""
+    system = [str(m.get("content", "")) for m in messages if m.get("role") == "system"]
+    rest = "\x1e".join(f"{m.get('role')}:{m.get('content', '')}" for m in messages if m.get("role") != "system")
+    head = rest[:max(0, prefix_chars)]
+    if not system and not head:
+        return None
+    text = "\x1f".join([model or "", *system, head])
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+
+
+def _point(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+class Instance:
+    __slots__ = ("url", "in_flight", "cooldown_until")
+
+    def __init__(self, url: str):
+        self.url = url
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+
+
+class AffinityRouter:
+    def __init__(self, provider: str, urls: Sequence[str], vnodes: int = 64, load_factor: float = 1.25, fail_cooldown_ms: int = 5000):
+        self.provider = provider
+        self.instances: List[Instance] = [Instance(u) for u in dict.fromkeys(urls)]
+        self.load_factor = max(1.0, load_factor)
+        self.fail_cooldown_s = max(0.0, fail_cooldown_ms / 1000.0)
+        self._lock = threading.Lock()
+        ring = sorted(
+            (_point(f"{inst.url}#{v}".encode("utf-8")), i)
+            for i, inst in enumerate(self.instances)
+            for v in range(max(1, vnodes))
+        )
+        self._points = [p for p, _ in ring]
+        self._owners = [i for _, i in ring]
+
+    def inherit(self, old: "AffinityRouter") -> None:
+        """Share live Instance objects with the router this one replaces.
+
+        Calls still running on the old router release the same counters the
+        new router reads, so a hot reload does not forget in-flight load.
+        """
+        live = {inst.url: inst for inst in old.instances}
+        self.instances = [live.get(inst.url, inst) for inst in self.instances]
+        self._lock = old._lock
+
+    @contextmanager
+    def route(self, key: Optional[bytes]) -> Iterator[Instance]:
+        """Pick an instance for `key` (least loaded for None) and count the
+        call against it until the block exits."""
+        inst = self._acquire(key)
+        try:
+            yield inst
+        finally:
+            self._release(inst)
+
+    def cool_down(self, inst: Instance) -> None:
+        """Skip `inst` for fail_cooldown_ms; its keys move to the next instance on the ring."""
+        with self._lock:
+            inst.cooldown_until = time.monotonic() + self.fail_cooldown_s
+
+    def _acquire(self, key: Optional[bytes]) -> Instance:
+        with self._lock:
+            now = time.monotonic()
+            n = len(self.instances)
+            total = sum(inst.in_flight for inst in self.instances)
+            capacity = math.ceil(self.load_factor * (total + 1) / n)
+            chosen: Optional[Instance] = None
+            outcome = "owner"
+            for step, inst in enumerate(self._walk(key) if key is not None else ()):
+                if inst.cooldown_until > now:
+                    continue
+                if inst.in_flight < capacity:
+                    chosen = inst
+                    outcome = "owner" if step == 0 else "spillover"
+                    break
+            if chosen is None:
+                # No key, or everything is cooling down or at capacity: least loaded wins.
+                chosen = min(self.instances, key=lambda inst: (inst.cooldown_until > now, inst.in_flight))
+                outcome = "fallback" if key is not None else "unkeyed"
+            chosen.in_flight += 1
+            in_flight = chosen.in_flight
+        record_llm_affinity_pick(self.provider, outcome)
+        set_llm_instance_inflight(self.provider, chosen.url, in_flight)
+        return chosen
+
+    def _release(self, inst: Instance) -> None:
+        with self._lock:
+            inst.in_flight = max(0, inst.in_flight - 1)
+            in_flight = inst.in_flight
+        set_llm_instance_inflight(self.provider, inst.url, in_flight)
+
+    def _walk(self, key: bytes) -> Iterator[Instance]:
+        # Distinct instances in ring order, starting at the key's owner.
+        start = bisect.bisect(self._points, _point(key)) % len(self._points)
+        seen = set()
+        for off in range(len(self._points)):
+            idx = self._owners[(start + off) % len(self._points)]
+            if idx in seen:
+                continue
+            seen.add(idx)
+            yield self.instances[idx]
+            if len(seen) == len(self.instances):
+                return
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_llm_affinity.py
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_llm_affinity.py
+# --- END OF STRUCTURE ---
@@ -0,0 +1,94 @@
+﻿"""
+System Validator / Theaterverse Final
+Core LLM Micro-Batcher - short-window request batching for local providers.
+
+Compatible requests (same group key) arriving within `window_ms` are
+collected up to `max_batch_size` and handed to a dispatch coroutine in one
+go; its per-item results or exceptions are fanned back out to the callers.
+Dispatch runs detached from the callers, so once every caller of a batch has
+been cancelled (hedge loser, deadline) the dispatch is cancelled as well.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+from .core_observability import observe_value
+
+logger = logging.getLogger(__name__)
+
+# dispatch(items) -> one result or exception per item, in order
+DispatchFn = Callable[[List[Any]], Awaitable[List[Any]]]
+
+
+class _Pending:
+    __slots__ = ("item", "future", "enqueued_at")
+
+    def __init__(self, item: Any, future: "asyncio.Future[Any]"):
+        self.item = item
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class MicroBatcher:
+    def __init__(self, name: str, window_ms: int, max_batch_size: int, dispatch: DispatchFn):
+        self.name = name
+        self.window_s = max(0.0, window_ms / 1000.0)
+        self.max_batch_size = max(1, max_batch_size)
+        self.dispatch = dispatch
+        self._queues: Dict[Hashable, List[_Pending]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+
+    async def submit(self, group: Hashable, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        pending = _Pending(item, loop.create_future())
+        queue = self._queues.setdefault(group, [])
+        queue.append(pending)
+        if len(queue) >= self.max_batch_size:
+            self._flush(group)
+        elif len(queue) == 1:
+            self._timers[group] = loop.call_later(self.window_s, self._flush, group)
+        return await pending.future
+
+    def _flush(self, group: Hashable) -> None:
+        timer = self._timers.pop(group, None)
+        if timer is not None:
+            timer.cancel()
+        batch = [p for p in self._queues.pop(group, []) if not p.future.done()]
+        if not batch:
+            return
+        now = time.monotonic()
+        observe_value("llm_batch_size", float(len(batch)), provider=self.name)
+        for p in batch:
+            observe_value("llm_batch_queue_wait_seconds", now - p.enqueued_at, provider=self.name)
+        task = asyncio.ensure_future(self._run(batch))
+        for p in batch:
+            p.future.add_done_callback(lambda _f, batch=batch, task=task: self._abandon(batch, task))
+
+    @staticmethod
+    def _abandon(batch: List[_Pending], task: "asyncio.Future[None]") -> None:
+        if not task.done() and all(p.future.cancelled() for p in batch):
+            task.cancel()
+
+    async def _run(self, batch: List[_Pending]) -> None:
+        try:
+            results = await self.dispatch([p.item for p in batch])
+        except BaseException as e:  # noqa: BLE001
+            results = [e] * len(batch)
+        if len(results) != len(batch):
+            logger.error("batch dispatch for %s returned %d results for %d items", self.name, len(results), len(batch))
+            results = [RuntimeError("batch result count mismatch")] * len(batch)
+        for p, r in zip(batch, results):
+            if p.future.done():
+                continue
+            if isinstance(r, BaseException):
+                p.future.set_exception(r)
+            else:
+                p.future.set_result(r)
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_llm_batcher.py
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_llm_batcher.py
+# --- END OF STRUCTURE ---
@@ -0,0 +1,142 @@
+﻿"""
+System Validator / Theaterverse Final
+Core LLM Bulkhead - per-provider concurrency limit with a bounded wait queue.
+
+At most `max_concurrent` calls run against a provider; up to `max_queue`
+more wait FIFO for a slot until their deadline. Anything beyond that is
+shed immediately so a spike turns into fast 503s instead of an unbounded
+pile of blocked threads. Sync threads and asyncio tasks share one queue;
+a released slot is handed straight to the head waiter.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Optional
+
+from .core_observability import record_llm_bulkhead_shed, set_llm_bulkhead_load
+
+
+class _Waiter:
+    __slots__ = ("event", "loop", "future", "granted")
+
+    def __init__(self, event: Optional[threading.Event] = None, loop: Any = None, future: Any = None):
+        self.event = event
+        self.loop = loop
+        self.future = future
+        self.granted = False
+
+
+class Bulkhead:
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout_ms: int = 1000):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout_s = max(0.0, queue_timeout_ms / 1000.0)
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def acquire(self, deadline: Optional[float] = None) -> bool:
+        """Take a slot, queueing until time.monotonic() reaches `deadline`.
+
+        Returns False when the call is shed (queue full or wait timed out).
+        """
+        with self._lock:
+            if self._try_take():
+                return True
+            waiter = self._enqueue(_Waiter(event=threading.Event()), deadline)
+            if waiter is None:
+                return False
+        waiter.event.wait(max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._abandon(waiter)
+        record_llm_bulkhead_shed(self.name, "timeout")
+        return False
+
+    async def acquire_async(self, deadline: Optional[float] = None) -> bool:
+        """asyncio variant of acquire(); waits on a future, not a thread."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_take():
+                return True
+            waiter = self._enqueue(_Waiter(loop=loop, future=loop.create_future()), deadline)
+            if waiter is None:
+                return False
+        try:
+            await asyncio.wait_for(waiter.future, max(0.0, deadline - time.monotonic()))
+            return True
+        except asyncio.TimeoutError:
+            record_llm_bulkhead_shed(self.name, "timeout")
+            return False
+        finally:
+            with self._lock:
+                if not waiter.granted:
+                    self._abandon(waiter)
+            # A slot granted to a waiter that already gave up is passed on by _resolve().
+
+    def release(self) -> None:
+        with self._lock:
+            if self._waiters:
+                # Hand the slot over directly; in_flight stays the same.
+                self._grant(self._waiters.popleft())
+            else:
+                self.in_flight = max(0, self.in_flight - 1)
+            self._report()
+
+    # ----------------------------- internals ----------------------------- #
+    def _try_take(self) -> bool:
+        if self.in_flight < self.max_concurrent and not self._waiters:
+            self.in_flight += 1
+            self._report()
+            return True
+        return False
+
+    def _enqueue(self, waiter: _Waiter, deadline: Optional[float]) -> Optional[_Waiter]:
+        if deadline is None or deadline <= time.monotonic():
+            # No time left to wait in; not a sign of a full queue.
+            record_llm_bulkhead_shed(self.name, "deadline")
+            return None
+        if len(self._waiters) >= self.max_queue:
+            record_llm_bulkhead_shed(self.name, "queue_full")
+            return None
+        self._waiters.append(waiter)
+        self._report()
+        return waiter
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        self._report()
+
+    def _grant(self, waiter: _Waiter) -> None:
+        waiter.granted = True
+        if waiter.event is not None:
+            waiter.event.set()
+        else:
+            waiter.loop.call_soon_threadsafe(self._resolve, waiter)
+
+    def _resolve(self, waiter: _Waiter) -> None:
+        if waiter.future.done():
+            # Timed out or cancelled between the grant and this callback.
+            self.release()
+        else:
+            waiter.future.set_result(True)
+
+    def _report(self) -> None:
+        set_llm_bulkhead_load(self.name, self.in_flight, len(self._waiters))
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_llm_bulkhead.py
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_llm_bulkhead.py
+# --- END OF STRUCTURE ---
@@ -0,0 +1,69 @@
+﻿"""
+System Validator / Theaterverse Final
+Core LLM Config Watcher - mtime polling for llm_connector_config.json.
+
+A daemon thread stats the file on an interval and calls `on_change` when
+its (mtime, size) signature moves. Rebuilding and swapping the adapter
+state is the callback's job; the watcher only detects edits.
+"""
+
+import logging
+import os
+import threading
+from typing import Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigFileWatcher:
+    def __init__(self, path: str, interval_ms: int, on_change: Callable[[], None]):
+        self.path = path
+        self.interval_s = max(0.1, interval_ms / 1000.0)
+        self.on_change = on_change
+        self._signature = self._stat()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="llm-config-watcher", daemon=True)
+        self._thread.start()
+        logger.info("LLM config watcher started (path=%s, interval=%.1fs)", self.path, self.interval_s)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_s * 2)
+            self._thread = None
+
+    def poll(self) -> bool:
+        """Check once; returns True when a change was seen and handed to on_change."""
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return False
+        self._signature = signature
+        try:
+            self.on_change()
+        except Exception:  # noqa: BLE001
+            logger.exception("LLM config reload failed for %s", self.path)
+        return True
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        # Editors that write via rename briefly leave no file; skip that poll.
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self.poll()
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_llm_config_watcher.py
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_llm_config_watcher.py
+# --- END OF STRUCTURE ---
@@ -0,0 +1,112 @@
+﻿"""
+System Validator / Theaterverse Final
+Core LLM Health Monitor - background probing of provider health endpoints.
+
+A daemon thread probes every provider on an interval with jitter and keeps
+a shared health table that the adapter consults before routing.
+"""
+
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from .core_observability import set_llm_provider_health
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HealthStatus:
+    healthy: bool = True
+    consecutive_failures: int = 0
+    last_checked: float = 0.0
+    probe_latency_s: float = 0.0
+
+
+class ProviderHealthMonitor:
+    def __init__(
+        self,
+        providers: List[str],
+        probe: Callable[[str], bool],
+        interval_ms: int,
+        jitter_ratio: float,
+        unhealthy_threshold: int,
+    ):
+        self.providers = list(providers)
+        self.probe = probe
+        self.interval_s = max(0.1, interval_ms / 1000.0)
+        self.jitter_ratio = min(1.0, max(0.0, jitter_ratio))
+        self.unhealthy_threshold = max(1, unhealthy_threshold)
+        self.table: Dict[str, HealthStatus] = {name: HealthStatus() for name in self.providers}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="llm-health-monitor", daemon=True)
+        self._thread.start()
+        logger.info("LLM health monitor started (interval=%.1fs, providers=%s)", self.interval_s, self.providers)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_s * 2)
+            self._thread = None
+
+    def is_down(self, provider: str) -> bool:
+        with self._lock:
+            st = self.table.get(provider)
+            if st is None or st.healthy:
+                return False
+            # Fail open: if every provider looks down the table is more likely
+            # wrong than the whole fleet, so let requests try.
+            return any(s.healthy for s in self.table.values())
+
+    def check_now(self, provider: str) -> bool:
+        started = time.monotonic()
+        try:
+            ok = bool(self.probe(provider))
+        except Exception:  # noqa: BLE001
+            ok = False
+        latency = time.monotonic() - started
+        with self._lock:
+            st = self.table.setdefault(provider, HealthStatus())
+            st.last_checked = time.time()
+            st.probe_latency_s = latency
+            if ok:
+                st.consecutive_failures = 0
+                if not st.healthy:
+                    logger.info("provider %s is healthy again", provider)
+                st.healthy = True
+            else:
+                st.consecutive_failures += 1
+                if st.healthy and st.consecutive_failures >= self.unhealthy_threshold:
+                    logger.warning("provider %s marked unhealthy after %d failed probes", provider, st.consecutive_failures)
+                    st.healthy = False
+            healthy = st.healthy
+        set_llm_provider_health(provider, healthy, latency)
+        return ok
+
+    def _run(self) -> None:
+        # Random initial offset so several workers do not probe in lockstep.
+        if self._stop.wait(random.uniform(0, self.interval_s)):
+            return
+        while not self._stop.is_set():
+            for name in self.providers:
+                if self._stop.is_set():
+                    return
+                self.check_now(name)
+            jitter = self.interval_s * self.jitter_ratio
+            self._stop.wait(self.interval_s + random.uniform(-jitter, jitter))
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_llm_health.py
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_llm_health.py
+# --- END OF STRUCTURE ---
@@ -0,0 +1,86 @@
+﻿"""
+System Validator / Theaterverse Final
+Core LLM Response Cache - bounded LRU/TTL cache for deterministic chat calls.
+
+Entries are stored JSON-encoded so every hit returns a fresh copy and the
+memory bound can be enforced on actual payload bytes.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .core_json_codec import dumps as json_dumps, loads as json_loads
+from .core_observability import record_llm_cache_event, set_llm_cache_size
+
+
+def canonical_key(messages: List[Dict[str, str]], model: Optional[str], params: Dict[str, Any]) -> str:
+    """Stable hash of a chat request; dict key order does not matter."""
+    doc = {"messages": messages, "model": model, "params": params}
+    return hashlib.sha256(json_dumps(doc, sort_keys=True, default=str)).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int, max_bytes: int, ttl_s: float):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(1, max_bytes)
+        self.ttl_s = max(0.0, ttl_s)
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                record_llm_cache_event("miss")
+                return None
+            expires_at, data = entry
+            if time.monotonic() >= expires_at:
+                self._drop(key)
+                record_llm_cache_event("expired")
+                record_llm_cache_event("miss")
+                self._report()
+                return None
+            self._entries.move_to_end(key)
+        record_llm_cache_event("hit")
+        return json_loads(data)
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        data = json_dumps(value)
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl_s, data)
+            self._bytes += len(data)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                record_llm_cache_event("eviction")
+            self._report()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._report()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, key: str) -> None:
+        _, data = self._entries.pop(key)
+        self._bytes -= len(data)
+
+    def _report(self) -> None:
+        set_llm_cache_size(len(self._entries), self._bytes)
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_llm_response_cache.py
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_llm_response_cache.py
+# --- END OF STRUCTURE ---
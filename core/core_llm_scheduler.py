@@ -0,0 +1,202 @@
+﻿"""
+System Validator / Theaterverse Final
+Core LLM Scheduler - priority classes and per-tenant weighted fair queuing in front of the adapter.
+
+A fixed number of dispatch slots is shared by every /v1/chat caller. When
+they are all taken, requests wait in one queue per priority class; a freed
+slot always goes to the highest-priority class that has waiters, and within
+a class tenants are served by self-clocked weighted fair queuing, so one
+tenant's batch run cannot push another tenant's requests to the back.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from .core_adapter_llm import DeadlineExceededError, OverloadedError
+from .core_observability import (
+    observe_llm_scheduler_wait,
+    record_llm_scheduler_rejected,
+    set_llm_scheduler_load,
+)
+
+
+class SchedulerFullError(OverloadedError):
+    status = 503
+
+
+@dataclass
+class SchedulerConfig:
+    enabled: bool
+    max_concurrent: int
+    max_queue: int
+    classes: Dict[str, int]
+    default_class: str
+    tenant_weights: Dict[str, float] = field(default_factory=dict)
+    default_weight: float = 1.0
+
+
+class _Waiter:
+    __slots__ = ("future", "tenant", "granted")
+
+    def __init__(self, future: "asyncio.Future[bool]", tenant: str):
+        self.future = future
+        self.tenant = tenant
+        self.granted = False
+
+
+class _ClassQueue:
+    """WFQ state for one priority class: finish tags per tenant and a tag-ordered heap."""
+
+    def __init__(self, name: str, priority: int):
+        self.name = name
+        self.priority = priority
+        self.virtual_time = 0.0
+        self.finish: Dict[str, float] = {}
+        self.heap: List[Tuple[float, int, _Waiter]] = []
+        self.waiting = 0
+
+    def push(self, waiter: _Waiter, weight: float, seq: int) -> None:
+        start = max(self.virtual_time, self.finish.get(waiter.tenant, 0.0))
+        tag = start + 1.0 / weight
+        self.finish[waiter.tenant] = tag
+        heapq.heappush(self.heap, (tag, seq, waiter))
+        self.waiting += 1
+
+    def pop(self) -> Optional[_Waiter]:
+        while self.heap:
+            tag, _, waiter = heapq.heappop(self.heap)
+            if waiter.future.done():
+                continue  # gave up (deadline or disconnect); already uncounted
+            self.virtual_time = tag
+            self.waiting -= 1
+            if not self.waiting:
+                # Every remaining tag is <= virtual_time, so they no longer matter.
+                self.finish.clear()
+            return waiter
+        return None
+
+
+class FairScheduler:
+    def __init__(self, cfg: SchedulerConfig):
+        self.cfg = cfg
+        self.in_flight = 0
+        self._seq = itertools.count()
+        self._classes: Dict[str, _ClassQueue] = {
+            name: _ClassQueue(name, prio) for name, prio in cfg.classes.items()
+        }
+        self._order = sorted(self._classes.values(), key=lambda q: q.priority)
+        self._ewma_hold_s = 0.5
+        self._report()
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> "FairScheduler":
+        return cls(cls._parse_config(settings or {}))
+
+    @staticmethod
+    def _parse_config(s: Dict[str, Any]) -> SchedulerConfig:
+        classes = {str(k): int(v.get("priority", 0)) for k, v in (s.get("classes") or {}).items()}
+        if not classes:
+            classes = {"interactive": 0, "batch": 1}
+        default_class = str(s.get("default_class", next(iter(classes))))
+        if default_class not in classes:
+            raise ValueError(f"scheduler.default_class '{default_class}' is not a configured class")
+        weights = {str(k): float(v) for k, v in (s.get("tenant_weights") or {}).items()}
+        return SchedulerConfig(
+            enabled=bool(s.get("enabled", False)),
+            max_concurrent=max(1, int(s.get("max_concurrent", 64))),
+            max_queue=max(0, int(s.get("max_queue", 1024))),
+            classes=classes,
+            default_class=default_class,
+            tenant_weights={k: v for k, v in weights.items() if v > 0},
+            default_weight=max(1e-6, float(s.get("default_weight", 1.0))),
+        )
+
+    def resolve_class(self, requested: Optional[str]) -> str:
+        if requested and requested in self._classes:
+            return requested
+        return self.cfg.default_class
+
+    @property
+    def queued(self) -> int:
+        return sum(q.waiting for q in self._order)
+
+    @asynccontextmanager
+    async def slot(self, tenant: str, klass: str, deadline: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold one dispatch slot for the body; queues fairly while all slots are busy."""
+        if not self.cfg.enabled:
+            yield
+            return
+        await self.acquire(tenant, klass, deadline)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._ewma_hold_s += 0.2 * ((time.monotonic() - started) - self._ewma_hold_s)
+            self.release()
+
+    async def acquire(self, tenant: str, klass: str, deadline: Optional[float] = None) -> None:
+        queue = self._classes[self.resolve_class(klass)]
+        enqueued = time.monotonic()
+        if self.in_flight < self.cfg.max_concurrent and not self.queued:
+            self.in_flight += 1
+            self._report()
+            observe_llm_scheduler_wait(queue.name, 0.0)
+            return
+        if self.queued >= self.cfg.max_queue:
+            record_llm_scheduler_rejected(queue.name, "queue_full")
+            raise SchedulerFullError(
+                f"scheduler queue full ({self.queued} waiting)",
+                retry_after_s=self._ewma_hold_s * max(1.0, self.queued / self.cfg.max_concurrent),
+            )
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), tenant)
+        queue.push(waiter, self.cfg.tenant_weights.get(tenant, self.cfg.default_weight), next(self._seq))
+        self._report()
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            self._give_up(queue, waiter)
+            record_llm_scheduler_rejected(queue.name, "deadline")
+            raise DeadlineExceededError("deadline exceeded while queued in the scheduler")
+        except asyncio.CancelledError:
+            self._give_up(queue, waiter)
+            raise
+        observe_llm_scheduler_wait(queue.name, time.monotonic() - enqueued)
+
+    def release(self) -> None:
+        for queue in self._order:
+            waiter = queue.pop()
+            if waiter is not None:
+                # Hand the slot over directly; in_flight stays the same.
+                waiter.granted = True
+                waiter.future.set_result(True)
+                break
+        else:
+            self.in_flight = max(0, self.in_flight - 1)
+        self._report()
+
+    def _give_up(self, queue: _ClassQueue, waiter: _Waiter) -> None:
+        if waiter.granted:
+            # Granted in the same tick the wait ended; pass the slot on.
+            self.release()
+            return
+        waiter.future.cancel()
+        queue.waiting -= 1
+        if not queue.waiting:
+            queue.heap.clear()
+            queue.finish.clear()
+        self._report()
+
+    def _report(self) -> None:
+        set_llm_scheduler_load(self.in_flight, {q.name: q.waiting for q in self._order})
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_llm_scheduler.py
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_llm_scheduler.py
+# --- END OF STRUCTURE ---
@@ -0,0 +1,303 @@
+﻿"""
+System Validator / Theaterverse Final
+Core LLM Session Store - bounded server-side conversation history for session_id chats.
+
+Clients in session mode send only the new messages of a turn; the store
+prepends the history it already holds and appends the turn plus the
+assistant reply once the call succeeds. Turns on one session run one at a
+time. Sessions leave memory when idle longer than idle_ttl_s or, oldest
+first, when the total history exceeds max_bytes or there are more than
+max_entries of them; with spill enabled they are written to the
+storage_plugin_state table and read back on next use. A session whose
+history was dropped instead (no spill, or the spill write failed) raises
+SessionLostError on its next turn rather than silently starting over.
+
+With write_through (needed when several workers serve the same sessions)
+every committed turn is saved to the spill table at once and every turn
+reloads the history from it, so the table, not one worker's memory, holds
+the conversation. Concurrent turns on one session in different workers
+are not serialized; the last commit wins.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+from .core_json_codec import dumps as json_dumps, loads as json_loads
+from .core_observability import record_llm_session_event, set_llm_session_size
+
+logger = logging.getLogger(__name__)
+
+Messages = List[Dict[str, str]]
+
+
+class SessionLostError(RuntimeError):
+    """The session's history was evicted and could not be kept."""
+
+
+class StateTableSpill:
+    """Spilled sessions as storage_plugin_state rows keyed "<prefix><session key>"."""
+
+    def __init__(self, prefix: str = "llm_session:"):
+        # Imported here so the DB stack is only required when spill is enabled.
+        from sqlalchemy import text  # type: ignore
+        from db.db_connection_pool import DBPool
+
+        self.prefix = prefix
+        self._text = text
+        self._pool = DBPool()
+
+    async def load(self, key: str) -> Optional[Messages]:
+        async with self._pool.session_factory() as db:
+            result = await db.execute(
+                self._text("SELECT value::text FROM storage_plugin_state WHERE key = :key"),
+                {"key": self.prefix + key},
+            )
+            row = result.first()
+        return json_loads(row[0]) if row and row[0] else None
+
+    async def save(self, key: str, messages: Messages) -> None:
+        async with self._pool.session_factory() as db:
+            await db.execute(
+                self._text(
+                    "INSERT INTO storage_plugin_state (key, value, updated_at) "
+                    "VALUES (:key, CAST(:value AS JSONB), NOW()) "
+                    "ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, updated_at = NOW()"
+                ),
+                {"key": self.prefix + key, "value": json_dumps(messages).decode("utf-8")},
+            )
+            await db.commit()
+
+    async def delete(self, key: str) -> None:
+        async with self._pool.session_factory() as db:
+            await db.execute(
+                self._text("DELETE FROM storage_plugin_state WHERE key = :key"),
+                {"key": self.prefix + key},
+            )
+            await db.commit()
+
+
+class Session:
+    __slots__ = ("key", "messages", "nbytes", "last_used", "lock", "active", "loaded", "deleted")
+
+    def __init__(self, key: str):
+        self.key = key
+        self.messages: Messages = []
+        self.nbytes = 0
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.active = 0
+        self.loaded = False
+        # Set by SessionStore.delete(); a turn still in flight records nothing.
+        self.deleted = False
+
+    def history(self) -> Messages:
+        return list(self.messages)
+
+
+class SessionStore:
+    def __init__(
+        self,
+        max_bytes: int,
+        idle_ttl_s: float,
+        spill: Optional[StateTableSpill] = None,
+        max_entries: int = 10000,
+        write_through: bool = False,
+    ):
+        if write_through and spill is None:
+            raise ValueError("write_through needs a spill store")
+        self.max_bytes = max(1, max_bytes)
+        self.idle_ttl_s = max(0.0, idle_ttl_s)
+        self.spill = spill
+        self.write_through = write_through
+        self.max_entries = max(1, max_entries)
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        # Keys whose history was dropped; bounded like the sessions themselves.
+        self._lost: "OrderedDict[str, None]" = OrderedDict()
+        self._bytes = 0
+        self._spilling: Dict[str, asyncio.Task] = {}
+
+    @asynccontextmanager
+    async def turn(self, key: str) -> AsyncIterator[Session]:
+        """Exclusive access to one session for the length of a chat turn.
+
+        Raises SessionLostError (once) if the key's history was dropped.
+        """
+        session = self._sessions.get(key)
+        if session is None:
+            if key in self._lost:
+                del self._lost[key]
+                record_llm_session_event("lost")
+                raise SessionLostError("session history expired; start a new session")
+            session = self._sessions[key] = Session(key)
+        self._sessions.move_to_end(key)
+        session.active += 1
+        if len(self._sessions) > self.max_entries:
+            self._evict()
+        try:
+            async with session.lock:
+                if not session.loaded or self.write_through:
+                    # Write-through: another worker may have moved the session on.
+                    await self._restore(session)
+                else:
+                    record_llm_session_event("hit")
+                yield session
+        finally:
+            session.last_used = time.monotonic()
+            if key in self._sessions:
+                self._sessions.move_to_end(key)
+            session.active -= 1
+            self._evict()
+
+    def append(self, session: Session, messages: Messages) -> None:
+        if session.deleted:
+            return
+        size = sum(len(json_dumps(m)) for m in messages)
+        session.messages.extend(messages)
+        session.nbytes += size
+        self._bytes += size
+        self._report()
+
+    async def commit(self, session: Session, messages: Messages) -> None:
+        """Record a finished turn; with write_through it is saved before returning.
+
+        A failed write-through drops the session, so its next turn raises
+        SessionLostError instead of running on a history missing this turn.
+        """
+        if session.deleted:
+            return  # deleted mid-turn: must not come back, in memory or in the spill
+        self.append(session, messages)
+        if not self.write_through:
+            return
+        try:
+            await self.spill.save(session.key, session.messages)
+        except Exception as e:  # noqa: BLE001
+            if session.deleted:
+                return
+            record_llm_session_event("spill_error")
+            logger.warning("session %s: write-through failed, history dropped: %s", session.key, e)
+            if self._sessions.get(session.key) is session:
+                del self._sessions[session.key]
+            self._bytes -= session.nbytes
+            session.messages, session.nbytes = [], 0
+            self._mark_lost(session.key)
+            self._report()
+            return
+        if session.deleted:
+            # delete() ran while this save was in flight; the row must not outlive it.
+            await self.spill.delete(session.key)
+
+    async def delete(self, key: str) -> None:
+        self._lost.pop(key, None)
+        session = self._sessions.get(key)
+        if session is not None:
+            # Also while a turn is in flight: its commit becomes a no-op.
+            session.deleted = True
+            self._drop(session)
+            session.messages, session.nbytes = [], 0
+        pending = self._spilling.get(key)
+        if pending is not None:
+            # An eviction write still landing would bring the row back.
+            await asyncio.wait([pending])
+        if self.spill is not None:
+            await self.spill.delete(key)
+        self._report()
+
+    async def aclose(self) -> None:
+        """Spill everything still in memory (if enabled) and wait for pending writes."""
+        for session in list(self._sessions.values()):
+            self._drop(session, spill=True)
+        if self._spilling:
+            await asyncio.gather(*self._spilling.values(), return_exceptions=True)
+        self._report()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    # ----------------------------- internals ----------------------------- #
+    async def _restore(self, session: Session) -> None:
+        session.loaded = True
+        self._bytes -= session.nbytes
+        session.messages, session.nbytes = [], 0
+        messages = None
+        pending = self._spilling.get(session.key)
+        if pending is not None:
+            # Evicted moments ago; let that write land before reading it back.
+            await asyncio.wait([pending])
+        if self.spill is not None:
+            try:
+                messages = await self.spill.load(session.key)
+            except Exception as e:  # noqa: BLE001
+                record_llm_session_event("spill_error")
+                logger.warning("session %s: spill load failed: %s", session.key, e)
+        if messages:
+            self.append(session, messages)
+            record_llm_session_event("restored")
+        else:
+            record_llm_session_event("miss")
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for session in list(self._sessions.values()):
+            if now - session.last_used < self.idle_ttl_s:
+                break  # ordered by last use; the rest are fresher
+            if not session.active:
+                self._drop(session, spill=True)
+                record_llm_session_event("evicted_idle")
+        for session in list(self._sessions.values()):
+            if self._bytes <= self.max_bytes:
+                break
+            if not session.active:
+                self._drop(session, spill=True)
+                record_llm_session_event("evicted_bytes")
+        for session in list(self._sessions.values()):
+            if len(self._sessions) <= self.max_entries:
+                break
+            if not session.active:
+                self._drop(session, spill=True)
+                record_llm_session_event("evicted_entries")
+        self._report()
+
+    def _drop(self, session: Session, spill: bool = False) -> None:
+        # spill=True: evicted, so the history is kept if it can be.
+        self._sessions.pop(session.key, None)
+        self._bytes -= session.nbytes
+        if not spill or not session.messages or self.write_through:
+            return  # write-through: already saved on every commit
+        if self.spill is None:
+            self._mark_lost(session.key)
+            return
+        task = asyncio.get_running_loop().create_task(self._spill(session.key, session.messages))
+        self._spilling[session.key] = task
+        task.add_done_callback(lambda t, key=session.key: self._forget_spill(key, t))
+
+    def _mark_lost(self, key: str) -> None:
+        self._lost[key] = None
+        self._lost.move_to_end(key)
+        while len(self._lost) > self.max_entries:
+            self._lost.popitem(last=False)
+
+    def _forget_spill(self, key: str, task: asyncio.Task) -> None:
+        if self._spilling.get(key) is task:
+            del self._spilling[key]
+
+    async def _spill(self, key: str, messages: Messages) -> None:
+        try:
+            await self.spill.save(key, messages)
+            record_llm_session_event("spilled")
+        except Exception as e:  # noqa: BLE001
+            record_llm_session_event("spill_error")
+            logger.warning("session %s: spill failed, history dropped: %s", key, e)
+            self._mark_lost(key)
+
+    def _report(self) -> None:
+        set_llm_session_size(len(self._sessions), self._bytes)
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_llm_session_store.py
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_llm_session_store.py
+# --- END OF STRUCTURE ---
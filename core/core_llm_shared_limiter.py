@@ -0,0 +1,134 @@
+﻿"""
+System Validator / Theaterverse Final
+Core LLM Shared Limiter - host-wide token bucket state for multi-worker deployments.
+
+Each uvicorn worker builds its own TokenBucket set, so without shared state
+the effective limit is per_provider x workers. SharedBucketStore keeps one
+slot per (provider, limit) in an mmap'd file; slot updates are serialized
+across processes with fcntl byte-range locks, so every worker on the host
+draws from the same budget.
+"""
+
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict
+
+try:
+    import fcntl  # type: ignore
+    _FCNTL_AVAILABLE = True
+except Exception:  # pragma: no cover
+    fcntl = None  # type: ignore
+    _FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"TVRL0001"
+_HEADER_SIZE = 16
+# name (40 bytes, NUL padded) | tokens (double) | timestamp (double) | reserved
+_SLOT = struct.Struct("<40sdd8x")
+_MAX_SLOTS = 64
+
+
+class SharedBucketStore:
+    """Slot table of (tokens, timestamp) pairs shared by all workers on a host.
+
+    Timestamps are time.monotonic(), which is system-wide on Linux; a slot
+    older than the current boot (negative elapsed) is treated as full.
+    """
+
+    def __init__(self, path: str) -> None:
+        if not _FCNTL_AVAILABLE:
+            raise RuntimeError("shared rate limiter requires fcntl (POSIX)")
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = _HEADER_SIZE + _SLOT.size * _MAX_SLOTS
+        self._with_range_lock(0, _HEADER_SIZE, lambda: self._init_file(size))
+        self._mm = mmap.mmap(self._fd, size)
+        # fcntl locks are per process; threads in one process serialize here.
+        self._lock = threading.Lock()
+        self._slots: Dict[str, int] = {}
+
+    def slot(self, key: str, capacity: float) -> int:
+        """Find or claim the slot for `key` (e.g. "vllm:rpm"); new slots start full."""
+        if key in self._slots:
+            return self._slots[key]
+        raw = key.encode("utf-8")[:40]
+        with self._lock:
+            idx = self._with_range_lock(0, _HEADER_SIZE, lambda: self._claim(raw, capacity))
+        self._slots[key] = idx
+        return idx
+
+    def take(self, idx: int, cost: float, capacity: float, rate_per_sec: float) -> float:
+        """Take `cost` tokens; 0.0 when taken, else seconds until enough refill."""
+        def op() -> float:
+            tokens = self._refill(idx, capacity, rate_per_sec)
+            if tokens >= cost:
+                self._write(idx, tokens - cost)
+                return 0.0
+            return (cost - tokens) / rate_per_sec
+        with self._lock:
+            return self._with_range_lock(self._offset(idx), _SLOT.size, op)
+
+    def settle(self, idx: int, delta: float, capacity: float, rate_per_sec: float) -> None:
+        """Charge (positive) or refund (negative) tokens; the slot may go into debt."""
+        def op() -> None:
+            tokens = self._refill(idx, capacity, rate_per_sec)
+            self._write(idx, min(capacity, tokens - delta))
+        with self._lock:
+            self._with_range_lock(self._offset(idx), _SLOT.size, op)
+
+    def close(self) -> None:
+        self._mm.close()
+        os.close(self._fd)
+
+    # ----------------------------- internals ----------------------------- #
+    def _init_file(self, size: int) -> None:
+        if os.fstat(self._fd).st_size >= size and os.pread(self._fd, len(_MAGIC), 0) == _MAGIC:
+            return
+        os.ftruncate(self._fd, 0)
+        os.ftruncate(self._fd, size)
+        os.pwrite(self._fd, _MAGIC, 0)
+
+    def _claim(self, raw: bytes, capacity: float) -> int:
+        padded = raw.ljust(40, b"\0")
+        for idx in range(_MAX_SLOTS):
+            name, _tokens, _ts = _SLOT.unpack_from(self._mm, self._offset(idx))
+            if name == padded:
+                return idx
+            if name == b"\0" * 40:
+                _SLOT.pack_into(self._mm, self._offset(idx), padded, float(capacity), time.monotonic())
+                return idx
+        raise RuntimeError(f"shared rate limiter slot table full ({_MAX_SLOTS}): {self.path}")
+
+    def _refill(self, idx: int, capacity: float, rate_per_sec: float) -> float:
+        _name, tokens, ts = _SLOT.unpack_from(self._mm, self._offset(idx))
+        now = time.monotonic()
+        elapsed = now - ts
+        if elapsed < 0:
+            return float(capacity)
+        return min(float(capacity), tokens + elapsed * rate_per_sec)
+
+    def _write(self, idx: int, tokens: float) -> None:
+        # Name is untouched; only tokens and timestamp follow it.
+        struct.pack_into("<dd", self._mm, self._offset(idx) + 40, tokens, time.monotonic())
+
+    @staticmethod
+    def _offset(idx: int) -> int:
+        return _HEADER_SIZE + idx * _SLOT.size
+
+    def _with_range_lock(self, start: int, length: int, fn):
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+        try:
+            return fn()
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_llm_shared_limiter.py
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_llm_shared_limiter.py
+# --- END OF STRUCTURE ---
@@ -0,0 +1,92 @@
+﻿"""
+System Validator / Theaterverse Final
+Core LLM Single-Flight - coalescing of identical concurrent chat calls.
+
+The first caller for a key performs the upstream call; callers arriving
+while it is in flight wait for it and receive a copy of its result, or
+the same exception.
+"""
+
+import asyncio
+import copy
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .core_observability import record_llm_coalesced, set_llm_coalesced_inflight
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Thread-based variant for the sync chat() path."""
+
+    def __init__(self, path: str = "sync"):
+        self.path = path
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                set_llm_coalesced_inflight(self.path, len(self._calls))
+        if not leader:
+            record_llm_coalesced(self.path)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                set_llm_coalesced_inflight(self.path, len(self._calls))
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """asyncio variant; the shared call runs as its own task so one caller
+    being cancelled does not cancel it for the others."""
+
+    def __init__(self, path: str = "async"):
+        self.path = path
+        self._tasks: Dict[str, "asyncio.Future[Any]"] = {}
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(key)
+        leader = task is None
+        if leader:
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+            set_llm_coalesced_inflight(self.path, len(self._tasks))
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            record_llm_coalesced(self.path)
+        result = await asyncio.shield(task)
+        return result if leader else copy.deepcopy(result)
+
+    def _finish(self, key: str, task: "asyncio.Future[Any]") -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+            set_llm_coalesced_inflight(self.path, len(self._tasks))
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every waiter went away
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_llm_singleflight.py
+# /root/System_Validator/APP_DIR/theaterverse_final/core/core_llm_singleflight.py
+# --- END OF STRUCTURE ---
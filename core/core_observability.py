@@ -9,6 +9,7 @@ core_observability.py
 from __future__ import annotations
 
 import os
+import threading
 import time
 import logging
 from contextlib import contextmanager
@@ -32,18 +33,30 @@ except Exception:  # pragma: no cover
 
 # ------------------------- Prometheus Metrics ----------------------------- #
 try:
-    from prometheus_client import Counter, Histogram, Gauge, start_http_server
+    from prometheus_client import CollectorRegistry, Counter, Histogram, Gauge, multiprocess, start_http_server
     _PROM_AVAILABLE = True
 except Exception:  # pragma: no cover
     _PROM_AVAILABLE = False
-    Counter = Histogram = Gauge = None  # type: ignore
+    Counter = Histogram = Gauge = CollectorRegistry = multiprocess = None  # type: ignore
     def start_http_server(*_args: Any, **_kwargs: Any) -> None:  # type: ignore
         pass
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not POSIX: dead workers' files are left as they are
+    fcntl = None  # type: ignore
+
 # ---------------------------- Global State -------------------------------- #
 _TRACER = None
 _METRICS: Dict[str, Any] = {}
 _PROM_STARTED = False
+# Worker pids already passed to mark_worker_dead() whose files are still on disk.
+_DEAD_PIDS: set = set()
+# Taken shared by every multiprocess scrape and exclusive while a dead
+# worker's files are folded into the archive, so no scrape sees both.
+_COMPACT_LOCK = "compact.lock"
+# File types whose values outlive the worker that wrote them.
+_ARCHIVED_TYPES = ("counter", "histogram", "summary")
 
 
 def init_tracing(service_name: str = "theaterverse_final",
@@ -82,7 +95,11 @@ def init_metrics(port: int = 9100) -> None:
     if not _PROM_AVAILABLE:
         LOG.warning("prometheus_client not available; metrics disabled")
         return
-    if not _PROM_STARTED:
+    if multiprocess_dir():
+        # Worker of a multi-worker launch: values go to the shared directory
+        # and the supervisor serves the aggregated scrape endpoint.
+        pass
+    elif not _PROM_STARTED:
         start_http_server(port)
         _PROM_STARTED = True
         LOG.info("Prometheus metrics server started on :%d", port)
@@ -96,12 +113,68 @@ def init_metrics(port: int = 9100) -> None:
                 "llm_latency_seconds", "Latency of LLM calls", ["provider"],
                 buckets=(0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10)
             ),
+            "llm_ttft_seconds": Histogram(
+                "llm_ttft_seconds", "Time to first streamed token of LLM calls", ["provider"],
+                buckets=(0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10)
+            ),
+            "llm_circuit_state": Gauge("llm_circuit_state", "Circuit breaker state per provider (0=closed, 1=half-open, 2=open)", ["provider"], multiprocess_mode="livemax"),
+            "llm_provider_inflight": Gauge("llm_provider_inflight", "In-flight LLM calls per provider", ["provider"], multiprocess_mode="livesum"),
+            "llm_provider_ewma_latency_seconds": Gauge("llm_provider_ewma_latency_seconds", "EWMA latency of LLM calls per provider", ["provider"], multiprocess_mode="livemax"),
+            "llm_hedges_total": Counter("llm_hedges_total", "Hedged LLM requests", ["provider", "outcome"]),
+            "llm_cache_events_total": Counter("llm_cache_events_total", "LLM response cache events", ["event"]),
+            "llm_cache_entries": Gauge("llm_cache_entries", "Entries held by the LLM response cache", multiprocess_mode="livesum"),
+            "llm_cache_bytes": Gauge("llm_cache_bytes", "Bytes held by the LLM response cache", multiprocess_mode="livesum"),
+            "llm_coalesced_waiters_total": Counter("llm_coalesced_waiters_total", "Chat requests served by an identical in-flight call", ["path"]),
+            "llm_coalesced_inflight": Gauge("llm_coalesced_inflight", "Distinct in-flight coalesced chat calls", ["path"], multiprocess_mode="livesum"),
+            "llm_batch_size": Histogram(
+                "llm_batch_size", "Requests per micro-batch dispatched to a provider", ["provider"],
+                buckets=(1, 2, 4, 8, 16, 32)
+            ),
+            "llm_batch_queue_wait_seconds": Histogram(
+                "llm_batch_queue_wait_seconds", "Time a request waited for its micro-batch to dispatch", ["provider"],
+                buckets=(0.001, 0.0025, 0.005, 0.01, 0.02, 0.05, 0.1)
+            ),
+            "llm_provider_up": Gauge("llm_provider_up", "Provider health from background probes (1=up, 0=down)", ["provider"], multiprocess_mode="livemin"),
+            "llm_health_probe_latency_seconds": Gauge("llm_health_probe_latency_seconds", "Latency of the last provider health probe", ["provider"], multiprocess_mode="livemax"),
+            "llm_rate_limited_total": Counter("llm_rate_limited_total", "LLM calls rejected by a provider rate limit", ["provider", "limit"]),
+            "llm_tokens_total": Counter("llm_tokens_total", "LLM tokens charged against TPM budgets", ["provider", "kind"]),
+            "llm_bulkhead_inflight": Gauge("llm_bulkhead_inflight", "Calls holding a provider bulkhead slot", ["provider"], multiprocess_mode="livesum"),
+            "llm_bulkhead_queued": Gauge("llm_bulkhead_queued", "Calls waiting for a provider bulkhead slot", ["provider"], multiprocess_mode="livesum"),
+            "llm_bulkhead_shed_total": Counter("llm_bulkhead_shed_total", "Calls shed by a full provider bulkhead", ["provider", "reason"]),
+            "llm_config_reloads_total": Counter("llm_config_reloads_total", "LLM connector config hot reloads", ["result"]),
+            "llm_retries_total": Counter("llm_retries_total", "LLM retry decisions after a failed attempt", ["provider", "outcome", "reason"]),
+            "llm_ratelimit_queue_depth": Gauge("llm_ratelimit_queue_depth", "Callers queued on a provider rate limit", ["provider", "limit"], multiprocess_mode="livesum"),
+            "llm_ratelimit_wait_seconds": Histogram(
+                "llm_ratelimit_wait_seconds", "Time a queued caller waited on a provider rate limit", ["provider", "limit"],
+                buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+            ),
+            "llm_scheduler_inflight": Gauge("llm_scheduler_inflight", "Requests holding a scheduler dispatch slot", multiprocess_mode="livesum"),
+            "llm_scheduler_queued": Gauge("llm_scheduler_queued", "Requests waiting for a scheduler dispatch slot", ["class"], multiprocess_mode="livesum"),
+            "llm_scheduler_rejected_total": Counter("llm_scheduler_rejected_total", "Requests rejected by the scheduler", ["class", "reason"]),
+            "llm_scheduler_queue_wait_seconds": Histogram(
+                "llm_scheduler_queue_wait_seconds", "Time a request waited for a scheduler dispatch slot", ["class"],
+                buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+            ),
+            "llm_session_events_total": Counter("llm_session_events_total", "Conversation session store events", ["event"]),
+            "llm_session_entries": Gauge("llm_session_entries", "Conversation sessions held in memory", multiprocess_mode="livesum"),
+            "llm_session_bytes": Gauge("llm_session_bytes", "Bytes of conversation history held in memory", multiprocess_mode="livesum"),
+            "llm_affinity_picks_total": Counter("llm_affinity_picks_total", "Prefix-affinity instance picks by outcome", ["provider", "outcome"]),
+            "llm_instance_inflight": Gauge("llm_instance_inflight", "In-flight calls per provider backend instance", ["provider", "instance"], multiprocess_mode="livesum"),
             # Auth
             "auth_verify_failures_total": Counter("auth_verify_failures_total", "Number of auth verification failures", ["reason"]),
             # DB
-            "db_connections": Gauge("db_connections", "Number of active DB connections"),
+            "db_connections": Gauge("db_connections", "Number of active DB connections", multiprocess_mode="livesum"),
             # App
             "app_errors_total": Counter("app_errors_total", "Number of app errors", ["component", "kind"]),
+            "app_blocking_pool_queued": Gauge("app_blocking_pool_queued", "Blocking calls waiting for a pool thread", ["pool"], multiprocess_mode="livesum"),
+            "app_blocking_pool_active": Gauge("app_blocking_pool_active", "Pool threads running a blocking call", ["pool"], multiprocess_mode="livesum"),
+            "app_blocking_pool_saturation": Gauge("app_blocking_pool_saturation", "Busy pool threads / max_workers", ["pool"], multiprocess_mode="livemax"),
+            "app_blocking_pool_wait_seconds": Histogram(
+                "app_blocking_pool_wait_seconds", "Time a blocking call waited for a pool thread", ["pool"],
+                buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+            ),
+            "app_worker_memory_bytes": Gauge("app_worker_memory_bytes", "Memory of each pre-forked worker (uss=unique, pss=proportional, rss=resident)", ["worker", "kind"], multiprocess_mode="livesum"),
+            "app_worker_restarts_total": Counter("app_worker_restarts_total", "Pre-forked workers restarted by the supervisor", ["worker"]),
         })
 
 
@@ -136,6 +209,16 @@ def observe_latency(histogram_name: str, **labels: str):
                 pass
 
 
+def observe_value(histogram_name: str, value: float, **labels: str) -> None:
+    """Record an already-measured value to a Histogram metric."""
+    h = _METRICS.get(histogram_name)
+    if h is not None:
+        try:
+            h.labels(**labels).observe(value)
+        except Exception:
+            pass
+
+
 def record_counter(counter_name: str, **labels: str) -> None:
     c = _METRICS.get(counter_name)
     if c is not None:
@@ -145,11 +228,11 @@ def record_counter(counter_name: str, **labels: str) -> None:
             pass
 
 
-def set_gauge(gauge_name: str, value: float) -> None:
+def set_gauge(gauge_name: str, value: float, **labels: str) -> None:
     g = _METRICS.get(gauge_name)
     if g is not None:
         try:
-            g.set(value)
+            (g.labels(**labels) if labels else g).set(value)
         except Exception:
             pass
 
@@ -163,6 +246,117 @@ def time_llm_call(provider: str):
     return observe_latency("llm_latency_seconds", provider=provider)
 
 
+def record_llm_ttft(provider: str, seconds: float) -> None:
+    observe_value("llm_ttft_seconds", seconds, provider=provider)
+
+
+_CIRCUIT_STATE_VALUES = {"closed": 0.0, "half_open": 1.0, "open": 2.0}
+
+
+def set_llm_circuit_state(provider: str, state: str) -> None:
+    set_gauge("llm_circuit_state", _CIRCUIT_STATE_VALUES.get(state, -1.0), provider=provider)
+
+
+def set_llm_provider_load(provider: str, in_flight: int, ewma_seconds: float) -> None:
+    set_gauge("llm_provider_inflight", float(in_flight), provider=provider)
+    set_gauge("llm_provider_ewma_latency_seconds", ewma_seconds, provider=provider)
+
+
+def record_llm_hedge(provider: str, outcome: str) -> None:
+    record_counter("llm_hedges_total", provider=provider, outcome=outcome)
+
+
+def record_llm_cache_event(event: str) -> None:
+    record_counter("llm_cache_events_total", event=event)
+
+
+def set_llm_cache_size(entries: int, nbytes: int) -> None:
+    set_gauge("llm_cache_entries", float(entries))
+    set_gauge("llm_cache_bytes", float(nbytes))
+
+
+def record_llm_coalesced(path: str) -> None:
+    record_counter("llm_coalesced_waiters_total", path=path)
+
+
+def set_llm_coalesced_inflight(path: str, n: int) -> None:
+    set_gauge("llm_coalesced_inflight", float(n), path=path)
+
+
+def set_llm_provider_health(provider: str, healthy: bool, probe_latency_seconds: float) -> None:
+    set_gauge("llm_provider_up", 1.0 if healthy else 0.0, provider=provider)
+    set_gauge("llm_health_probe_latency_seconds", probe_latency_seconds, provider=provider)
+
+
+def record_llm_rate_limited(provider: str, limit: str) -> None:
+    record_counter("llm_rate_limited_total", provider=provider, limit=limit)
+
+
+def set_llm_bulkhead_load(provider: str, in_flight: int, queued: int) -> None:
+    set_gauge("llm_bulkhead_inflight", float(in_flight), provider=provider)
+    set_gauge("llm_bulkhead_queued", float(queued), provider=provider)
+
+
+def record_llm_bulkhead_shed(provider: str, reason: str) -> None:
+    record_counter("llm_bulkhead_shed_total", provider=provider, reason=reason)
+
+
+def record_llm_config_reload(result: str) -> None:
+    record_counter("llm_config_reloads_total", result=result)
+
+
+def record_llm_retry(provider: str, outcome: str, reason: str) -> None:
+    record_counter("llm_retries_total", provider=provider, outcome=outcome, reason=reason)
+
+
+def set_llm_ratelimit_queue_depth(provider: str, limit: str, depth: int) -> None:
+    set_gauge("llm_ratelimit_queue_depth", float(depth), provider=provider, limit=limit)
+
+
+def observe_llm_ratelimit_wait(provider: str, limit: str, seconds: float) -> None:
+    observe_value("llm_ratelimit_wait_seconds", seconds, provider=provider, limit=limit)
+
+
+def set_llm_scheduler_load(in_flight: int, queued_by_class: Dict[str, int]) -> None:
+    set_gauge("llm_scheduler_inflight", float(in_flight))
+    for klass, n in queued_by_class.items():
+        set_gauge("llm_scheduler_queued", float(n), **{"class": klass})
+
+
+def record_llm_scheduler_rejected(klass: str, reason: str) -> None:
+    record_counter("llm_scheduler_rejected_total", reason=reason, **{"class": klass})
+
+
+def observe_llm_scheduler_wait(klass: str, seconds: float) -> None:
+    observe_value("llm_scheduler_queue_wait_seconds", seconds, **{"class": klass})
+
+
+def record_llm_session_event(event: str) -> None:
+    record_counter("llm_session_events_total", event=event)
+
+
+def set_llm_session_size(entries: int, nbytes: int) -> None:
+    set_gauge("llm_session_entries", float(entries))
+    set_gauge("llm_session_bytes", float(nbytes))
+
+
+def record_llm_affinity_pick(provider: str, outcome: str) -> None:
+    record_counter("llm_affinity_picks_total", provider=provider, outcome=outcome)
+
+
+def set_llm_instance_inflight(provider: str, instance: str, n: int) -> None:
+    set_gauge("llm_instance_inflight", float(n), provider=provider, instance=instance)
+
+
+def record_llm_tokens(provider: str, kind: str, n: int) -> None:
+    c = _METRICS.get("llm_tokens_total")
+    if c is not None:
+        try:
+            c.labels(provider=provider, kind=kind).inc(n)
+        except Exception:
+            pass
+
+
 def record_auth_failure(reason: str) -> None:
     record_counter("auth_verify_failures_total", reason=reason)
 
@@ -171,6 +365,174 @@ def set_db_connection_count(n: int) -> None:
     set_gauge("db_connections", float(n))
 
 
+def set_blocking_pool_load(pool: str, queued: int, active: int, saturation: float) -> None:
+    set_gauge("app_blocking_pool_queued", float(queued), pool=pool)
+    set_gauge("app_blocking_pool_active", float(active), pool=pool)
+    set_gauge("app_blocking_pool_saturation", saturation, pool=pool)
+
+
+def observe_blocking_pool_wait(pool: str, seconds: float) -> None:
+    observe_value("app_blocking_pool_wait_seconds", seconds, pool=pool)
+
+
+def set_worker_memory(worker: int, uss: int, pss: int, rss: int) -> None:
+    for kind, value in (("uss", uss), ("pss", pss), ("rss", rss)):
+        set_gauge("app_worker_memory_bytes", value, worker=str(worker), kind=kind)
+
+
+def record_worker_restart(worker: int) -> None:
+    record_counter("app_worker_restarts_total", worker=str(worker))
+
+
+# -------------------------- Multi-process mode ---------------------------- #
+def multiprocess_dir() -> Optional[str]:
+    """Shared metrics directory when running as one of several workers."""
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR") or os.environ.get("prometheus_multiproc_dir")
+
+
+def prepare_multiprocess_metrics(path: str) -> None:
+    """Supervisor side, before any worker starts: empty `path` and export it.
+
+    prometheus_client picks its value class when it is first imported, so
+    workers must inherit PROMETHEUS_MULTIPROC_DIR from the environment; files
+    left by a previous run would otherwise be summed into the new one.
+    """
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    if _PROM_AVAILABLE and not _METRICS:
+        # Forked workers never re-import prometheus_client; metrics created
+        # from here on must already be file-backed when they are inherited.
+        from prometheus_client import values
+        values.ValueClass = values.get_value_class()
+
+
+@contextmanager
+def _multiprocess_lock(path: str, exclusive: bool):
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(path, _COMPACT_LOCK), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+if _PROM_AVAILABLE:
+    class _LockedMultiProcessCollector(multiprocess.MultiProcessCollector):
+        def collect(self):
+            with _multiprocess_lock(self._path, exclusive=False):
+                return list(super().collect())
+
+
+def multiprocess_registry():
+    """Registry that reads every worker's files; scrape this instead of the default one."""
+    registry = CollectorRegistry()
+    _LockedMultiProcessCollector(registry)
+    return registry
+
+
+def _archive_worker_files(path: str, pid: int) -> None:
+    """Fold a dead worker's counter/histogram files into one <type>_archive.db
+    per type, so restarts do not leave a file per pid behind forever."""
+    from prometheus_client.mmap_dict import MmapedDict
+    with _multiprocess_lock(path, exclusive=True):
+        for typ in _ARCHIVED_TYPES:
+            src = os.path.join(path, f"{typ}_{pid}.db")
+            if not os.path.exists(src):
+                continue
+            archive = MmapedDict(os.path.join(path, f"{typ}_archive.db"))
+            try:
+                for key, value, timestamp, _ in MmapedDict.read_all_values_from_file(src):
+                    total, _ts = archive.read_value(key)
+                    archive.write_value(key, total + value, timestamp)
+            finally:
+                archive.close()
+            os.remove(src)
+
+
+def mark_worker_dead(pid: int) -> None:
+    """Drop a dead worker's live gauges and fold its counters and histograms
+    into the archive files, so totals never go backwards."""
+    path = multiprocess_dir()
+    if _PROM_AVAILABLE and path:
+        multiprocess.mark_process_dead(pid)
+        _DEAD_PIDS.add(pid)
+        if fcntl is None:
+            return
+        try:
+            _archive_worker_files(path, pid)
+        except Exception:  # noqa: BLE001
+            # The files stay where they are and are still scraped.
+            LOG.exception("could not archive metrics of dead worker %d", pid)
+
+
+def reap_dead_workers() -> int:
+    """mark_worker_dead() every pid that left files in the shared directory
+    but is gone; returns how many were newly reaped."""
+    path = multiprocess_dir()
+    if not path or not os.path.isdir(path):
+        return 0
+    pids = set()
+    for name in os.listdir(path):
+        stem, ext = os.path.splitext(name)
+        pid = stem.rsplit("_", 1)[-1]
+        if ext == ".db" and pid.isdigit():
+            pids.add(int(pid))
+    reaped = 0
+    for pid in pids:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            if pid not in _DEAD_PIDS:
+                mark_worker_dead(pid)
+                reaped += 1
+            continue
+        except PermissionError:
+            pass  # alive, owned by someone else
+        _DEAD_PIDS.discard(pid)  # alive, possibly a reused pid
+    # Archived pids left no files behind and need not be remembered.
+    _DEAD_PIDS.intersection_update(pids)
+    return reaped
+
+
+def serve_multiprocess_metrics(port: Optional[int], reap_interval_s: Optional[float] = 10.0) -> None:
+    """Supervisor side: one scrape endpoint for all workers plus a dead-worker reaper.
+
+    With port None only the reaper runs; the aggregate is then served by
+    whichever route renders multiprocess_registry(). Supervisors that wait
+    on their own children pass reap_interval_s=None and call
+    mark_worker_dead() themselves.
+    """
+    global _PROM_STARTED
+    if not _PROM_AVAILABLE:
+        LOG.warning("prometheus_client not available; metrics disabled")
+        return
+    if port is not None and not _PROM_STARTED:
+        start_http_server(port, registry=multiprocess_registry())
+        _PROM_STARTED = True
+        LOG.info("Prometheus multiprocess metrics server started on :%d (%s)", port, multiprocess_dir())
+
+    if not reap_interval_s:
+        return
+
+    def reap() -> None:
+        while True:
+            time.sleep(reap_interval_s)
+            try:
+                reaped = reap_dead_workers()
+                if reaped:
+                    LOG.info("Reaped metrics files of %d dead worker(s)", reaped)
+            except Exception:  # pragma: no cover
+                LOG.exception("metrics reaper failed")
+
+    threading.Thread(target=reap, name="metrics-reaper", daemon=True).start()
+
+
 # ------------------------------ Bootstrap --------------------------------- #
 def init_observability(service_name: str = "theaterverse_final",
                        otlp_endpoint: Optional[str] = None,
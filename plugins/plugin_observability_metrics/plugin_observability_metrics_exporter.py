@@ -6,9 +6,12 @@ Provides Prometheus-compatible metrics endpoint.
 """
 
 import logging
+import os
 from fastapi import APIRouter, Response
 from prometheus_client import generate_latest, CONTENT_TYPE_LATEST, Counter
 
+from core.core_observability import multiprocess_registry
+
 logger = logging.getLogger(__name__)
 
 REQUEST_COUNT = Counter("system_validator_requests_total", "Total requests")
@@ -29,7 +32,11 @@ def routes(app):
     @router.get("/metrics/prometheus")
     async def prometheus_metrics():
         REQUEST_COUNT.inc()
-        data = generate_latest()
+        if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+            # Multi-worker launch: answer with every worker's values, not just this one's.
+            data = generate_latest(multiprocess_registry())
+        else:
+            data = generate_latest()
         return Response(content=data, media_type=CONTENT_TYPE_LATEST)
 
     app.include_router(router)
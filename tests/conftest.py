@@ -0,0 +1,199 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: shared fixtures
+
+Fake OpenAI-compatible providers and a minimal llm_connector_config.json for
+in-process LLMAdapter tests (no real backend or running app needed).
+"""
+
+import copy
+import importlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class FakeProvider:
+    """OpenAI-compatible /chat/completions on 127.0.0.1; behaviour is set via attributes."""
+
+    def __init__(self):
+        self.status = 200
+        self.delay = 0.0
+        self.retry_after = None
+        self.health = 200
+        self.usage = {"prompt_tokens": 5, "completion_tokens": 7, "total_tokens": 12}
+        # stream=true requests: None answers with plain JSON (no SSE support);
+        # a list of content pieces is sent as SSE chunks. stream_error_after
+        # sends a malformed event after that many chunks.
+        self.stream = None
+        self.stream_usage = True
+        self.stream_error_after = None
+        self.last_body = None
+        self.hits = 0
+        self.finished = 0
+        self.lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *_args):
+                pass
+
+            def do_GET(self):
+                self.send_response(fake.health)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                with fake.lock:
+                    fake.hits += 1
+                    fake.last_body = body
+                if fake.delay:
+                    time.sleep(fake.delay)
+                if fake.status == 200 and body.get("stream") and fake.stream is not None:
+                    self._send_sse(body)
+                    return
+                if fake.status != 200:
+                    data = b'{"error": "fake"}'
+                    self.send_response(fake.status)
+                    if fake.retry_after is not None:
+                        self.send_header("Retry-After", str(fake.retry_after))
+                else:
+                    content = "echo:" + str(body["messages"][-1]["content"])
+                    data = json.dumps({
+                        "id": "fake",
+                        "object": "chat.completion",
+                        "model": body.get("model"),
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                        "usage": fake.usage,
+                    }).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                with fake.lock:
+                    fake.finished += 1
+
+            def _send_sse(self, body):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                events = []
+                for i, piece in enumerate(fake.stream):
+                    if fake.stream_error_after is not None and i == fake.stream_error_after:
+                        events.append("{malformed")
+                        break
+                    events.append(json.dumps({
+                        "id": "fake", "object": "chat.completion.chunk", "model": body.get("model"),
+                        "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                    }))
+                else:
+                    if fake.stream_usage and (body.get("stream_options") or {}).get("include_usage"):
+                        events.append(json.dumps({"id": "fake", "object": "chat.completion.chunk", "choices": [], "usage": fake.usage}))
+                    events.append("[DONE]")
+                for event in events:
+                    self.wfile.write(f": keep-alive\n\ndata: {event}\n\n".encode())
+                    self.wfile.flush()
+                with fake.lock:
+                    fake.finished += 1
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def fake_provider():
+    started = []
+
+    def start():
+        fake = FakeProvider()
+        started.append(fake)
+        return fake
+
+    yield start
+    for fake in started:
+        fake.close()
+
+
+_BASE_CONFIG = {
+    "version": "1.0.0",
+    "routing": {
+        "strategy": "failover-priority",
+        "timeout_ms": 2000,
+        "deadline_ms": 5000,
+        "min_attempt_ms": 10,
+        "retry": {"max_attempts": 1, "backoff": {"base_ms": 1, "max_ms": 5, "jitter": "full"}},
+        "circuit_breaker": {"enabled": False},
+        "hedging": {"enabled": False},
+        "affinity": {"enabled": False},
+    },
+    "rate_limit": {"burst": 1000, "per_provider": {}},
+    "cache": {"enabled": False},
+    "coalescing": {"enabled": False},
+    "health_monitor": {"enabled": False},
+    "hot_reload": {"enabled": False},
+}
+
+
+def _merge(dst, src):
+    for key, value in src.items():
+        if isinstance(value, dict) and isinstance(dst.get(key), dict):
+            _merge(dst[key], value)
+        else:
+            dst[key] = value
+
+
+@pytest.fixture
+def llm_config(tmp_path):
+    """llm_config({"name": url, ...}, routing={...}, ...) -> path of a config file."""
+
+    def build(providers, **sections):
+        cfg = copy.deepcopy(_BASE_CONFIG)
+        cfg["routing"]["priority"] = list(providers)
+        cfg["providers"] = {
+            name: {"type": "http", "base_url": url, "default_model": "m", "request": {"max_tokens": 16, "temperature": 0}}
+            for name, url in providers.items()
+        }
+        _merge(cfg, sections)
+        path = tmp_path / "llm_connector_config.json"
+        path.write_text(json.dumps(cfg))
+        return str(path)
+
+    return build
+
+
+@pytest.fixture(scope="session")
+def app_main(tmp_path_factory):
+    """app.app_main imported in-process; tests swap in their own adapter."""
+    tmp = tmp_path_factory.mktemp("app")
+    settings = tmp / "app_settings.yaml"
+    settings.write_text("metrics_port: 0\nstream:\n  buffer_chunks: 2\n")
+    cfg = copy.deepcopy(_BASE_CONFIG)
+    cfg["routing"]["priority"] = ["p"]
+    cfg["providers"] = {"p": {"type": "http", "base_url": "http://127.0.0.1:9", "default_model": "m"}}
+    config = tmp / "llm_connector_config.json"
+    config.write_text(json.dumps(cfg))
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("APP_SETTINGS_PATH", str(settings))
+        mp.setenv("LLM_CONNECTOR_CONFIG", str(config))
+        return importlib.import_module("app.app_main")
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/conftest.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/conftest.py
+# --- END OF STRUCTURE ---
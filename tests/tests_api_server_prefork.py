@@ -0,0 +1,73 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: pre-fork API server
+
+Forked workers serve one shared socket and the supervisor shuts them down
+on SIGTERM; per-worker memory is read from /proc (Linux only).
+"""
+
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+import httpx
+import pytest
+
+from core.core_api_server import PreforkSupervisor, worker_memory
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads /proc/<pid>/smaps_rollup")
+
+
+def test_worker_memory_of_live_process():
+    mem = worker_memory(os.getpid())
+    assert set(mem) == {"uss", "pss", "rss"}
+    assert 0 < mem["uss"] <= mem["pss"] <= mem["rss"]
+
+
+def test_worker_memory_of_missing_process():
+    assert worker_memory(2**22 + 1) == {}
+
+
+async def _pid_app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": str(os.getpid()).encode()})
+
+
+def _supervise(sock):
+    PreforkSupervisor(_pid_app, sock, 2, report_interval_s=0).run()
+
+
+def test_supervisor_serves_from_workers_and_stops_on_sigterm():
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(64)
+    sock.set_inheritable(True)
+    url = f"http://127.0.0.1:{sock.getsockname()[1]}/"
+    supervisor = multiprocessing.get_context("fork").Process(target=_supervise, args=(sock,))
+    supervisor.start()
+    try:
+        pid = None
+        for _ in range(100):
+            try:
+                pid = int(httpx.get(url, timeout=1).text)
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        assert pid is not None and pid not in (os.getpid(), supervisor.pid)
+    finally:
+        os.kill(supervisor.pid, signal.SIGTERM)
+        supervisor.join(10)
+        sock.close()
+    assert supervisor.exitcode == 0
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_api_server_prefork.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_api_server_prefork.py
+# --- END OF STRUCTURE ---
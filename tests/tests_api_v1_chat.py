@@ -0,0 +1,77 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: /v1/chat API
+
+Smoke tests for the chat endpoint, including SSE streaming.
+"""
+
+import pytest
+import httpx
+import os
+import json
+
+BASE_URL = os.getenv("TEST_BASE_URL", "http://localhost:8080")
+MESSAGES = [{"role": "user", "content": "Hello from System Validator"}]
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_sse():
+    async with httpx.AsyncClient(timeout=60) as client:
+        async with client.stream("POST", f"{BASE_URL}/v1/chat", json={"messages": MESSAGES, "stream": True}) as r:
+            assert r.status_code == 200
+            assert r.headers["content-type"].startswith("text/event-stream")
+            events = [line[len("data: "):] async for line in r.aiter_lines() if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(e) for e in events[:-1]]
+    assert chunks and all(c["object"] == "chat.completion.chunk" for c in chunks)
+
+
+@pytest.mark.asyncio
+async def test_chat_batch_ndjson_in_completion_order():
+    # The stream item is rejected at once, so it must come back before the real calls.
+    items = [{"messages": MESSAGES}, {"messages": MESSAGES}, {"messages": MESSAGES, "stream": True}]
+    async with httpx.AsyncClient(timeout=60) as client:
+        async with client.stream("POST", f"{BASE_URL}/v1/chat/batch", json=items) as r:
+            assert r.status_code == 200
+            assert r.headers["content-type"].startswith("application/x-ndjson")
+            lines = [json.loads(line) async for line in r.aiter_lines() if line]
+    assert sorted(line["index"] for line in lines) == [0, 1, 2]
+    assert lines[0] == {"index": 2, "error": {"status": 400, "message": "stream is not supported in a batch"}}
+    assert all("response" in line for line in lines[1:])
+
+
+@pytest.mark.asyncio
+async def test_chat_batch_rejects_bad_timeout_header():
+    async with httpx.AsyncClient(timeout=60) as client:
+        r = await client.post(
+            f"{BASE_URL}/v1/chat/batch",
+            json=[{"messages": MESSAGES}],
+            headers={"x-request-timeout-ms": "soon"},
+        )
+    assert r.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_session_turns_and_delete():
+    async with httpx.AsyncClient(timeout=60) as client:
+        r = await client.post(f"{BASE_URL}/v1/sessions")
+        assert r.status_code == 201
+        session_id = r.json()["session_id"]
+        for text in ("My name is Ada.", "What is my name?"):
+            r = await client.post(f"{BASE_URL}/v1/chat", json={"messages": [{"role": "user", "content": text}], "session_id": session_id})
+            assert r.status_code == 200
+        r = await client.delete(f"{BASE_URL}/v1/sessions/{session_id}")
+        assert r.status_code == 204
+
+
+@pytest.mark.asyncio
+async def test_session_id_must_be_issued_by_server():
+    async with httpx.AsyncClient(timeout=60) as client:
+        r = await client.post(f"{BASE_URL}/v1/chat", json={"messages": MESSAGES, "session_id": "guessed"})
+    assert r.status_code == 404
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_api_v1_chat.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_api_v1_chat.py
+# --- END OF STRUCTURE ---
@@ -0,0 +1,368 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: /v1/chat API (in-process)
+
+The app is driven through an ASGI transport against fake providers: SSE
+relaying, in-band errors after the first chunk, a bounded pump queue that
+is stopped however the request ends,
+503 + Retry-After when every provider's circuit is open, the batch
+endpoint's fan-out bound, size limit, per-item error mapping and cleanup, and
+session mode: history rebuilt per turn, 409 once it is lost, sessions
+bound to the token subject, and only signed ids accepted without auth.
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from fastapi import Request
+
+from core.core_adapter_llm import CircuitOpenError, DeadlineExceededError, LLMAdapter, ProviderError, RateLimitedError
+from core.core_llm_session_store import SessionStore
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+@pytest.fixture
+def app(app_main, fake_provider, llm_config, monkeypatch):
+    def use(fake):
+        monkeypatch.setattr(app_main, "adapter", LLMAdapter(llm_config({"p": fake.url})))
+        return app_main
+    return use
+
+
+async def _post(app_main, path, body, headers=None):
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+        return await client.post(path, json=body, headers=headers)
+
+
+def _batch_lines(r):
+    return sorted((json.loads(line) for line in r.text.splitlines()), key=lambda item: item["index"])
+
+
+class _BatchAdapter:
+    """Answers after a short pause and records how many calls overlapped."""
+
+    def __init__(self):
+        self.calls = self.running = self.peak = 0
+
+    def deadline_after(self, timeout_ms=None):
+        return time.monotonic() + 30
+
+    async def achat(self, messages, **_kwargs):
+        self.calls += 1
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(0.02)
+            return {"choices": [{"message": {"role": "assistant", "content": messages[-1]["content"]}}]}
+        finally:
+            self.running -= 1
+
+
+async def _post_stream(app_main, body):
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+        r = await client.post("/v1/chat", json=body)
+    events = [line[len("data: "):] for line in r.text.splitlines() if line.startswith("data: ")]
+    return r, events
+
+
+def test_stream_is_relayed_as_sse(app, fake_provider):
+    fake = fake_provider()
+    fake.stream = ["a", "b", "c"]
+    r, events = asyncio.run(_post_stream(app(fake), {"messages": MESSAGES, "stream": True}))
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    assert events[-1] == "[DONE]"
+    assert [json.loads(e)["choices"][0]["delta"]["content"] for e in events[:-1]] == ["a", "b", "c"]
+
+
+def test_failure_before_the_first_chunk_is_an_http_error(app, fake_provider):
+    fake = fake_provider()
+    fake.status = 500
+    r, events = asyncio.run(_post_stream(app(fake), {"messages": MESSAGES, "stream": True}))
+    assert r.status_code == 500
+    assert events == []
+
+
+def test_mid_stream_failure_is_reported_in_band(app, fake_provider):
+    fake = fake_provider()
+    fake.stream = ["a", "b", "c"]
+    fake.stream_error_after = 2
+    r, events = asyncio.run(_post_stream(app(fake), {"messages": MESSAGES, "stream": True}))
+    assert r.status_code == 200
+    assert events[-1] == "[DONE]"
+    assert "malformed stream chunk" in json.loads(events[-2])["error"]["message"]
+    assert len(events) == 4
+
+
+def test_pump_stops_at_the_buffer_bound(app_main, monkeypatch):
+    produced = []
+
+    class Adapter:
+        async def achat_stream(self, **_kwargs):
+            for i in range(10):
+                produced.append(i)
+                yield {"choices": [{"delta": {"content": str(i)}}]}
+
+    monkeypatch.setattr(app_main, "adapter", Adapter())
+    req = app_main.ChatRequest(messages=MESSAGES, stream=True)
+    ticket = app_main.Ticket(tenant="t", klass=app_main.scheduler.resolve_class(None))
+
+    async def main():
+        queue = asyncio.Queue(maxsize=2)
+        task = asyncio.create_task(app_main._pump_stream(req, time.monotonic() + 30, ticket, queue))
+        await asyncio.sleep(0.05)
+        stalled = len(produced)
+        items = []
+        while not items or items[-1] is not app_main._STREAM_END:
+            items.append(await queue.get())
+        await task
+        return stalled, len(items)
+
+    stalled, relayed = asyncio.run(main())
+    # Two chunks queued, the third held by the blocked put: nothing read ahead of the client.
+    assert stalled == 3
+    assert relayed == 11
+
+
+class _SlowStreamAdapter:
+    """Streams ten chunks after `delay`; records when the stream is closed."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.closed = []
+
+    async def achat_stream(self, **_kwargs):
+        try:
+            await asyncio.sleep(self.delay)
+            for i in range(10):
+                yield {"choices": [{"delta": {"content": str(i)}}]}
+        finally:
+            self.closed.append(True)
+
+
+def test_pump_is_stopped_when_the_request_is_cancelled_before_the_first_chunk(app_main, monkeypatch):
+    adapter = _SlowStreamAdapter(delay=30)
+    monkeypatch.setattr(app_main, "adapter", adapter)
+    req = app_main.ChatRequest(messages=MESSAGES, stream=True)
+    ticket = app_main.Ticket(tenant="t", klass=app_main.scheduler.resolve_class(None))
+
+    async def main():
+        handler = asyncio.create_task(app_main._stream_chat(req, time.monotonic() + 30, ticket))
+        await asyncio.sleep(0.05)
+        handler.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await handler
+        return list(adapter.closed)
+
+    assert asyncio.run(main()) == [True]
+
+
+def test_closing_the_body_waits_for_the_pump_to_stop(app_main, monkeypatch):
+    adapter = _SlowStreamAdapter(delay=0)
+    monkeypatch.setattr(app_main, "adapter", adapter)
+    req = app_main.ChatRequest(messages=MESSAGES, stream=True)
+    ticket = app_main.Ticket(tenant="t", klass=app_main.scheduler.resolve_class(None))
+
+    async def main():
+        resp = await app_main._stream_chat(req, time.monotonic() + 30, ticket)
+        body = resp.body_iterator
+        await body.__anext__()
+        await body.aclose()
+        return list(adapter.closed)
+
+    # Released by the time the body is closed, not at some later loop turn.
+    assert asyncio.run(main()) == [True]
+
+
+def test_all_circuits_open_is_503_with_retry_after(app_main, monkeypatch):
+    class Adapter:
+        def deadline_after(self, timeout_ms=None):
+            return time.monotonic() + 30
+
+        async def achat(self, **_kwargs):
+            raise CircuitOpenError("All providers unavailable: circuit open: p", 2.5)
+
+    monkeypatch.setattr(app_main, "adapter", Adapter())
+
+    async def main():
+        transport = httpx.ASGITransport(app=app_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+            return await client.post("/v1/chat", json={"messages": MESSAGES})
+
+    r = asyncio.run(main())
+    assert r.status_code == 503
+    assert r.headers["retry-after"] == "3"
+
+
+def test_batch_fans_out_at_most_concurrency_items(app_main, monkeypatch):
+    adapter = _BatchAdapter()
+    monkeypatch.setattr(app_main, "adapter", adapter)
+    monkeypatch.setattr(app_main, "BATCH_CONCURRENCY", 2)
+    items = [{"messages": [{"role": "user", "content": str(i)}]} for i in range(6)]
+    r = asyncio.run(_post(app_main, "/v1/chat/batch", items))
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = _batch_lines(r)
+    assert [line["response"]["choices"][0]["message"]["content"] for line in lines] == [str(i) for i in range(6)]
+    assert (adapter.calls, adapter.peak) == (6, 2)
+
+
+def test_batch_over_max_items_is_413(app_main, monkeypatch):
+    adapter = _BatchAdapter()
+    monkeypatch.setattr(app_main, "adapter", adapter)
+    monkeypatch.setattr(app_main, "BATCH_MAX_ITEMS", 2)
+    r = asyncio.run(_post(app_main, "/v1/chat/batch", [{"messages": MESSAGES}] * 3))
+    assert r.status_code == 413
+    assert adapter.calls == 0
+
+
+def test_batch_item_errors_are_mapped_per_item(app_main, monkeypatch):
+    failures = {
+        "busy": RateLimitedError("All providers overloaded: p", 1.2),
+        "late": DeadlineExceededError("deadline exceeded"),
+        "down": ProviderError("All providers failed: p"),
+    }
+
+    class Adapter(_BatchAdapter):
+        async def achat(self, messages, **kwargs):
+            failure = failures.get(messages[-1]["content"])
+            if failure is not None:
+                raise failure
+            return await super().achat(messages, **kwargs)
+
+    monkeypatch.setattr(app_main, "adapter", Adapter())
+    items = [{"messages": [{"role": "user", "content": c}]} for c in ("ok", "busy", "late", "down")]
+    items.append({"messages": MESSAGES, "stream": True})
+    r = asyncio.run(_post(app_main, "/v1/chat/batch", items))
+    assert r.status_code == 200
+    ok, busy, late, down, stream = _batch_lines(r)
+    assert ok["response"]["choices"][0]["message"]["content"] == "ok"
+    assert busy["error"] == {"status": 429, "message": "All providers overloaded: p", "retry_after": 2}
+    assert late["error"] == {"status": 504, "message": "deadline exceeded"}
+    assert down["error"] == {"status": 500, "message": "All providers failed: p"}
+    assert stream["error"]["status"] == 400
+
+
+def test_batch_item_failing_outside_its_handler_still_gets_a_line(app_main, monkeypatch):
+    monkeypatch.setattr(app_main, "adapter", _BatchAdapter())
+    real = app_main._batch_item
+
+    async def flaky(index, req, timeout_ms, ticket):
+        if index == 1:
+            raise ValueError("span exporter broke")
+        return await real(index, req, timeout_ms, ticket)
+
+    monkeypatch.setattr(app_main, "_batch_item", flaky)
+
+    async def main():
+        return await asyncio.wait_for(_post(app_main, "/v1/chat/batch", [{"messages": MESSAGES}] * 3), 5)
+
+    r = asyncio.run(main())
+    lines = _batch_lines(r)
+    assert [("response" in line) for line in lines] == [True, False, True]
+    assert lines[1]["error"] == {"status": 500, "message": "span exporter broke"}
+
+
+def test_closed_batch_waits_for_cancelled_items(app_main, monkeypatch):
+    adapter = _BatchAdapter()
+    monkeypatch.setattr(app_main, "adapter", adapter)
+    monkeypatch.setattr(app_main, "BATCH_CONCURRENCY", 2)
+    reqs = [app_main.ChatRequest(messages=MESSAGES) for _ in range(6)]
+    ticket = app_main.Ticket(tenant="t", klass=app_main.scheduler.resolve_class(None))
+
+    async def main():
+        body = app_main._run_batch(reqs, None, ticket)
+        await body.__anext__()
+        await body.aclose()
+        return adapter.running
+
+    assert asyncio.run(main()) == 0
+
+
+class _SessionAdapter:
+    """Answers "r<n>" to the n-th call and keeps the messages each call saw."""
+
+    def __init__(self):
+        self.seen = []
+
+    def deadline_after(self, timeout_ms=None):
+        return time.monotonic() + 30
+
+    async def achat(self, messages, **_kwargs):
+        self.seen.append([m["content"] for m in messages])
+        return {"choices": [{"message": {"role": "assistant", "content": f"r{len(self.seen)}"}}]}
+
+
+@pytest.fixture
+def session_app(app_main, monkeypatch):
+    """Session mode on, auth off, an empty store; returns the stub adapter."""
+    adapter = _SessionAdapter()
+    monkeypatch.setattr(app_main, "adapter", adapter)
+    monkeypatch.setattr(app_main, "sessions", SessionStore(max_bytes=1 << 20, idle_ttl_s=60))
+    monkeypatch.setattr(app_main, "SESSION_ID_SECRET", b"test-secret")
+    monkeypatch.setattr(app_main, "USE_AUTH", False)
+    return adapter
+
+
+def _turn(app_main, session_id, content, headers=None):
+    body = {"messages": [{"role": "user", "content": content}], "session_id": session_id}
+    return asyncio.run(_post(app_main, "/v1/chat", body, headers))
+
+
+def test_session_turns_rebuild_the_history(app_main, session_app):
+    session_id = asyncio.run(_post(app_main, "/v1/sessions", None)).json()["session_id"]
+    assert _turn(app_main, session_id, "one").status_code == 200
+    assert _turn(app_main, session_id, "two").json()["choices"][0]["message"]["content"] == "r2"
+    assert session_app.seen == [["one"], ["one", "r1", "two"]]
+
+
+def test_lost_session_is_409_once(app_main, session_app, monkeypatch):
+    # Every session is over max_bytes after its first turn and, with no
+    # spill to keep it in, is dropped.
+    monkeypatch.setattr(app_main, "sessions", SessionStore(max_bytes=1, idle_ttl_s=60))
+    session_id = asyncio.run(_post(app_main, "/v1/sessions", None)).json()["session_id"]
+    assert _turn(app_main, session_id, "one").status_code == 200
+    r = _turn(app_main, session_id, "two")
+    assert r.status_code == 409
+    assert "expired" in r.json()["detail"]
+    assert _turn(app_main, session_id, "three").status_code == 200
+    assert session_app.seen == [["one"], ["three"]]
+
+
+def test_session_is_bound_to_the_token_subject(app_main, session_app, monkeypatch):
+    async def claims(request: Request):
+        sub = request.headers.get("x-test-sub")
+        return {"sub": sub} if sub else {}
+
+    monkeypatch.setattr(app_main, "USE_AUTH", True)
+    monkeypatch.setitem(app_main.app.dependency_overrides, app_main.token_required, claims)
+    assert _turn(app_main, "s1", "alice-1", {"x-test-sub": "alice"}).status_code == 200
+    assert _turn(app_main, "s1", "bob-1", {"x-test-sub": "bob"}).status_code == 200
+    assert _turn(app_main, "s1", "alice-2", {"x-test-sub": "alice"}).status_code == 200
+    assert _turn(app_main, "s1", "anon").status_code == 403
+    assert session_app.seen == [["alice-1"], ["bob-1"], ["alice-1", "r1", "alice-2"]]
+
+
+def test_without_auth_only_issued_session_ids_are_accepted(app_main, session_app, monkeypatch):
+    issued = asyncio.run(_post(app_main, "/v1/sessions", None)).json()["session_id"]
+    token, _, mac = issued.rpartition(".")
+    assert _turn(app_main, "chosen-by-client", "x").status_code == 404
+    assert _turn(app_main, f"{token}.{'0' * len(mac)}", "x").status_code == 404
+    assert _turn(app_main, f"other{token}.{mac}", "x").status_code == 404
+    assert _turn(app_main, issued, "x").status_code == 200
+    # Another deployment's secret does not vouch for this one's ids.
+    monkeypatch.setattr(app_main, "SESSION_ID_SECRET", b"another-secret")
+    assert _turn(app_main, issued, "x").status_code == 404
+    assert len(session_app.seen) == 1
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_api_v1_chat_inprocess.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_api_v1_chat_inprocess.py
+# --- END OF STRUCTURE ---
@@ -0,0 +1,97 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: blocking pool
+
+Blocking calls run off the event loop, at most max_workers at a time, and
+their results and exceptions come back to the awaiting coroutine.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from core.core_blocking_pool import BlockingPool
+
+
+def test_blocking_call_does_not_stall_the_loop():
+    async def main():
+        pool = BlockingPool("t", 2)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        result = await pool.run(lambda: (time.sleep(0.2), threading.current_thread().name)[1])
+        task.cancel()
+        pool.shutdown()
+        return result, ticks
+
+    name, ticks = asyncio.run(main())
+    assert name.startswith("t-blocking")
+    assert ticks >= 10
+
+
+def test_pool_size_bounds_concurrency():
+    async def main():
+        pool = BlockingPool("t", 2)
+        lock = threading.Lock()
+        running = peak = 0
+
+        def work():
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+
+        await asyncio.gather(*[pool.run(work) for _ in range(6)])
+        pool.shutdown()
+        return peak
+
+    assert asyncio.run(main()) == 2
+
+
+def test_exceptions_propagate():
+    async def main():
+        pool = BlockingPool("t", 1)
+        try:
+            await pool.run(int, "x")
+        finally:
+            pool.shutdown()
+
+    with pytest.raises(ValueError):
+        asyncio.run(main())
+
+
+def test_cancelled_queued_job_leaves_the_queue():
+    async def main():
+        pool = BlockingPool("t", 1)
+        release = threading.Event()
+        busy = asyncio.create_task(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        queued = asyncio.create_task(pool.run(time.sleep, 0))
+        await asyncio.sleep(0.05)
+        assert pool._queued == 1
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        release.set()
+        await busy
+        pool.shutdown()
+        return pool._queued, pool._active
+
+    assert asyncio.run(main()) == (0, 0)
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_blocking_pool.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_blocking_pool.py
+# --- END OF STRUCTURE ---
@@ -0,0 +1,49 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: JSON codec
+
+The orjson and stdlib backends produce the same compact UTF-8 bytes and
+accept the same inputs.
+"""
+
+import pytest
+
+from core import core_json_codec as codec
+
+BACKENDS = [False] + ([True] if codec._ORJSON_AVAILABLE else [])
+
+
+@pytest.fixture(params=BACKENDS, ids=lambda fast: "orjson" if fast else "json")
+def backend(request, monkeypatch):
+    monkeypatch.setattr(codec, "_ORJSON_AVAILABLE", request.param)
+
+
+def test_compact_utf8_and_sorted(backend):
+    assert codec.dumps({"b": 1, "a": "日本"}, sort_keys=True) == '{"a":"日本","b":1}'.encode("utf-8")
+    assert codec.dumps_str([1, None, True]) == "[1,null,true]"
+
+
+class _Opaque:
+    def __str__(self):
+        return "opaque"
+
+
+def test_default_hook(backend):
+    assert codec.dumps({"o": _Opaque()}, default=str) == b'{"o":"opaque"}'
+
+
+def test_loads_accepts_bytes_like(backend):
+    for data in (b'{"x": [1]}', bytearray(b'{"x": [1]}'), memoryview(b'{"x": [1]}'), '{"x": [1]}'):
+        assert codec.loads(data) == {"x": [1]}
+
+
+def test_decode_error_is_value_error(backend):
+    with pytest.raises(ValueError):
+        codec.loads(b"{")
+    assert issubclass(codec.JSONDecodeError, ValueError)
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_json_codec.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_json_codec.py
+# --- END OF STRUCTURE ---
@@ -0,0 +1,48 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: LLM prefix affinity
+
+Shared prefixes stick to one instance, bounded loads spill a hot key, and
+requests without a prefix are spread by load instead of by model name.
+"""
+
+from contextlib import ExitStack
+
+from core.core_llm_affinity import AffinityRouter, prefix_key
+
+URLS = ["http://a", "http://b", "http://c"]
+SYSTEM = [{"role": "system", "content": "You are terse."}]
+
+
+def _hold(router, key, n):
+    with ExitStack() as stack:
+        return [stack.enter_context(router.route(key)).url for _ in range(n)]
+
+
+def test_same_prefix_same_instance():
+    router = AffinityRouter("p", URLS)
+    key = prefix_key(SYSTEM + [{"role": "user", "content": "x"}], "m", 0)
+    with router.route(key) as first:
+        pass
+    with router.route(key) as second:
+        pass
+    assert first.url == second.url
+
+
+def test_hot_key_spills_over_bounded_load():
+    router = AffinityRouter("p", URLS, load_factor=1.25)
+    key = prefix_key(SYSTEM, "m", 0)
+    assert len(set(_hold(router, key, 9))) > 1
+
+
+def test_no_prefix_is_unkeyed_and_spread():
+    assert prefix_key([{"role": "user", "content": "hi"}], "m", 0) is None
+    assert prefix_key([{"role": "user", "content": "hi"}], "m", 256) is not None
+    router = AffinityRouter("p", URLS)
+    assert sorted(_hold(router, None, 3)) == URLS
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_affinity.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_affinity.py
+# --- END OF STRUCTURE ---
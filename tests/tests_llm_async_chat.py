@@ -0,0 +1,60 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: LLM async chat path
+
+achat() on the pooled async clients: answers, fails over in priority
+order, and keeps one keep-alive client per provider.
+"""
+
+import asyncio
+
+import pytest
+
+from core.core_adapter_llm import LLMAdapter, ProviderError
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def test_achat_fails_over_in_priority_order(fake_provider, llm_config):
+    first, second = fake_provider(), fake_provider()
+    first.status = 500
+    adapter = LLMAdapter(llm_config({"a": first.url, "b": second.url}))
+
+    async def main():
+        try:
+            return await adapter.achat(MESSAGES)
+        finally:
+            await adapter.aclose()
+
+    assert asyncio.run(main())["choices"][0]["message"]["content"] == "echo:hi"
+    assert (first.hits, second.hits) == (1, 1)
+
+
+def test_achat_reuses_one_client_per_provider(fake_provider, llm_config):
+    fake = fake_provider()
+    adapter = LLMAdapter(llm_config({"p": fake.url}))
+
+    async def main():
+        await asyncio.gather(*[adapter.achat(MESSAGES) for _ in range(5)])
+        clients = dict(adapter._async_clients)
+        await adapter.achat(MESSAGES)
+        same = adapter._async_clients["p"] is clients["p"]
+        await adapter.aclose()
+        return same, len(clients)
+
+    assert asyncio.run(main()) == (True, 1)
+    assert fake.hits == 6
+
+
+def test_achat_all_failed(fake_provider, llm_config):
+    fake = fake_provider()
+    fake.status = 502
+    adapter = LLMAdapter(llm_config({"p": fake.url}))
+    with pytest.raises(ProviderError, match="All providers failed"):
+        asyncio.run(adapter.achat(MESSAGES))
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_async_chat.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_async_chat.py
+# --- END OF STRUCTURE ---
@@ -0,0 +1,73 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: LLM micro-batcher
+
+Requests within the window go out as one dispatch; a batch whose callers
+have all been cancelled has its dispatch cancelled too; pipelined batching
+does not hold requests at all.
+"""
+
+import asyncio
+import json
+
+from core.core_adapter_llm import LLMAdapter
+from core.core_llm_batcher import MicroBatcher
+
+
+def test_window_collects_one_batch():
+    seen = []
+
+    async def dispatch(items):
+        seen.append(list(items))
+        return [i * 10 for i in items]
+
+    async def main():
+        batcher = MicroBatcher("t", window_ms=20, max_batch_size=8, dispatch=dispatch)
+        return await asyncio.gather(*[batcher.submit("g", i) for i in range(3)])
+
+    assert asyncio.run(main()) == [0, 10, 20]
+    assert seen == [[0, 1, 2]]
+
+
+def test_dispatch_cancelled_when_all_callers_are_gone():
+    state = {"cancelled": False, "finished": False}
+
+    async def dispatch(items):
+        try:
+            await asyncio.sleep(1.0)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+        state["finished"] = True
+        return items
+
+    async def main():
+        batcher = MicroBatcher("t", window_ms=1, max_batch_size=8, dispatch=dispatch)
+        for _ in range(2):
+            try:
+                await asyncio.wait_for(asyncio.gather(batcher.submit("g", 1), batcher.submit("g", 2)), 0.05)
+            except asyncio.TimeoutError:
+                pass
+        await asyncio.sleep(0.05)
+        return dict(state)  # before asyncio.run() cancels leftovers itself
+
+    assert asyncio.run(main()) == {"cancelled": True, "finished": False}
+
+
+def test_only_json_array_mode_is_windowed(fake_provider, llm_config):
+    url = fake_provider().url
+    for mode, windowed in (("pipelined", False), ("json-array", True)):
+        batching = {"enabled": True, "window_ms": 10, "max_batch_size": 4, "mode": mode}
+        path = llm_config({"p": url})
+        with open(path, encoding="utf-8") as f:
+            cfg = json.load(f)
+        cfg["providers"]["p"]["batching"] = batching
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(cfg, f)
+        adapter = LLMAdapter(path)
+        assert ("p" in adapter.batchers) is windowed
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_batcher.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_batcher.py
+# --- END OF STRUCTURE ---
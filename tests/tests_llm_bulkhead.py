@@ -0,0 +1,56 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: LLM bulkhead
+
+Concurrency cap with a bounded FIFO queue, and shed reasons that tell a
+full queue apart from a caller with no time left.
+"""
+
+import threading
+import time
+
+import pytest
+
+from core import core_llm_bulkhead
+from core.core_llm_bulkhead import Bulkhead
+
+
+@pytest.fixture
+def sheds(monkeypatch):
+    reasons = []
+    monkeypatch.setattr(core_llm_bulkhead, "record_llm_bulkhead_shed", lambda _name, reason: reasons.append(reason))
+    return reasons
+
+
+def test_released_slot_goes_to_waiter(sheds):
+    bulkhead = Bulkhead("p", max_concurrent=1, max_queue=1)
+    assert bulkhead.acquire(time.monotonic() + 1)
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(bulkhead.acquire(time.monotonic() + 1)))
+    waiter.start()
+    time.sleep(0.05)
+    bulkhead.release()
+    waiter.join()
+    assert got == [True] and bulkhead.in_flight == 1 and sheds == []
+
+
+def test_shed_reasons(sheds):
+    bulkhead = Bulkhead("p", max_concurrent=1, max_queue=0)
+    assert bulkhead.acquire(time.monotonic() + 1)
+    assert not bulkhead.acquire(time.monotonic() + 1)
+    assert not bulkhead.acquire(time.monotonic() - 1)
+    assert not bulkhead.acquire(None)
+    assert sheds == ["queue_full", "deadline", "deadline"]
+
+
+def test_queue_wait_times_out(sheds):
+    bulkhead = Bulkhead("p", max_concurrent=1, max_queue=1)
+    assert bulkhead.acquire(time.monotonic() + 1)
+    assert not bulkhead.acquire(time.monotonic() + 0.05)
+    assert sheds == ["timeout"] and bulkhead.queued == 0
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_bulkhead.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_bulkhead.py
+# --- END OF STRUCTURE ---
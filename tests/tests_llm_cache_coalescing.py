@@ -0,0 +1,93 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: LLM response cache and request coalescing
+
+Deterministic requests are cached and concurrent duplicates share one
+upstream call; sampled (temperature > 0) requests are neither, by default.
+"""
+
+import asyncio
+import json
+import time
+
+from core.core_adapter_llm import LLMAdapter
+from core.core_llm_response_cache import ResponseCache, canonical_key
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+CACHE = {"enabled": True, "max_entries": 16, "max_bytes": 1 << 20, "ttl_s": 60}
+
+
+def test_deterministic_response_is_cached(fake_provider, llm_config):
+    fake = fake_provider()
+    adapter = LLMAdapter(llm_config({"p": fake.url}, cache=CACHE))
+    first = adapter.chat(MESSAGES)
+    assert adapter.chat(MESSAGES) == first
+    assert fake.hits == 1
+    adapter.chat(MESSAGES, temperature=0.7)
+    adapter.chat(MESSAGES, temperature=0.7)
+    assert fake.hits == 3
+
+
+def test_reloaded_default_model_misses_the_cache(fake_provider, llm_config):
+    fake = fake_provider()
+    path = llm_config({"p": fake.url}, cache=CACHE)
+    adapter = LLMAdapter(path)
+    adapter.chat(MESSAGES)
+    with open(path, encoding="utf-8") as f:
+        cfg = json.load(f)
+    cfg["providers"]["p"]["default_model"] = "m2"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cfg, f)
+    assert adapter.reload_config()
+    adapter.chat(MESSAGES)
+    assert fake.hits == 2
+    assert fake.last_body["model"] == "m2"
+
+
+def test_cache_evicts_lru_and_expires():
+    cache = ResponseCache(max_entries=2, max_bytes=1 << 20, ttl_s=0.05)
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}  # a is now most recent
+    cache.put("c", {"v": 3})
+    assert cache.get("b") is None and len(cache) == 2
+    hit = cache.get("c")
+    hit["v"] = 99  # callers get copies
+    assert cache.get("c") == {"v": 3}
+    time.sleep(0.06)
+    assert cache.get("a") is None
+
+
+def test_canonical_key_ignores_dict_order():
+    messages = [{"role": "user", "content": "hi"}]
+    assert canonical_key(messages, "m", {"p": {"a": 1, "b": 2}}) == canonical_key(messages, "m", {"p": {"b": 2, "a": 1}})
+    assert canonical_key(messages, "m", {}) != canonical_key(messages, "n", {})
+
+
+def _concurrent(adapter, n, **kwargs):
+    async def main():
+        return await asyncio.gather(*[adapter.achat(MESSAGES, **kwargs) for _ in range(n)])
+
+    return asyncio.run(main())
+
+
+def test_concurrent_duplicates_share_one_call(fake_provider, llm_config):
+    fake = fake_provider()
+    fake.delay = 0.2
+    adapter = LLMAdapter(llm_config({"p": fake.url}, coalescing={"enabled": True}))
+    assert len(_concurrent(adapter, 4)) == 4
+    assert fake.hits == 1
+
+
+def test_sampled_requests_are_not_coalesced_by_default(fake_provider, llm_config):
+    fake = fake_provider()
+    fake.delay = 0.2
+    adapter = LLMAdapter(llm_config({"p": fake.url}, coalescing={"enabled": True}))
+    _concurrent(adapter, 3, temperature=0.7)
+    assert fake.hits == 3
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_cache_coalescing.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_cache_coalescing.py
+# --- END OF STRUCTURE ---
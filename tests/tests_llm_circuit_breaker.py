@@ -0,0 +1,112 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: LLM circuit breaker
+
+Open after consecutive provider failures, half-open probing after the
+cooldown, 503 with a retry hint when every circuit is open, and client
+4xx that must count against neither the breaker nor the provider's EWMA
+routing stats.
+"""
+
+import time
+
+import pytest
+
+from core.core_adapter_llm import CircuitBreaker, CircuitOpenError, LLMAdapter, ProviderError
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+BREAKER = {"enabled": True, "failure_threshold": 2, "open_ms": 100, "half_open_probes": 1, "success_threshold": 1, "health_probe": False}
+
+
+def test_breaker_opens_and_recovers_through_half_open(fake_provider, llm_config):
+    fake = fake_provider()
+    fake.status = 500
+    adapter = LLMAdapter(llm_config({"p": fake.url}, routing={"circuit_breaker": BREAKER}))
+    for _ in range(2):
+        with pytest.raises(ProviderError):
+            adapter.chat(MESSAGES)
+    assert adapter.breakers["p"].state == CircuitBreaker.OPEN
+
+    hits = fake.hits
+    with pytest.raises(ProviderError, match="circuit open"):
+        adapter.chat(MESSAGES)
+    assert fake.hits == hits  # short-circuited, nothing sent
+
+    time.sleep(0.15)
+    fake.status = 200
+    assert adapter.chat(MESSAGES)["choices"][0]["message"]["content"] == "echo:hi"
+    assert adapter.breakers["p"].state == CircuitBreaker.CLOSED
+
+
+def test_failed_half_open_probe_reopens(fake_provider, llm_config):
+    fake = fake_provider()
+    fake.status = 503
+    adapter = LLMAdapter(llm_config({"p": fake.url}, routing={"circuit_breaker": BREAKER}))
+    for _ in range(2):
+        with pytest.raises(ProviderError):
+            adapter.chat(MESSAGES)
+    time.sleep(0.15)
+    with pytest.raises(ProviderError):
+        adapter.chat(MESSAGES)
+    assert adapter.breakers["p"].state == CircuitBreaker.OPEN
+
+
+def test_all_circuits_open_is_unavailable_with_retry_hint(fake_provider, llm_config):
+    fake = fake_provider()
+    fake.status = 500
+    adapter = LLMAdapter(llm_config({"p": fake.url}, routing={"circuit_breaker": {**BREAKER, "open_ms": 5000}}))
+    for _ in range(2):
+        with pytest.raises(ProviderError):
+            adapter.chat(MESSAGES)
+    with pytest.raises(CircuitOpenError, match="circuit open") as exc:
+        adapter.chat(MESSAGES)
+    assert exc.value.status == 503
+    assert 4.0 < exc.value.retry_after_s <= 5.0
+
+
+def test_failed_health_probe_spends_no_rate_token(fake_provider, llm_config):
+    fake = fake_provider()
+    fake.status = 500
+    fake.health = 503
+    adapter = LLMAdapter(llm_config({"p": fake.url}, routing={"circuit_breaker": {**BREAKER, "health_probe": True}}))
+    for _ in range(2):
+        with pytest.raises(ProviderError):
+            adapter.chat(MESSAGES)
+    time.sleep(0.15)
+    bucket = adapter.rate_limiters["p"]
+    before = bucket.tokens
+    hits = fake.hits
+    with pytest.raises(ProviderError, match="health check failed"):
+        adapter.chat(MESSAGES)
+    assert fake.hits == hits
+    assert bucket.tokens >= before
+    assert adapter.breakers["p"].state == CircuitBreaker.OPEN
+
+
+def test_client_errors_do_not_open_the_circuit(fake_provider, llm_config):
+    fake = fake_provider()
+    fake.status = 400
+    adapter = LLMAdapter(llm_config({"p": fake.url}, routing={"circuit_breaker": BREAKER}))
+    for _ in range(5):
+        with pytest.raises(ProviderError, match="400"):
+            adapter.chat(MESSAGES)
+    assert adapter.breakers["p"].state == CircuitBreaker.CLOSED
+    fake.status = 200
+    assert adapter.chat(MESSAGES)["choices"][0]["message"]["content"] == "echo:hi"
+
+
+def test_client_errors_do_not_penalise_routing_stats(fake_provider, llm_config):
+    fake = fake_provider()
+    fake.status = 422
+    adapter = LLMAdapter(llm_config({"p": fake.url}, routing={"load": {"initial_latency_ms": 500}}))
+    for _ in range(3):
+        with pytest.raises(ProviderError):
+            adapter.chat(MESSAGES)
+    st = adapter.stats["p"]
+    assert st.ewma_s == pytest.approx(0.5)
+    assert st.in_flight == 0
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_circuit_breaker.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_circuit_breaker.py
+# --- END OF STRUCTURE ---
@@ -0,0 +1,52 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: LLM config hot reload
+
+A valid edit swaps the routing snapshot in place and keeps rate-limit
+state; an invalid file is rejected and the running config stays.
+"""
+
+import json
+
+from core.core_adapter_llm import LLMAdapter
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def _edit(path, fn):
+    with open(path, encoding="utf-8") as f:
+        cfg = json.load(f)
+    fn(cfg)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cfg, f)
+
+
+def test_reload_swaps_priority_and_keeps_bucket_state(fake_provider, llm_config):
+    a, b = fake_provider(), fake_provider()
+    path = llm_config({"a": a.url, "b": b.url}, rate_limit={"burst": 5, "per_provider": {"a": 1, "b": 1}})
+    adapter = LLMAdapter(path)
+    adapter.chat(MESSAGES)
+    assert a.hits == 1
+    left = adapter.rate_limiters["a"].tokens
+
+    _edit(path, lambda cfg: cfg["routing"].update(priority=["b", "a"]))
+    assert adapter.reload_config()
+    adapter.chat(MESSAGES)
+    assert (a.hits, b.hits) == (1, 1)
+    assert adapter.rate_limiters["a"].tokens <= left + 0.1  # carried over, not refilled to burst
+
+
+def test_invalid_file_keeps_current_config(fake_provider, llm_config):
+    a = fake_provider()
+    path = llm_config({"a": a.url})
+    adapter = LLMAdapter(path)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{ not json")
+    assert not adapter.reload_config()
+    assert adapter.chat(MESSAGES)["choices"][0]["message"]["content"] == "echo:hi"
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_config_reload.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_config_reload.py
+# --- END OF STRUCTURE ---
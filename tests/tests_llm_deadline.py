@@ -0,0 +1,55 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: LLM request deadline
+
+One deadline bounds the whole call: a slow provider is cut off when it
+runs out, no retry or failover starts after it, and a client budget can
+only shorten routing.deadline_ms.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from core.core_adapter_llm import DeadlineExceededError, LLMAdapter
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def _adapter(fake_provider, llm_config):
+    slow, spare = fake_provider(), fake_provider()
+    slow.delay = 1.0
+    path = llm_config({"a": slow.url, "b": spare.url}, routing={"retry": {"max_attempts": 3}})
+    return slow, spare, LLMAdapter(path)
+
+
+def test_client_budget_only_shortens_the_deadline(fake_provider, llm_config):
+    _, _, adapter = _adapter(fake_provider, llm_config)
+    now = time.monotonic()
+    assert adapter.deadline_after(10**9) - now == pytest.approx(5.0, abs=0.05)
+    assert adapter.deadline_after(200) - now == pytest.approx(0.2, abs=0.05)
+
+
+def test_sync_call_stops_at_the_deadline(fake_provider, llm_config):
+    slow, spare, adapter = _adapter(fake_provider, llm_config)
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        adapter.chat(MESSAGES, deadline=adapter.deadline_after(200))
+    assert time.monotonic() - started < 0.5
+    assert (slow.hits, spare.hits) == (1, 0)
+
+
+def test_async_call_stops_at_the_deadline(fake_provider, llm_config):
+    slow, spare, adapter = _adapter(fake_provider, llm_config)
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        asyncio.run(adapter.achat(MESSAGES, deadline=adapter.deadline_after(200)))
+    assert time.monotonic() - started < 0.5
+    assert (slow.hits, spare.hits) == (1, 0)
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_deadline.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_deadline.py
+# --- END OF STRUCTURE ---
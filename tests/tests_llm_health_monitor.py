@@ -0,0 +1,49 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: LLM provider health monitor
+
+Failed probes mark a provider down after the threshold, routing skips it,
+a passing probe brings it back, and an all-down table fails open.
+"""
+
+from core.core_adapter_llm import LLMAdapter
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+MONITOR = {"enabled": True, "interval_ms": 60000, "unhealthy_threshold": 2}
+
+
+def _adapter(fake_provider, llm_config):
+    a, b = fake_provider(), fake_provider()
+    return a, b, LLMAdapter(llm_config({"a": a.url, "b": b.url}, health_monitor=MONITOR))
+
+
+def test_unhealthy_provider_is_skipped_until_it_recovers(fake_provider, llm_config):
+    a, b, adapter = _adapter(fake_provider, llm_config)
+    a.health = 503
+    assert not adapter.health.check_now("a")
+    assert not adapter.health.is_down("a")  # one failed probe is below the threshold
+    adapter.health.check_now("a")
+    assert adapter.health.is_down("a")
+    adapter.chat(MESSAGES)
+    assert (a.hits, b.hits) == (0, 1)
+
+    a.health = 200
+    assert adapter.health.check_now("a")
+    adapter.chat(MESSAGES)
+    assert a.hits == 1
+
+
+def test_all_down_fails_open(fake_provider, llm_config):
+    a, b, adapter = _adapter(fake_provider, llm_config)
+    a.health = b.health = 503
+    for _ in range(2):
+        adapter.health.check_now("a")
+        adapter.health.check_now("b")
+    assert not adapter.health.is_down("a") and not adapter.health.is_down("b")
+    assert adapter.chat(MESSAGES)["choices"][0]["message"]["content"] == "echo:hi"
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_health_monitor.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_health_monitor.py
+# --- END OF STRUCTURE ---
@@ -0,0 +1,65 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: LLM retries
+
+Retryable failures are retried with backoff until the per-provider retry
+budget runs dry; client 4xx are not retried, and a Retry-After that does
+not fit the deadline ends the retries at once.
+"""
+
+import time
+
+import pytest
+
+from core.core_adapter_llm import LLMAdapter, ProviderError
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def _adapter(llm_config, url, burst=10, ratio=0.1):
+    retry = {"max_attempts": 3, "backoff": {"base_ms": 1, "max_ms": 5, "jitter": "full"}, "budget": {"ratio": ratio, "burst": burst}}
+    return LLMAdapter(llm_config({"p": url}, routing={"retry": retry}))
+
+
+def test_server_errors_are_retried(fake_provider, llm_config):
+    fake = fake_provider()
+    fake.status = 503
+    with pytest.raises(ProviderError):
+        _adapter(llm_config, fake.url).chat(MESSAGES)
+    assert fake.hits == 3
+
+
+def test_client_errors_are_not_retried(fake_provider, llm_config):
+    fake = fake_provider()
+    fake.status = 400
+    with pytest.raises(ProviderError):
+        _adapter(llm_config, fake.url).chat(MESSAGES)
+    assert fake.hits == 1
+
+
+def test_retry_budget_caps_retries(fake_provider, llm_config):
+    fake = fake_provider()
+    fake.status = 503
+    adapter = _adapter(llm_config, fake.url, burst=2, ratio=0.0)
+    for _ in range(3):
+        with pytest.raises(ProviderError):
+            adapter.chat(MESSAGES)
+    assert fake.hits == 3 + 2  # one try per call plus the two budgeted retries
+
+
+def test_retry_after_beyond_deadline_is_not_waited_for(fake_provider, llm_config):
+    fake = fake_provider()
+    fake.status = 429
+    fake.retry_after = 30
+    adapter = _adapter(llm_config, fake.url)
+    started = time.monotonic()
+    with pytest.raises(ProviderError):
+        adapter.chat(MESSAGES)
+    assert time.monotonic() - started < 1.0
+    assert fake.hits == 1
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_retry.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_retry.py
+# --- END OF STRUCTURE ---
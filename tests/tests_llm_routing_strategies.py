@@ -0,0 +1,72 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: LLM latency-aware routing
+
+ewma-latency moves traffic off a provider that turned slow, and
+least-outstanding prefers the provider with fewer calls in flight. A
+stream counts as in flight until it is drained or closed, and only a
+drained stream's total time feeds the latency estimate.
+"""
+
+import asyncio
+
+from core.core_adapter_llm import LLMAdapter
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def test_ewma_latency_moves_off_slow_provider(fake_provider, llm_config):
+    slow, fast = fake_provider(), fake_provider()
+    slow.delay = 0.3
+    adapter = LLMAdapter(llm_config(
+        {"a": slow.url, "b": fast.url},
+        routing={"strategy": "ewma-latency", "load": {"ewma_alpha": 0.5, "initial_latency_ms": 10}},
+    ))
+    adapter.chat(MESSAGES)  # tie on the initial estimate: priority order picks a
+    assert slow.hits == 1
+    adapter.chat(MESSAGES)
+    adapter.chat(MESSAGES)
+    assert (slow.hits, fast.hits) == (1, 2)
+
+
+def test_least_outstanding_prefers_idle_provider(fake_provider, llm_config):
+    a, b = fake_provider(), fake_provider()
+    adapter = LLMAdapter(llm_config({"a": a.url, "b": b.url}, routing={"strategy": "least-outstanding"}))
+    adapter.stats["a"].begin()  # one call already in flight on a
+    assert adapter._providers_in_order() == ["b", "a"]
+    adapter.chat(MESSAGES)
+    assert (a.hits, b.hits) == (0, 1)
+
+
+def test_stream_stays_in_flight_until_drained(fake_provider, llm_config):
+    fake = fake_provider()
+    fake.stream = ["a", "b"]
+    adapter = LLMAdapter(llm_config({"p": fake.url}, routing={"load": {"ewma_alpha": 1.0, "initial_latency_ms": 10000}}))
+    st = adapter.stats["p"]
+    stream = adapter.chat_stream(MESSAGES)
+    next(stream)
+    assert st.in_flight == 1 and st.ewma_s == 10.0  # the first chunk is not a sample
+    list(stream)
+    assert st.in_flight == 0 and st.ewma_s < 10.0 and len(st.samples) == 1
+
+
+def test_closed_stream_leaves_flight_without_a_sample(fake_provider, llm_config):
+    fake = fake_provider()
+    fake.stream = ["a", "b", "c"]
+    adapter = LLMAdapter(llm_config({"p": fake.url}, routing={"load": {"ewma_alpha": 1.0, "initial_latency_ms": 10000}}))
+    st = adapter.stats["p"]
+
+    async def main():
+        stream = adapter.achat_stream(MESSAGES)
+        await stream.__anext__()
+        assert st.in_flight == 1
+        await stream.aclose()
+
+    asyncio.run(main())
+    assert st.in_flight == 0 and st.ewma_s == 10.0 and not st.samples
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_routing_strategies.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_routing_strategies.py
+# --- END OF STRUCTURE ---
@@ -0,0 +1,63 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: LLM fair scheduler
+
+Higher-priority classes are served first, tenants within a class are
+interleaved by weighted fair queuing, and a full queue is rejected.
+"""
+
+import asyncio
+
+import pytest
+
+from core.core_llm_scheduler import FairScheduler, SchedulerFullError
+
+
+def _scheduler(**overrides):
+    return FairScheduler.from_settings(dict({"enabled": True, "max_concurrent": 1, "max_queue": 16, "default_class": "interactive"}, **overrides))
+
+
+def test_priority_then_fair_share_order():
+    async def main():
+        scheduler = _scheduler()
+        served = []
+
+        async def request(tenant, klass):
+            async with scheduler.slot(tenant, klass):
+                served.append((tenant, klass))
+                await asyncio.sleep(0)
+
+        await scheduler.acquire("holder", "interactive")
+        tasks = [asyncio.create_task(request("a", "batch")) for _ in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(request("b", "batch")))
+        tasks.append(asyncio.create_task(request("c", "interactive")))
+        await asyncio.sleep(0)
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        return served
+
+    assert asyncio.run(main()) == [("c", "interactive"), ("a", "batch"), ("b", "batch"), ("a", "batch"), ("a", "batch")]
+
+
+def test_full_queue_is_rejected():
+    async def main():
+        scheduler = _scheduler(max_queue=1)
+        await scheduler.acquire("holder", "interactive")
+        waiting = asyncio.create_task(scheduler.acquire("a", "interactive"))
+        await asyncio.sleep(0)
+        with pytest.raises(SchedulerFullError):
+            await scheduler.acquire("b", "interactive")
+        waiting.cancel()
+
+    asyncio.run(main())
+
+
+def test_unknown_class_falls_back_to_default():
+    assert _scheduler().resolve_class("vip") == "interactive"
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_scheduler.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_scheduler.py
+# --- END OF STRUCTURE ---
@@ -0,0 +1,63 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: LLM shared rate limiter
+
+Every worker on a host draws from one budget: token buckets backed by the
+same SharedBucketStore file, in this process or a forked one, share their
+token count.
+"""
+
+import multiprocessing
+import sys
+
+import pytest
+
+from core.core_adapter_llm import TokenBucket
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="shared limiter needs fcntl")
+
+
+def _store(path):
+    from core.core_llm_shared_limiter import SharedBucketStore
+
+    return SharedBucketStore(str(path))
+
+
+def test_buckets_on_one_file_share_tokens(tmp_path):
+    path = tmp_path / "rl.bin"
+    a = TokenBucket(rate_per_minute=1, burst=3, name="p", store=_store(path))
+    b = TokenBucket(rate_per_minute=1, burst=3, name="p", store=_store(path))
+    assert a.allow() and b.allow() and a.allow()
+    assert not b.allow()
+    b.adjust(-1.0)  # a refund is visible to the other worker too
+    assert a.allow()
+
+
+def test_distinct_limits_get_distinct_slots(tmp_path):
+    store = _store(tmp_path / "rl.bin")
+    rpm = TokenBucket(rate_per_minute=1, burst=1, name="p", limit="rpm", store=store)
+    tpm = TokenBucket(rate_per_minute=1, burst=1, name="p", limit="tpm", store=store)
+    assert rpm.allow() and tpm.allow()
+
+
+def _drain(path, n, out):
+    bucket = TokenBucket(rate_per_minute=1, burst=10, name="p", store=_store(path))
+    out.put(sum(bucket.allow() for _ in range(n)))
+
+
+def test_forked_workers_share_one_budget(tmp_path):
+    path = tmp_path / "rl.bin"
+    ctx = multiprocessing.get_context("fork")
+    out = ctx.Queue()
+    workers = [ctx.Process(target=_drain, args=(path, 10, out)) for _ in range(3)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join(10)
+    assert sum(out.get(timeout=5) for _ in workers) == 10
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_shared_limiter.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_shared_limiter.py
+# --- END OF STRUCTURE ---
@@ -0,0 +1,86 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: LLM streaming
+
+SSE line parsing, the single-chunk fallback for backends that ignore
+stream=true, failover that stops once the first chunk has arrived, and the
+time-to-first-token metric.
+"""
+
+import asyncio
+
+import pytest
+
+import core.core_adapter_llm as llm
+from core.core_adapter_llm import LLMAdapter, ProviderError
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def _contents(chunks):
+    return [c["choices"][0]["delta"]["content"] for c in chunks]
+
+
+async def _adrain(adapter):
+    return [chunk async for chunk in adapter.achat_stream(MESSAGES)]
+
+
+def test_parse_sse_line():
+    parse = LLMAdapter._parse_sse_line
+    assert parse('data: {"choices": []}\n') == {"choices": []}
+    assert parse("data:[DONE]") is llm._SSE_DONE
+    assert parse(": keep-alive") is None
+    assert parse("event: message") is None
+    assert parse("") is None
+    assert parse("data: ") is None
+    with pytest.raises(ProviderError, match="malformed stream chunk"):
+        parse("data: {oops")
+
+
+@pytest.mark.parametrize("run", [lambda a: list(a.chat_stream(MESSAGES)), lambda a: asyncio.run(_adrain(a))], ids=["sync", "async"])
+def test_backend_without_sse_is_relayed_as_one_chunk(fake_provider, llm_config, run):
+    fake = fake_provider()
+    chunks = run(LLMAdapter(llm_config({"p": fake.url})))
+    assert fake.last_body["stream"] is True
+    assert len(chunks) == 1
+    assert chunks[0]["object"] == "chat.completion.chunk"
+    assert _contents(chunks) == ["echo:hi"]
+
+
+@pytest.mark.parametrize("run", [lambda a: list(a.chat_stream(MESSAGES)), lambda a: asyncio.run(_adrain(a))], ids=["sync", "async"])
+def test_fails_over_before_the_first_chunk(fake_provider, llm_config, run):
+    down, up = fake_provider(), fake_provider()
+    down.status = 503
+    up.stream = ["a", "b"]
+    chunks = run(LLMAdapter(llm_config({"down": down.url, "up": up.url})))
+    assert down.hits == 1
+    assert _contents(chunks) == ["a", "b"]
+
+
+def test_no_failover_after_the_first_chunk(fake_provider, llm_config):
+    broken, spare = fake_provider(), fake_provider()
+    broken.stream = ["a", "b", "c"]
+    broken.stream_error_after = 1
+    stream = LLMAdapter(llm_config({"broken": broken.url, "spare": spare.url})).chat_stream(MESSAGES)
+    assert _contents([next(stream)]) == ["a"]
+    with pytest.raises(ProviderError, match="malformed stream chunk"):
+        next(stream)
+    assert spare.hits == 0
+
+
+def test_time_to_first_token_is_recorded(fake_provider, llm_config, monkeypatch):
+    fake = fake_provider()
+    fake.stream = ["a"]
+    fake.delay = 0.1
+    recorded = []
+    monkeypatch.setattr(llm, "record_llm_ttft", lambda provider, seconds: recorded.append((provider, seconds)))
+    list(LLMAdapter(llm_config({"p": fake.url})).chat_stream(MESSAGES))
+    assert len(recorded) == 1
+    assert recorded[0][0] == "p"
+    assert 0.1 <= recorded[0][1] < 2.0
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_streaming.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_streaming.py
+# --- END OF STRUCTURE ---
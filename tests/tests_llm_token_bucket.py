@@ -0,0 +1,62 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: LLM token bucket
+
+Immediate admission without a deadline, FIFO queueing with one, and giving
+up once the deadline passes.
+"""
+
+import asyncio
+import time
+
+from core.core_adapter_llm import TokenBucket
+
+
+def test_no_deadline_rejects_when_empty():
+    bucket = TokenBucket(rate_per_minute=60, burst=1)
+    assert bucket.acquire()
+    assert not bucket.acquire()
+
+
+def test_waiters_are_served_in_arrival_order():
+    async def main():
+        bucket = TokenBucket(rate_per_minute=1200, burst=1)  # one token per 50 ms
+        assert bucket.allow()
+        served = []
+
+        async def wait(name):
+            assert await bucket.acquire_async(deadline=time.monotonic() + 2.0)
+            served.append(name)
+
+        tasks = []
+        for name in "abcd":
+            tasks.append(asyncio.create_task(wait(name)))
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        return served
+
+    assert asyncio.run(main()) == list("abcd")
+
+
+def test_deadline_gives_up_and_leaves_the_queue():
+    bucket = TokenBucket(rate_per_minute=1, burst=1)
+    assert bucket.acquire()
+    started = time.monotonic()
+    assert not bucket.acquire(deadline=started + 0.05)
+    assert 0.04 <= time.monotonic() - started < 1.0
+    assert not bucket._waiters
+
+
+def test_settlement_can_go_into_debt():
+    bucket = TokenBucket(rate_per_minute=60, burst=10)
+    assert bucket.acquire(cost=5)
+    bucket.adjust(10)  # used 15, charged 5
+    assert not bucket.allow()
+    # 5 tokens in debt at 1/s: nothing frees up within the wait.
+    assert not bucket.acquire(deadline=time.monotonic() + 0.05)
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_token_bucket.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_token_bucket.py
+# --- END OF STRUCTURE ---
@@ -0,0 +1,102 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: LLM tokens-per-minute budgets
+
+The up-front TPM estimate is settled to the reported usage after a call, on
+both the plain and the streamed paths; a stream without a usage chunk is
+settled to its counted content, and a stream that fails midway is refunded.
+"""
+
+import asyncio
+
+import pytest
+
+from core.core_adapter_llm import LLMAdapter, ProviderError
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+BURST = 5000
+
+
+def _used(adapter, name="p"):
+    bucket = adapter.token_limiters[name]
+    with bucket.lock:
+        bucket._refill()
+        return BURST - bucket.tokens
+
+
+def _adapter(fake, llm_config):
+    # 60 TPM refills one token per second, so levels barely move during a test.
+    return LLMAdapter(llm_config({"p": fake.url}, rate_limit={"tokens_per_minute": {"p": 60}, "tokens_burst": {"p": BURST}}))
+
+
+def _drain(adapter, **kwargs):
+    return list(adapter.chat_stream(MESSAGES, max_tokens=1000, **kwargs))
+
+
+async def _adrain(adapter, **kwargs):
+    return [chunk async for chunk in adapter.achat_stream(MESSAGES, max_tokens=1000, **kwargs)]
+
+
+def test_call_is_settled_to_reported_usage(fake_provider, llm_config):
+    adapter = _adapter(fake_provider(), llm_config)
+    adapter.chat(MESSAGES, max_tokens=1000)
+    assert _used(adapter) == pytest.approx(12, abs=1)
+
+
+@pytest.mark.parametrize("run", [_drain, lambda adapter: asyncio.run(_adrain(adapter))], ids=["sync", "async"])
+def test_stream_is_settled_to_final_usage_chunk(fake_provider, llm_config, run):
+    fake = fake_provider()
+    fake.stream = ["a", "b", "c"]
+    adapter = _adapter(fake, llm_config)
+    chunks = run(adapter)
+    assert fake.last_body["stream_options"] == {"include_usage": True}
+    # The usage-only chunk was requested by the adapter, not the caller, so it is not relayed.
+    assert [c["choices"][0]["delta"]["content"] for c in chunks] == ["a", "b", "c"]
+    assert _used(adapter) == pytest.approx(12, abs=1)
+
+
+def test_stream_usage_chunk_is_relayed_when_the_caller_asks(fake_provider, llm_config):
+    fake = fake_provider()
+    fake.stream = ["a"]
+    adapter = _adapter(fake, llm_config)
+    chunks = _drain(adapter, stream_options={"include_usage": True})
+    assert chunks[-1]["usage"] == fake.usage
+
+
+@pytest.mark.parametrize("run", [_drain, lambda adapter: asyncio.run(_adrain(adapter))], ids=["sync", "async"])
+def test_stream_without_usage_is_settled_to_counted_content(fake_provider, llm_config, run):
+    fake = fake_provider()
+    fake.stream = ["a", "b", "c"]
+    fake.stream_usage = False
+    adapter = _adapter(fake, llm_config)
+    run(adapter)
+    # Prompt estimate (2 // 4 + 4 per message) plus one token per content chunk.
+    assert _used(adapter) == pytest.approx(4 + 3, abs=1)
+
+
+@pytest.mark.parametrize("run", [_drain, lambda adapter: asyncio.run(_adrain(adapter))], ids=["sync", "async"])
+def test_stream_failing_midway_is_refunded(fake_provider, llm_config, run):
+    fake = fake_provider()
+    fake.stream = ["a", "b", "c"]
+    fake.stream_error_after = 2
+    adapter = _adapter(fake, llm_config)
+    with pytest.raises(ProviderError, match="malformed stream chunk"):
+        run(adapter)
+    assert _used(adapter) == pytest.approx(0, abs=1)
+
+
+def test_stream_closed_early_is_settled_to_what_was_relayed(fake_provider, llm_config):
+    fake = fake_provider()
+    fake.stream = ["a", "b", "c"]
+    fake.stream_usage = False
+    adapter = _adapter(fake, llm_config)
+    stream = adapter.chat_stream(MESSAGES, max_tokens=1000)
+    next(stream)
+    stream.close()
+    assert _used(adapter) == pytest.approx(4 + 1, abs=1)
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_tpm.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_llm_tpm.py
+# --- END OF STRUCTURE ---
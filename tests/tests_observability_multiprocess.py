@@ -0,0 +1,85 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: Prometheus multiprocess mode
+
+Dead-worker cleanup in the shared metrics directory: live gauges go,
+counters are folded into one archive file without changing any total, and
+a dead pid is only reaped once. Workers built by create_app() write their
+metrics into the shared directory.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+from prometheus_client.mmap_dict import MmapedDict
+
+from core import core_observability as obs
+
+KEY = json.dumps(["jobs", "jobs_total", {}, "Jobs"])
+
+
+def _dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def _write(path, value):
+    d = MmapedDict(str(path))
+    d.write_value(KEY, value, 0.0)
+    d.close()
+
+
+def _jobs_total():
+    for metric in obs.multiprocess_registry().collect():
+        for sample in metric.samples:
+            if sample.name == "jobs_total":
+                return sample.value
+    return None
+
+
+def test_dead_worker_is_reaped_once(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    pid = _dead_pid()
+    (tmp_path / f"gauge_livesum_{pid}.db").write_bytes(b"")
+    _write(tmp_path / f"counter_{pid}.db", 2.0)
+
+    assert obs.reap_dead_workers() == 1
+    assert not (tmp_path / f"gauge_livesum_{pid}.db").exists()
+    assert obs.reap_dead_workers() == 0
+
+
+def test_dead_workers_counters_fold_into_one_archive(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    first, second = _dead_pid(), _dead_pid()
+    _write(tmp_path / f"counter_{first}.db", 2.0)
+    _write(tmp_path / f"counter_{second}.db", 3.0)
+    assert _jobs_total() == 5.0
+
+    obs.mark_worker_dead(first)
+    obs.mark_worker_dead(second)
+    assert sorted(p.name for p in tmp_path.glob("*.db")) == ["counter_archive.db"]
+    assert _jobs_total() == 5.0
+
+
+def test_create_app_registers_worker_metrics_in_the_shared_dir(tmp_path):
+    # A fresh interpreter: prometheus_client picks its file-backed values at import.
+    script = textwrap.dedent("""
+        from fastapi import FastAPI
+        from core import core_api_server
+        core_api_server.CoreAPIServer.setup = lambda self: FastAPI()
+        core_api_server.create_app()
+    """)
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path), SYSTEM_VALIDATOR_BASE_DIR=str(tmp_path))
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", script], env=env, cwd=cwd, check=True, timeout=60)
+    assert list(tmp_path.glob("*.db"))
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_observability_multiprocess.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_observability_multiprocess.py
+# --- END OF STRUCTURE ---
@@ -0,0 +1,79 @@
+﻿"""
+System Validator / Theaterverse Final
+Tests: LLM bulk runner
+
+Resume from a checkpoint writes every input line exactly once, and an item
+that stays overloaded is written as a failure after --max-attempts tries.
+"""
+
+import asyncio
+import json
+
+from core.core_adapter_llm import LLMAdapter, OverloadedError
+from tools.tool_llm_bulk_runner import BulkRunner, Checkpoint, _parse_args
+
+
+def _write_input(path, n):
+    path.write_text("".join(json.dumps({"id": i, "messages": [{"role": "user", "content": f"q{i}"}]}) + "\n" for i in range(n)))
+
+
+def _records(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def _run(adapter, argv):
+    return asyncio.run(BulkRunner(adapter, _parse_args(argv)).run())
+
+
+def test_resume_writes_each_line_once(fake_provider, llm_config, tmp_path):
+    adapter = LLMAdapter(llm_config({"p": fake_provider().url}))
+    src, out = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_input(src, 6)
+    # State of an interrupted run: lines 0 and 1 checkpointed, line 4 done
+    # out of order, and a record written after the last checkpoint.
+    done = b"".join(json.dumps({"line": n, "id": n, "response": {}}).encode() + b"\n" for n in (0, 1, 4))
+    out.write_bytes(done + b'{"line": 2, "id": 2, "response": {}}\n')
+    Checkpoint(str(out) + ".ckpt").save(len(done), 2, {4})
+
+    assert _run(adapter, [str(src), str(out), "--workers", "2", "--resume"]) == 0
+    records = _records(out)
+    assert sorted(r["line"] for r in records) == list(range(6))
+    assert all("response" in r for r in records)
+
+
+def test_existing_output_needs_resume(fake_provider, llm_config, tmp_path):
+    adapter = LLMAdapter(llm_config({"p": fake_provider().url}))
+    src, out = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_input(src, 1)
+    out.write_text("x\n")
+    assert _run(adapter, [str(src), str(out)]) == 2
+
+
+class _Overloaded:
+    """Adapter stand-in that is always too busy."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def deadline_after(self, _timeout_ms):
+        return None
+
+    async def achat(self, **_kwargs):
+        self.calls += 1
+        raise OverloadedError("busy", 0.0)
+
+
+def test_overload_retries_are_capped(tmp_path):
+    adapter = _Overloaded()
+    src, out = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_input(src, 1)
+    assert _run(adapter, [str(src), str(out), "--max-attempts", "3"]) == 0
+    [record] = _records(out)
+    assert record["error"]["type"] == "OverloadedError" and record["error"]["attempts"] == 3
+    assert adapter.calls == 3
+
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_tool_llm_bulk_runner.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tests/tests_tool_llm_bulk_runner.py
+# --- END OF STRUCTURE ---
@@ -0,0 +1,75 @@
+﻿"""
+System Validator / Theaterverse Final
+Tool: JSON Codec Microbenchmark
+
+Times the JSON work one /v1/chat request does (provider payload encode,
+provider response decode, cache key, cached copy and API response encode)
+with the stdlib calls the code used before and with core_json_codec, and
+prints the per-request difference.
+
+Usage: python -m tools.tool_json_codec_bench [iterations]
+"""
+
+import hashlib
+import json
+import sys
+import time
+from typing import Any, Callable, Dict
+
+from core import core_json_codec as codec
+
+_MESSAGES = [
+    {"role": "system", "content": "You are a helpful assistant. " * 8},
+    {"role": "user", "content": "Summarise the following scene for the stage manager. " * 20},
+]
+_PAYLOAD: Dict[str, Any] = {
+    "model": "qwen2.5-7b-instruct", "messages": _MESSAGES, "max_tokens": 1024, "temperature": 0.3,
+}
+_RESPONSE: Dict[str, Any] = {
+    "id": "chatcmpl-1", "object": "chat.completion", "model": "qwen2.5-7b-instruct",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "舞台の要約です。" * 120}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 412, "completion_tokens": 380, "total_tokens": 792},
+}
+
+
+def stdlib_request() -> None:
+    json.dumps(_PAYLOAD).encode("utf-8")
+    body = json.dumps(_RESPONSE).encode("utf-8")
+    resp = json.loads(body.decode("utf-8"))
+    key = json.dumps({"messages": _MESSAGES, "model": None, "params": {}}, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    hashlib.sha256(key.encode("utf-8")).hexdigest()
+    json.loads(json.dumps(resp, ensure_ascii=False).encode("utf-8"))
+    json.dumps(resp).encode("utf-8")
+
+
+def codec_request() -> None:
+    codec.dumps(_PAYLOAD)
+    body = codec.dumps(_RESPONSE)
+    resp = codec.loads(body)
+    hashlib.sha256(codec.dumps({"messages": _MESSAGES, "model": None, "params": {}}, sort_keys=True, default=str)).hexdigest()
+    codec.loads(codec.dumps(resp))
+    codec.dumps(resp)
+
+
+def bench(fn: Callable[[], None], iterations: int) -> float:
+    for _ in range(min(1000, iterations)):
+        fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    base = bench(stdlib_request, n)
+    fast = bench(codec_request, n)
+    print(f"backend={codec.BACKEND} iterations={n}")
+    print(f"stdlib json : {base * 1e6:8.1f} us/request")
+    print(f"json codec  : {fast * 1e6:8.1f} us/request")
+    print(f"saved       : {(base - fast) * 1e6:8.1f} us/request ({(1 - fast / base) * 100:.0f}%)")
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tools/tool_json_codec_bench.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tools/tool_json_codec_bench.py
+# --- END OF STRUCTURE ---
@@ -0,0 +1,271 @@
+﻿"""
+System Validator / Theaterverse Final
+Tool: LLM Bulk Runner
+
+Streams a JSONL file of chat requests through LLMAdapter with a pool of
+async workers and appends one JSONL result per item, in completion order.
+Provider rate limits are the adapter's own: workers queue on the token
+buckets, and an item rejected as overloaded is retried after its
+Retry-After hint, up to --max-attempts times, before it is written as a
+failure.
+
+Input lines look like {"id": ..., "messages": [...], "model"?, "temperature"?,
+"max_tokens"?}; "id" is optional and echoed back. Output lines are
+{"line", "id", "response"} or {"line", "id", "error": {"type", "message"}}.
+
+Progress is checkpointed next to the output (<output>.ckpt) every few
+seconds: the output size after an fsync, the input line below which every
+item is written, and the written lines above it. A resumed run truncates
+the output back to that size and skips exactly those lines, so nothing is
+written twice and nothing finished before the checkpoint is redone.
+
+Usage: python -m tools.tool_llm_bulk_runner input.jsonl output.jsonl [--workers 16] [--resume]
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import sys
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+from core.core_adapter_llm import LLMAdapter, OverloadedError
+from core import core_json_codec as codec
+
+_DONE = object()
+
+
+class Checkpoint:
+    def __init__(self, path: str):
+        self.path = path
+        self.output_bytes = 0
+        self.done_below = 0
+        self.done_above: Set[int] = set()
+
+    def load(self) -> bool:
+        try:
+            with open(self.path, "rb") as f:
+                data = codec.loads(f.read())
+        except FileNotFoundError:
+            return False
+        self.output_bytes = int(data["output_bytes"])
+        self.done_below = int(data["done_below"])
+        self.done_above = set(data.get("done_above", []))
+        return True
+
+    def is_done(self, line: int) -> bool:
+        return line < self.done_below or line in self.done_above
+
+    def save(self, output_bytes: int, done_below: int, written: Set[int]) -> None:
+        self.output_bytes = output_bytes
+        self.done_below = done_below
+        self.done_above = {n for n in written if n >= done_below}
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(codec.dumps({
+                "output_bytes": output_bytes,
+                "done_below": done_below,
+                "done_above": sorted(self.done_above),
+            }))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+class Progress:
+    def __init__(self, total: int, skipped: int, every_s: float):
+        self.total = total
+        self.skipped = skipped
+        self.every_s = every_s
+        self.done = 0
+        self.errors = 0
+        self.retries = 0
+        self.started = time.monotonic()
+        self._last = self.started
+
+    def tick(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last < self.every_s:
+            return
+        self._last = now
+        elapsed = max(1e-9, now - self.started)
+        rate = self.done / elapsed
+        left = self.total - self.skipped - self.done
+        eta = f"{left / rate:,.0f}s" if rate > 0 else "-"
+        print(
+            f"[bulk] {self.skipped + self.done:,}/{self.total:,} done "
+            f"({self.errors:,} errors, {self.retries:,} overload retries) "
+            f"{rate:,.1f} items/s, eta {eta}",
+            file=sys.stderr, flush=True,
+        )
+
+
+class BulkRunner:
+    def __init__(self, adapter: LLMAdapter, args: argparse.Namespace):
+        self.adapter = adapter
+        self.args = args
+        self.ckpt = Checkpoint(args.checkpoint or args.output + ".ckpt")
+        self.stopping = False
+        self._pending: Set[int] = set()
+        self._written: Set[int] = set()
+        self._next_line = 0
+
+    async def run(self) -> int:
+        resumed = self.args.resume and self.ckpt.load()
+        if not resumed and os.path.exists(self.args.output) and os.path.getsize(self.args.output):
+            print(f"[bulk] {self.args.output} exists; pass --resume or remove it", file=sys.stderr)
+            return 2
+        with open(self.args.output, "ab") as out:
+            # Anything after the checkpointed size was not fsynced and will be redone.
+            out.truncate(self.ckpt.output_bytes)
+            out.seek(self.ckpt.output_bytes)
+            total, skipped = self._scan()
+            self._written = set(self.ckpt.done_above)
+            progress = Progress(total, skipped, self.args.report_every)
+            work: asyncio.Queue = asyncio.Queue(maxsize=self.args.workers * 2)
+            results: asyncio.Queue = asyncio.Queue()
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.add_signal_handler(sig, self._stop)
+                except NotImplementedError:
+                    # Windows event loops have no signal handler support.
+                    signal.signal(sig, lambda _signum, _frame: loop.call_soon_threadsafe(self._stop))
+            reader = asyncio.create_task(self._read(work))
+            workers = [asyncio.create_task(self._work(work, results, progress)) for _ in range(self.args.workers)]
+            writer = asyncio.create_task(self._write(out, results, progress))
+            await reader
+            await asyncio.gather(*workers)
+            await results.put(_DONE)
+            await writer
+            progress.tick(force=True)
+        return 0
+
+    def _scan(self) -> Tuple[int, int]:
+        total = skipped = 0
+        with open(self.args.input, "rb") as f:
+            for line, raw in enumerate(f):
+                if raw.strip():
+                    total += 1
+                    skipped += self.ckpt.is_done(line)
+        return total, skipped
+
+    def _stop(self) -> None:
+        # Finish in-flight items, checkpoint, and exit; a second signal kills.
+        if self.stopping:
+            os._exit(130)
+        self.stopping = True
+        print("[bulk] stopping after in-flight items", file=sys.stderr, flush=True)
+
+    async def _read(self, work: asyncio.Queue) -> None:
+        with open(self.args.input, "rb") as f:
+            for line, raw in enumerate(f):
+                if self.stopping:
+                    break
+                self._next_line = line + 1
+                if self.ckpt.is_done(line) or not raw.strip():
+                    continue
+                self._pending.add(line)
+                await work.put((line, raw))
+        for _ in range(self.args.workers):
+            await work.put(_DONE)
+
+    async def _work(self, work: asyncio.Queue, results: asyncio.Queue, progress: Progress) -> None:
+        while True:
+            item = await work.get()
+            if item is _DONE:
+                return
+            line, raw = item
+            await results.put((line, await self._run_item(line, raw, progress)))
+
+    async def _run_item(self, line: int, raw: bytes, progress: Progress) -> Dict[str, Any]:
+        try:
+            req = codec.loads(raw)
+        except codec.JSONDecodeError as e:
+            return {"line": line, "id": None, "error": {"type": "InvalidInput", "message": str(e)}}
+        if not isinstance(req, dict):
+            return {"line": line, "id": None, "error": {"type": "InvalidInput", "message": "expected a JSON object"}}
+        record: Dict[str, Any] = {"line": line, "id": req.get("id")}
+        params = {k: req[k] for k in ("temperature", "max_tokens") if req.get(k) is not None}
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                record["response"] = await self.adapter.achat(
+                    messages=req["messages"],
+                    model=req.get("model"),
+                    deadline=self.adapter.deadline_after(self.args.timeout_ms),
+                    **params,
+                )
+                return record
+            except OverloadedError as e:
+                if self.stopping or attempt >= self.args.max_attempts:
+                    record["error"] = {"type": type(e).__name__, "message": str(e), "attempts": attempt}
+                    return record
+                progress.retries += 1
+                await asyncio.sleep(max(0.05, e.retry_after_s))
+            except Exception as e:  # noqa: BLE001
+                record["error"] = {"type": type(e).__name__, "message": str(e)}
+                return record
+
+    async def _write(self, out: Any, results: asyncio.Queue, progress: Progress) -> None:
+        last_ckpt = time.monotonic()
+        while True:
+            item = await results.get()
+            if item is _DONE:
+                break
+            line, record = item
+            if self.stopping and "error" in record:
+                # Cut short by shutdown: not written and still pending, so the
+                # checkpoint watermark stays below it and a resumed run redoes it.
+                continue
+            out.write(codec.dumps(record) + b"\n")
+            self._pending.discard(line)
+            self._written.add(line)
+            progress.done += 1
+            progress.errors += "error" in record
+            progress.tick()
+            if time.monotonic() - last_ckpt >= self.args.checkpoint_every:
+                self._checkpoint(out)
+                last_ckpt = time.monotonic()
+        self._checkpoint(out)
+
+    def _checkpoint(self, out: Any) -> None:
+        out.flush()
+        os.fsync(out.fileno())
+        done_below = min(self._pending) if self._pending else self._next_line
+        self.ckpt.save(out.tell(), done_below, self._written)
+        self._written = set(self.ckpt.done_above)
+
+
+def _parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Run a JSONL file of chat requests through LLMAdapter.")
+    p.add_argument("input")
+    p.add_argument("output")
+    p.add_argument("--config", default=None, help="LLM connector config (default: LLM_CONNECTOR_CONFIG)")
+    p.add_argument("--workers", type=int, default=16)
+    p.add_argument("--timeout-ms", type=int, default=None, help="per-item deadline (capped by routing.deadline_ms)")
+    p.add_argument("--max-attempts", type=int, default=20, help="tries per item while providers are overloaded")
+    p.add_argument("--checkpoint", default=None, help="checkpoint path (default: <output>.ckpt)")
+    p.add_argument("--checkpoint-every", type=float, default=5.0, help="seconds between checkpoints")
+    p.add_argument("--report-every", type=float, default=10.0, help="seconds between progress lines")
+    p.add_argument("--resume", action="store_true", help="continue from the checkpoint")
+    return p.parse_args(argv)
+
+
+async def _main(args: argparse.Namespace) -> int:
+    adapter = LLMAdapter(args.config)
+    try:
+        return await BulkRunner(adapter, args).run()
+    finally:
+        await adapter.aclose()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(_parse_args())))
+
+# --- END OF STRUCTURE ---
+# /root/System_Validator/APP_DIR/theaterverse_final/tools/tool_llm_bulk_runner.py
+# /root/System_Validator/APP_DIR/theaterverse_final/tools/tool_llm_bulk_runner.py
+# --- END OF STRUCTURE ---